@@ -11,18 +11,30 @@ Ce script implémente :
 
 import numpy as np
 import matplotlib.pyplot as plt
-from tensorflow.keras.models import Sequential
+from tensorflow.keras.models import Sequential, load_model
 from tensorflow.keras.layers import LSTM, Dense, Dropout, Bidirectional
 from sklearn.metrics import accuracy_score, f1_score
 from sklearn.preprocessing import LabelEncoder, StandardScaler
-from sklearn.model_selection import StratifiedKFold, train_test_split
+import argparse
 import os
+import sys
+from functools import partial
 import json
 import pickle
 from tensorflow.keras.callbacks import Callback, EarlyStopping, ReduceLROnPlateau
 from Create_LSTM_Input import create_dataset
-
-# Callback pour calculer F1 sur split interne
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "eventStore"))
+from event_store import load_events
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "LSTM_Model"))
+from fold_scheduler import add_scheduler_arguments, run_folds
+from input_pipeline import BASE_BATCH_SIZE, fold_datasets, make_dataset, set_learning_rate
+from sequence_windows import (DEFAULT_MAX_GAP_SECONDS, build_sequences, fold_splits, holdout_split,
+                              model_input, scaler_rows)
+from window_features import event_columns, window_starts, window_times
+from streaming_metrics import f1_metrics
+
+# Callback pour calculer F1 sur split interne (optionnel : predict supplémentaire à chaque époque,
+# val_f1 est déjà donné par la métrique StreamingF1)
 class F1ScoreCallback(Callback):
     def __init__(self, validation_data=None, **kwargs):
         super(F1ScoreCallback, self).__init__(**kwargs)
@@ -53,101 +65,133 @@ def create_model(input_shape, num_classes):
     model.compile(
         optimizer='adam',
         loss='sparse_categorical_crossentropy',
-        metrics=['accuracy']
+        metrics=['accuracy'] + f1_metrics(num_classes)  # F1 pondéré/macro en streaming
     )
     return model
 
+# Entraînement et évaluation d'un pli (exécuté dans un worker de run_folds)
+def train_fold(fold, X_train, y_train, X_val, y_val, num_classes, sd, batch_size=BASE_BATCH_SIZE,
+               f1_callback=False, verbose=1):
+    print(f"Traitement du fold {fold}")
+    print(f"[Fold {fold}] Train shape: {X_train.shape}, Val shape: {X_val.shape}")
+    # Standardisation (fit uniquement sur X_train) ; entrée (n, 1, n_features) ou séquences (n, K, n_features)
+    scaler = StandardScaler().fit(scaler_rows(X_train))
+    X_train_s = model_input(X_train, scaler)
+    X_val_s = model_input(X_val, scaler)
+
+    # Création du modèle
+    model = create_model(X_train_s.shape[1:], num_classes)
+    # Learning rate mis à l'échelle si batch_size > 32
+    set_learning_rate(model, batch_size)
+
+    # Callbacks (sur split interne)
+    es = EarlyStopping(monitor='val_loss', patience=5, restore_best_weights=True)
+    rl = ReduceLROnPlateau(monitor='val_loss', factor=0.2, patience=3, min_lr=1e-4)
+    callbacks = [es, rl]
+    if f1_callback:
+        callbacks.insert(0, F1ScoreCallback(validation_data=(make_dataset(X_val_s, batch_size=batch_size), y_val)))
+
+    # Entraînement (pipeline tf.data : cache, shuffle, batch, prefetch)
+    train_ds, val_ds = fold_datasets(X_train_s, y_train, X_val_s, y_val, batch_size, seed=fold)
+    history = model.fit(
+        train_ds,
+        epochs=50,
+        validation_data=val_ds,
+        callbacks=callbacks, verbose=verbose
+    )
+
+    # Évaluation interne
+    y_val_pred = np.argmax(model.predict(make_dataset(X_val_s, batch_size=batch_size), verbose=0), axis=1)
+
+    # Sauvegarde modèle et scaler du pli
+    model_path = f"{sd}/model_fold{fold}.keras"
+    model.save(model_path)
+    with open(f"{sd}/scaler_fold{fold}.pkl", "wb") as f:
+        pickle.dump(scaler, f)
+
+    return {
+        "accuracy": accuracy_score(y_val, y_val_pred),
+        "f1": f1_score(y_val, y_val_pred, average='weighted'),
+        "history": history.history,
+        "val_f1s": history.history['val_f1'],
+        "scaler": scaler,
+        "model_path": model_path,
+    }
+
 if __name__ == "__main__":
+    parser = add_scheduler_arguments(argparse.ArgumentParser(description="Cross-validation LSTM (10 plis)."))
+    parser.add_argument("--batch-size", type=int, default=BASE_BATCH_SIZE,
+                        help="Taille de batch (learning rate mis à l'échelle au-delà de 32)")
+    parser.add_argument("--sequence-length", type=int, default=1,
+                        help="Fenêtres consécutives par échantillon LSTM (1 : une fenêtre, comme avant)")
+    parser.add_argument("--max-gap", type=float, default=DEFAULT_MAX_GAP_SECONDS,
+                        help="Écart max (s) entre deux fenêtres d'une même séquence")
+    parser.add_argument("--f1-callback", action="store_true",
+                        help="F1 de validation recalculé par sklearn (predict supplémentaire à chaque époque)")
+    args = parser.parse_args()
+
     # 1) Chargement et préparation
-    with open('C:/Users/belhi/OneDrive/Bureau/PFa/Deep-Elderly-Activity-Recognition-in-smart-home/Bi-LStm/M_and_D_sensors_labeled_AllSensors.json') as f:
-        data = json.load(f)
+    data = load_events('C:/Users/belhi/OneDrive/Bureau/PFa/Deep-Elderly-Activity-Recognition-in-smart-home/Bi-LStm/M_and_D_sensors_labeled_AllSensors.json').records()
     X, y = create_dataset(data)
     le = LabelEncoder()
     y_enc = le.fit_transform(y)
+
+    # Mode séquence : K fenêtres consécutives par échantillon, sans franchir un changement de jour ni un trou
+    if args.sequence_length > 1:
+        _, event_times, _ = event_columns(data)
+        starts = window_starts(len(event_times), 5)
+        start_times, end_times = window_times(event_times, starts, starts + 5 - 1)
+        X, y_enc = build_sequences(X, y_enc, start_times, end_times, args.sequence_length, args.max_gap)
+        print(f"{len(X)} séquences de {args.sequence_length} fenêtres")
     num_classes = len(le.classes_)
 
-    # 2) Split initial : 80% CV, 20% hold-out
-    X_cv, X_hold, y_cv, y_hold = train_test_split(
-        X, y_enc, test_size=0.2, stratify=y_enc, random_state=42
-    )
+    # 2) Split initial : 80% CV, 20% hold-out (en mode séquence, par blocs contigus : une séquence
+    # ne partage aucune fenêtre avec l'autre côté)
+    X_cv, X_hold, y_cv, y_hold = holdout_split(X, y_enc, test_size=0.2, random_state=42)
 
     # Dossier de sauvegarde global
     sd = 'LSTM_Model/event_based_segmentation/scaler_and_dependencies'
     os.makedirs(sd, exist_ok=True)
 
-    # 3) CV interne 10 plis
-    skf = StratifiedKFold(n_splits=10, shuffle=True, random_state=42)
-    cv_acc, cv_f1 = [], []
+    # 3) CV interne 10 plis (en parallèle avec --workers)
+    results = run_folds(
+        partial(train_fold, num_classes=num_classes, sd=sd, batch_size=args.batch_size, f1_callback=args.f1_callback,
+                verbose=1 if args.workers == 1 else 2),
+        X_cv, y_cv, fold_splits(X_cv, y_cv, n_splits=10, random_state=42),
+        workers=args.workers, intra_op_threads=args.intra_op_threads, inter_op_threads=args.inter_op_threads
+    )
+    cv_acc = [r["accuracy"] for r in results]
+    cv_f1 = [r["f1"] for r in results]
     plt.figure(figsize=(18, 10 * 3))
 
-    fold = 1
-    for train_idx, val_idx in skf.split(X_cv, y_cv):
-        print(f"Traitement du fold {fold}")
-
-        # split 90/10 interne
-        X_train, X_val = X_cv[train_idx], X_cv[val_idx]
-        y_train, y_val = y_cv[train_idx], y_cv[val_idx]
-        print(f"[Fold {fold}] Train shape: {X_train.shape}, Val shape: {X_val.shape}")
-        # Standardisation (fit uniquement sur X_train)
-        scaler = StandardScaler().fit(X_train)
-        X_train_s = scaler.transform(X_train).reshape(-1, 1, X_train.shape[1])
-        X_val_s = scaler.transform(X_val).reshape(-1, 1, X_val.shape[1])
-
-        # Création du modèle
-        model = create_model((1, X_train.shape[1]), num_classes)
-
-        # Callbacks (sur split interne)
-        f1_cb = F1ScoreCallback(validation_data=(X_val_s, y_val))
-        es = EarlyStopping(monitor='val_loss', patience=5, restore_best_weights=True)
-        rl = ReduceLROnPlateau(monitor='val_loss', factor=0.2, patience=3, min_lr=1e-4)
-
-        # Entraînement
-        history = model.fit(
-            X_train_s, y_train,
-            epochs=50, batch_size=32,
-            validation_data=(X_val_s, y_val),
-            callbacks=[f1_cb, es, rl], verbose=1
-        )
-
-        # Évaluation interne
-        y_val_pred = np.argmax(model.predict(X_val_s), axis=1)
-        acc = accuracy_score(y_val, y_val_pred)
-        f1 = f1_score(y_val, y_val_pred, average='weighted')
-        cv_acc.append(acc)
-        cv_f1.append(f1)
+    for r in results:
+        fold, history = r["fold"], r["history"]
 
         # Tracé des courbes
         plt.subplot(10, 3, (fold - 1) * 3 + 1)
-        plt.plot(history.history['loss'], label='train loss')
-        plt.plot(history.history['val_loss'], label='val loss')
+        plt.plot(history['loss'], label='train loss')
+        plt.plot(history['val_loss'], label='val loss')
         plt.legend(); plt.title(f'Fold{fold} Loss')
 
         plt.subplot(10, 3, (fold - 1) * 3 + 2)
-        plt.plot(history.history['accuracy'], label='train acc')
-        plt.plot(history.history['val_accuracy'], label='val acc')
+        plt.plot(history['accuracy'], label='train acc')
+        plt.plot(history['val_accuracy'], label='val acc')
         plt.legend(); plt.title(f'Fold{fold} Acc')
 
         plt.subplot(10, 3, (fold - 1) * 3 + 3)
-        plt.plot(f1_cb.val_f1s, label='val f1')
+        plt.plot(r["val_f1s"], label='val f1')
         plt.legend(); plt.title(f'Fold{fold} F1')
 
-        # Sauvegarde modèle et scaler du pli
-        model.save(f"{sd}/model_fold{fold}.keras")
-        with open(f"{sd}/scaler_fold{fold}.pkl", "wb") as f:
-            pickle.dump(scaler, f)
-
-        fold += 1
-
     # Finalisation des plots CV
     plt.tight_layout()
     plt.savefig(f"{sd}/cv_plots.png")
     plt.show()
 
     # 4) Évaluation finale sur le hold-out (20%)
-    final_scaler = StandardScaler().fit(X_cv)
-    X_hold_s = final_scaler.transform(X_hold).reshape(-1, 1, X_hold.shape[1])
-    best_model = model  # à remplacer par le meilleur si sélection
-    y_hold_pred = np.argmax(best_model.predict(X_hold_s), axis=1)
+    final_scaler = StandardScaler().fit(scaler_rows(X_cv))
+    X_hold_s = model_input(X_hold, final_scaler)
+    best_model = load_model(results[-1]["model_path"])  # dernier pli ; à remplacer par le meilleur si sélection
+    y_hold_pred = np.argmax(best_model.predict(make_dataset(X_hold_s)), axis=1)
     print("Hold-out Acc:", accuracy_score(y_hold, y_hold_pred))
     print("Hold-out F1: ", f1_score(y_hold, y_hold_pred, average='weighted'))
 
@@ -128,8 +128,12 @@ This file focuses on preparing time-series data for LSTM-based activity recognit
 4. save_dataset_to_file(): Outputs the generated dataset to a text file with named features for inspection.
 """
 
+import os
+import sys
 import numpy as np
 from datetime import datetime, timedelta
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "LSTM_Model"))
+from window_features import event_columns, window_starts, window_sensor_counts, encode_time_features
 
 # Time feature encoding functions
 def encode_cyclical_feature(value, period):
@@ -210,81 +214,100 @@ def extract_time_features(dt, prefix=""):
         f'{prefix}time_of_day_cos': time_of_day_cos
     }
 
-def create_dataset(data, time_steps=5, labeled=True):
+def create_dataset(data, time_steps=5, labeled=True, stride=None, cube=None):
     """
     Create a dataset for LSTM input. For labeled data, activity information is processed and labels are generated.
     For unlabeled data (labeled=False), it extracts features using the first and last event timestamps of each window
     and computes sensor counts. Only the feature matrix (X) is returned for unlabeled data.
+
+    The event log is first turned into columns (window_features.event_columns): timestamps are parsed once and
+    the 34 sensor counts of all windows come from a single bincount, so only the sparse activity events are
+    walked window by window. The start/end time features of all windows are encoded in one batch
+    (window_features.encode_time_features).
+
+    With stride < time_steps the windows overlap (stride=1: one window ending at every event). Each window then
+    starts from the activities still open before its first event, and its sensor counts are differences of
+    cumulative counts, so overlapping windows cost no more than non-overlapping ones.
     
     Args:
-        data: list of sensor events (each event is a dict with keys such as "date", "time", "sensor", "state", and optionally "activity")
+        data: list of sensor events (each event is a dict with keys such as "date", "time", "sensor", "state", and optionally "activity"),
+              or the records of an EventStore (load_events(...).records())
         time_steps: Number of consecutive events to form a time window/sequence
         labeled: If True, process activity events to generate labels; if False, ignore activity info.
+        stride: Number of events between the starts of two consecutive windows (default: time_steps,
+                i.e. non-overlapping windows)
+        cube: optional SensorCountCube of the same data, to reuse the prefix sums across calls
+              (e.g. several time_steps/stride settings)
     
     Returns:
         X: Feature matrix as a numpy float32 array.
         If labeled is True, also returns y as a numpy array of labels.
     """
-    X, y = [], []
-    all_sensors = [f"M{i:03d}" for i in range(1, 32)] + ["D001", "D003", "D004"]
-    
+    y = []
+    columns, event_times, activity_events = event_columns(data)
+    starts = window_starts(len(columns), time_steps, stride)
+    if cube is not None:
+        if len(cube) != len(columns):
+            raise ValueError(f"SensorCountCube covers {len(cube)} events, data has {len(columns)}")
+        sensor_counts = cube.counts(starts, starts + time_steps - 1)
+    else:
+        sensor_counts = window_sensor_counts(columns, time_steps, stride)
+    n_windows = len(starts)
+
     # For labeled data, use the original activity tracking method
     if labeled:
-        global_active_activities = {}  # Keeps track of activity start times
+        start_times, end_times, durations = [], [], []
+        # (event index, activity name, action, time) of the well-formed activity events
+        activity_changes = []
+        for event_idx, activity in activity_events:
+            activity_parts = activity.replace(" ", "").split(",")
+            if len(activity_parts) != 2:
+                continue
+            event_dt = event_times[event_idx]
+            if event_dt is None:
+                event_dt = datetime.now()
+            activity_changes.append((event_idx, activity_parts[0], activity_parts[1], event_dt))
+
+        global_active_activities = {}  # Activities open before the first event of the current window
+        global_position = 0  # Activity changes already applied to global_active_activities
         last_majority_activity = None
 
-        start_time_feature_names = [
-            'start_hour_sin', 'start_hour_cos', 'start_minute_sin', 'start_minute_cos',
-            'start_day_sin', 'start_day_cos', 'start_month_sin', 'start_month_cos',
-            'start_day_of_week_sin', 'start_day_of_week_cos'
-        ]
-        end_time_feature_names = [
-            'end_hour_sin', 'end_hour_cos', 'end_minute_sin', 'end_minute_cos',
-            'end_day_sin', 'end_day_cos', 'end_month_sin', 'end_month_cos',
-            'end_day_of_week_sin', 'end_day_of_week_cos'
-        ]
-
-        for i in range(0, len(data) - time_steps + 1, time_steps):
-            sequence = data[i:i + time_steps]
+        for i in starts.tolist():
+            # Bring the open activities up to the start of the window
+            while global_position < len(activity_changes) and activity_changes[global_position][0] < i:
+                event_idx, activity_name, action, event_dt = activity_changes[global_position]
+                global_position += 1
+                if action == "begin":
+                    global_active_activities[activity_name] = (event_idx - i, event_dt)
+                elif action == "end":
+                    global_active_activities.pop(activity_name, None)
+
             activity_durations = {}
             active_activities = global_active_activities.copy()
 
-            # Process events with activity information
-            for j, event in enumerate(sequence):
-                if "activity" in event and event["activity"]:
-                    activity_parts = event["activity"].replace(" ", "").split(",")
-                    if len(activity_parts) != 2:
-                        continue
-                    activity_name, action = activity_parts
-
-                    try:
-                        event_dt = datetime.strptime(f"{event['date']} {event['time']}", "%Y-%m-%d %H:%M:%S.%f")
-                    except ValueError:
-                        try:
-                            event_dt = datetime.strptime(f"{event['date']} {event['time']}", "%Y-%m-%d %H:%M:%S")
-                        except:
-                            event_dt = datetime.now()
-
-                    if action == "begin":
-                        active_activities[activity_name] = (j, event_dt)
-                    elif action == "end":
-                        if activity_name in active_activities:
-                            start_idx, start_dt = active_activities[activity_name]
-                            duration_sec = (event_dt - start_dt).total_seconds()
-                            activity_durations[activity_name] = duration_sec
-                            del active_activities[activity_name]
+            # Process the events of the window carrying activity information
+            k = global_position
+            while k < len(activity_changes) and activity_changes[k][0] < i + time_steps:
+                event_idx, activity_name, action, event_dt = activity_changes[k]
+                k += 1
+
+                if action == "begin":
+                    active_activities[activity_name] = (event_idx - i, event_dt)
+                elif action == "end":
+                    if activity_name in active_activities:
+                        start_idx, start_dt = active_activities[activity_name]
+                        duration_sec = (event_dt - start_dt).total_seconds()
+                        activity_durations[activity_name] = duration_sec
+                        del active_activities[activity_name]
 
             # Handle activities that haven't ended
             for activity, (start_idx, start_dt) in active_activities.items():
-                try:
-                    last_event_dt = datetime.strptime(f"{sequence[-1]['date']} {sequence[-1]['time']}", "%Y-%m-%d %H:%M:%S.%f")
-                except ValueError:
-                    last_event_dt = datetime.strptime(f"{sequence[-1]['date']} {sequence[-1]['time']}", "%Y-%m-%d %H:%M:%S")
+                last_event_dt = event_times[i + time_steps - 1]
+                if last_event_dt is None:
+                    raise ValueError(f"Unparsable date/time for event {i + time_steps - 1}")
                 duration_sec = (last_event_dt - start_dt).total_seconds()
                 activity_durations[activity] = duration_sec
 
-            global_active_activities = active_activities.copy()
-
             if activity_durations:
                 majority_activity = max(activity_durations.items(), key=lambda x: x[1])[0]
             else:
@@ -297,82 +320,43 @@ def create_dataset(data, time_steps=5, labeled=True):
             start_dt = active_activities.get(majority_activity, (0, None))[1]
             end_dt = start_dt + timedelta(seconds=activity_durations.get(majority_activity, 0)) if start_dt else None
 
-            start_features = extract_time_features(start_dt, "start_")
-            end_features = extract_time_features(end_dt, "end_")
-
             duration_norm = activity_durations.get(majority_activity, 0) / 86400
             duration_norm = max(duration_norm, 0.0001)
 
-            sensor_counts = [
-                sum(1 for e in sequence if e["sensor"] == s and (e["state"] == "ON" or e["state"] == "OPEN"))
-                for s in all_sensors
-            ]
-
-            feature_vector = (
-                [start_features[name] for name in start_time_feature_names] +
-                [end_features[name] for name in end_time_feature_names] +
-                [duration_norm] +
-                sensor_counts
-            )
-            
-            X.append(feature_vector)
+            start_times.append(start_dt)
+            end_times.append(end_dt)
+            durations.append(duration_norm)
             y.append(majority_activity)
 
     # For unlabeled data, simply use the first and last event times in each time window.
     else:
-        start_time_feature_names = [
-            'start_hour_sin', 'start_hour_cos', 'start_minute_sin', 'start_minute_cos',
-            'start_day_sin', 'start_day_cos', 'start_month_sin', 'start_month_cos',
-            'start_day_of_week_sin', 'start_day_of_week_cos'
-        ]
-        end_time_feature_names = [
-            'end_hour_sin', 'end_hour_cos', 'end_minute_sin', 'end_minute_cos',
-            'end_day_sin', 'end_day_cos', 'end_month_sin', 'end_month_cos',
-            'end_day_of_week_sin', 'end_day_of_week_cos'
-        ]
-
-        for i in range(0, len(data) - time_steps + 1, time_steps):
-            sequence = data[i:i + time_steps]
-            # Use the time of the first event as start and last event as end
-            try:
-                start_dt = datetime.strptime(f"{sequence[0]['date']} {sequence[0]['time']}", "%Y-%m-%d %H:%M:%S.%f")
-            except ValueError:
-                start_dt = datetime.strptime(f"{sequence[0]['date']} {sequence[0]['time']}", "%Y-%m-%d %H:%M:%S")
-            try:
-                end_dt = datetime.strptime(f"{sequence[-1]['date']} {sequence[-1]['time']}", "%Y-%m-%d %H:%M:%S.%f")
-            except ValueError:
-                end_dt = datetime.strptime(f"{sequence[-1]['date']} {sequence[-1]['time']}", "%Y-%m-%d %H:%M:%S")
-            
-            # Compute duration between first and last event; default to a minimal value if zero.
-            duration_sec = (end_dt - start_dt).total_seconds()
-            duration_norm = max(duration_sec / 86400, 0.0001)
-
-            start_features = extract_time_features(start_dt, "start_")
-            end_features = extract_time_features(end_dt, "end_")
-
-            sensor_counts = [
-                sum(1 for e in sequence if e["sensor"] == s and (e["state"] == "ON" or e["state"] == "OPEN"))
-                for s in all_sensors
-            ]
-
-            feature_vector = (
-                [start_features[name] for name in start_time_feature_names] +
-                [end_features[name] for name in end_time_feature_names] +
-                [duration_norm] +
-                sensor_counts
-            )
-            X.append(feature_vector)
-
-    X = np.array(X, dtype=np.float32)
+        times = np.array(event_times, dtype="datetime64[us]")
+        start_times = times[starts]
+        end_times = times[starts + time_steps - 1]
+        unparsable = np.isnat(start_times) | np.isnat(end_times)
+        if unparsable.any():
+            raise ValueError(f"Unparsable date/time in window {int(np.argmax(unparsable))}")
+
+        # Compute duration between first and last event; default to a minimal value if zero.
+        duration_sec = (end_times - start_times).astype(np.int64) / 1e6
+        durations = np.maximum(duration_sec / 86400, 0.0001)
+
+    # Feature vector: 10 start time features, 10 end time features, normalized duration, 34 sensor counts
+    X = np.empty((n_windows, 21 + sensor_counts.shape[1]), dtype=np.float32)
+    X[:, 0:10] = encode_time_features(start_times)
+    X[:, 10:20] = encode_time_features(end_times)
+    X[:, 20] = durations
+    X[:, 21:] = sensor_counts
     if labeled:
         return X, np.array(y)
     else:
         return X
 
 
-def save_dataset_to_file(X, y, filename="dataset_output.txt"):
+def save_dataset_to_file(X, y, filename="dataset_output.txt", max_rows=None):
     """
     Save the dataset to a readable text file, with named features for easy inspection.
+    Only the first max_rows windows are written if given; use dataset_io.save_dataset() for the full dataset.
     """
     # Build the correct list of feature names based on create_dataset output
     feature_names = []
@@ -405,7 +389,8 @@ def save_dataset_to_file(X, y, filename="dataset_output.txt"):
     feature_names.extend(["D001", "D003", "D004"])
     
     with open(filename, 'w') as f:
-        for i in range(len(X)):
+        n_rows = len(X) if max_rows is None else min(len(X), max_rows)
+        for i in range(n_rows):
             f.write(f"X[{i}]: [\n")
             
             # Write time features (20 features)
@@ -428,4 +413,5 @@ def save_dataset_to_file(X, y, filename="dataset_output.txt"):
             
             f.write("]\n")
             f.write(f"y[{i}]: '{y[i]}'\n")
-            f.write("_" * 50 + "\n\n")
\ No newline at end of file
+            f.write("_" * 50 + "\n\n")
+
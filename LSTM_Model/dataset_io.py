@@ -0,0 +1,257 @@
+"""
+dataset_io.py
+
+Binary export/import of the datasets built by create_dataset(), replacing the text dumps of
+save_dataset_to_file() as the format exchanged between the training and test scripts.
+
+A dataset is one .npz file holding:
+- X: float32 feature matrix (n_windows, n_features)
+- y: labels as strings (empty array for unlabeled data)
+- feature_names: name of every column of X
+- schema: JSON with the format version and the parameters used to build the dataset
+
+The text dump of save_dataset_to_file() (Create_LSTM_Input.py) is kept as an optional human-readable
+preview of the first rows (max_rows). Existing dumps are read by a streaming parser
+(iter_feature_text / read_feature_text) and converted once by load_feature_text, or with:
+    python LSTM_Model/dataset_io.py featureExtracted(w=5).txt [...]
+
+Two .npz files can sit next to a dump foo.txt:
+- foo.npz (export_path): the full dataset exported by the training script. load_feature_text() loads it
+  instead of parsing the dump, which may be a preview of its first rows only, and never writes it.
+- foo.cache.npz (text_cache_path): the parsed dump, its schema recording the text file it comes from.
+"""
+
+import argparse
+import json
+import os
+import sys
+import numpy as np
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from window_features import FEATURE_NAMES
+
+DATASET_VERSION = 1
+
+
+def save_dataset(path, X, y=None, feature_names=FEATURE_NAMES, params=None):
+    """
+    Args:
+        path: .npz file to write
+        X: feature matrix
+        y: labels (None for unlabeled data)
+        feature_names: column names of X
+        params: parameters used to build the dataset (time_steps, ...), stored in the schema
+    """
+    X = np.asarray(X, dtype=np.float32)
+    if X.ndim != 2 or X.shape[1] != len(feature_names):
+        raise ValueError(f"X has shape {X.shape}, expected (n, {len(feature_names)}) for the feature names")
+    if y is not None and len(y) != len(X):
+        raise ValueError(f"{len(y)} labels for {len(X)} rows")
+    schema = {"version": DATASET_VERSION, "labeled": y is not None, "params": params}
+    np.savez(
+        path,
+        X=X,
+        y=np.asarray([] if y is None else y).astype(str),
+        feature_names=np.asarray(feature_names, dtype=str),
+        schema=np.asarray(json.dumps(schema)),
+    )
+
+
+def align_features(X, names, feature_names):
+    """
+    Columns of X (named names) reordered to feature_names; features missing from names are 0.
+    """
+    if list(names) == list(feature_names):
+        return X
+    columns = {name: j for j, name in enumerate(names)}
+    aligned = np.zeros((len(X), len(feature_names)), dtype=np.float32)
+    for k, name in enumerate(feature_names):
+        if name in columns:
+            aligned[:, k] = X[:, columns[name]]
+    return aligned
+
+
+def load_dataset(path, feature_names=None):
+    """
+    Args:
+        path: .npz file written by save_dataset()
+        feature_names: optional expected column order; X is realigned to it
+
+    Returns:
+        X (float32), y (array of str, or None if unlabeled), feature names of the returned X
+    """
+    with np.load(path) as data:
+        schema = json.loads(str(data["schema"]))
+        if schema["version"] > DATASET_VERSION:
+            raise ValueError(f"{path}: dataset format version {schema['version']} is not supported")
+        X = data["X"]
+        y = data["y"] if schema["labeled"] else None
+        names = data["feature_names"].tolist()
+    if feature_names is not None:
+        X = align_features(X, names, feature_names)
+        names = list(feature_names)
+    return X, y, names
+
+
+def label_or_none(label):
+    """Label of the text dumps and saved datasets: empty and "None" mean no label."""
+    return label if label and label.lower() != "none" else None
+
+
+def iter_feature_text(path, feature_names=FEATURE_NAMES, chunk_rows=4096):
+    """
+    Single pass over a text dump of save_dataset_to_file(), line by line: memory is bounded by one
+    block of chunk_rows windows, whatever the size of the file.
+
+    Args:
+        path: featureExtracted*.txt file
+        feature_names: column order of the yielded blocks; features absent from a window are 0,
+                       unknown names are ignored (as features_to_vector did)
+        chunk_rows: windows per yielded block
+
+    Yields:
+        X (float32, (<= chunk_rows, len(feature_names))), y (list of labels, None if missing)
+    """
+    columns = {name: j for j, name in enumerate(feature_names)}
+    chunk = np.zeros((chunk_rows, len(feature_names)), dtype=np.float32)
+    labels = []
+    row = None
+    in_features = False
+    with open(path, "r") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            first = line[0]
+            if first == "'" and in_features:
+                # 'name': value,  # comment
+                end = line.index("'", 1)
+                j = columns.get(line[1:end])
+                if j is not None:
+                    value = line[end + 2:]
+                    if "#" in value:
+                        value = value.split("#", 1)[0]
+                    row[j] = float(value.strip().rstrip(","))
+            elif first == "X" and line.startswith("X["):
+                if len(labels) == chunk_rows:
+                    yield chunk.copy(), labels
+                    labels = []
+                row = chunk[len(labels)]
+                row[:] = 0
+                labels.append(None)
+                in_features = True
+            elif first == "]":
+                in_features = False
+            elif first == "y" and line.startswith("y[") and row is not None:
+                label = line.split(":", 1)[1].strip()
+                if len(label) >= 2 and label[0] == label[-1] == "'":
+                    labels[-1] = label_or_none(label[1:-1])
+                row = None
+    if labels:
+        yield chunk[:len(labels)].copy(), labels
+
+
+def read_feature_text(path, feature_names=FEATURE_NAMES, chunk_rows=4096):
+    """
+    Whole text dump as arrays (see iter_feature_text).
+
+    Returns:
+        X (float32, (n_windows, len(feature_names))), y (list of labels, None if missing)
+    """
+    blocks, y = [], []
+    for X_block, y_block in iter_feature_text(path, feature_names, chunk_rows):
+        blocks.append(X_block)
+        y.extend(y_block)
+    if not blocks:
+        return np.zeros((0, len(feature_names)), dtype=np.float32), y
+    return np.concatenate(blocks), y
+
+
+def export_path(path):
+    """Full dataset exported by a training script next to its text dump: foo.txt -> foo.npz"""
+    return os.path.splitext(path)[0] + ".npz"
+
+
+def text_cache_path(path):
+    """Parsed text dump: featureExtracted(w=5).txt -> featureExtracted(w=5).cache.npz"""
+    return os.path.splitext(path)[0] + ".cache.npz"
+
+
+def text_source(npz_path):
+    """
+    Name of the text dump a .npz was parsed from, None for a dataset exported by a training script
+    (or if npz_path does not exist).
+    """
+    if not os.path.exists(npz_path):
+        return None
+    with np.load(npz_path) as data:
+        params = json.loads(str(data["schema"])).get("params") or {}
+    return params.get("text_source")
+
+
+def _labels(X, y):
+    if y is None:
+        return X, [None] * len(X)
+    return X, [label_or_none(label) for label in y.tolist()]
+
+
+def save_text_cache(path, X, y, feature_names=FEATURE_NAMES):
+    """
+    Save a parsed text dump to text_cache_path(path), unless that file exists and was not parsed from path.
+
+    Returns:
+        the .npz path, or None if it was left untouched
+    """
+    npz_path = text_cache_path(path)
+    if os.path.exists(npz_path) and text_source(npz_path) != os.path.basename(path):
+        print(f"WARNING: {npz_path} was not parsed from {path}, it is not overwritten")
+        return None
+    save_dataset(npz_path, X, [label if label is not None else "" for label in y], feature_names,
+                 params={"text_source": os.path.basename(path)})
+    return npz_path
+
+
+def load_feature_text(path, feature_names=FEATURE_NAMES, cache=True, prefer_export=True):
+    """
+    Dataset of a text dump.
+
+    - If the training script exported the full dataset next to it (export_path), that dataset is used.
+    - Otherwise the dump is parsed once: the result is saved to text_cache_path(path) and reused as long
+      as it is not older than the text file (or if the text file no longer exists).
+
+    Args:
+        prefer_export: load export_path(path) when it exists (False: always use the text dump)
+
+    Returns:
+        X (float32), y (list of labels, None if missing)
+    """
+    full_path = export_path(path)
+    if prefer_export and os.path.exists(full_path) and text_source(full_path) is None:
+        print(f"Loading the full dataset {full_path} instead of the text dump {path}")
+        X, y, _ = load_dataset(full_path, feature_names)
+        return _labels(X, y)
+
+    npz_path = text_cache_path(path)
+    if cache and text_source(npz_path) == os.path.basename(path) and (
+            not os.path.exists(path) or os.path.getmtime(npz_path) >= os.path.getmtime(path)):
+        X, y, _ = load_dataset(npz_path, feature_names)
+        return _labels(X, y)
+
+    X, y = read_feature_text(path, feature_names)
+    if cache and save_text_cache(path, X, y, feature_names):
+        print(f"Converted {path} -> {npz_path} ({len(X)} windows)")
+    return X, y
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert featureExtracted*.txt dumps to binary datasets (.cache.npz).")
+    parser.add_argument("files", nargs="+", help="Text dumps written by save_dataset_to_file()")
+    args = parser.parse_args()
+    for path in args.files:
+        X, y = read_feature_text(path)
+        npz_path = save_text_cache(path, X, y)
+        if npz_path:
+            print(f"{path} -> {npz_path}: {X.shape[0]} windows, {sum(label is not None for label in y)} labeled")
+
+
+if __name__ == "__main__":
+    main()
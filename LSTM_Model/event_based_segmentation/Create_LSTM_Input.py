@@ -128,8 +128,13 @@ This file focuses on preparing time-series data for LSTM-based activity recognit
 4. save_dataset_to_file(): Outputs the generated dataset to a text file with named features for inspection.
 """
 
+import os
+import sys
+import time
 import numpy as np
 from datetime import datetime, timedelta
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from window_features import event_columns, window_starts, window_sensor_counts, encode_time_features
 
 # Time feature encoding functions
 def encode_cyclical_feature(value, period):
@@ -210,11 +215,152 @@ def extract_time_features(dt, prefix=""):
         f'{prefix}time_of_day_cos': time_of_day_cos
     }
 
-def create_dataset(data, time_steps=5, labeled=True):
+def create_dataset(data, time_steps=5, labeled=True, stride=None, cube=None):
     """
     Create a dataset for LSTM input. For labeled data, activity information is processed and labels are generated.
     For unlabeled data (labeled=False), it extracts features using the first and last event timestamps of each window
     and computes sensor counts. Only the feature matrix (X) is returned for unlabeled data.
+
+    The event log is first turned into columns (window_features.event_columns): timestamps are parsed once and
+    the 34 sensor counts of all windows come from a single bincount, so only the sparse activity events are
+    walked window by window. The start/end time features of all windows are encoded in one batch
+    (window_features.encode_time_features).
+
+    With stride < time_steps the windows overlap (stride=1: one window ending at every event). Each window then
+    starts from the activities still open before its first event, and its sensor counts are differences of
+    cumulative counts, so overlapping windows cost no more than non-overlapping ones.
+    
+    Args:
+        data: list of sensor events (each event is a dict with keys such as "date", "time", "sensor", "state", and optionally "activity"),
+              or the records of an EventStore (load_events(...).records())
+        time_steps: Number of consecutive events to form a time window/sequence
+        labeled: If True, process activity events to generate labels; if False, ignore activity info.
+        stride: Number of events between the starts of two consecutive windows (default: time_steps,
+                i.e. non-overlapping windows)
+        cube: optional SensorCountCube of the same data, to reuse the prefix sums across calls
+              (e.g. several time_steps/stride settings)
+    
+    Returns:
+        X: Feature matrix as a numpy float32 array.
+        If labeled is True, also returns y as a numpy array of labels.
+    """
+    y = []
+    columns, event_times, activity_events = event_columns(data)
+    starts = window_starts(len(columns), time_steps, stride)
+    if cube is not None:
+        if len(cube) != len(columns):
+            raise ValueError(f"SensorCountCube covers {len(cube)} events, data has {len(columns)}")
+        sensor_counts = cube.counts(starts, starts + time_steps - 1)
+    else:
+        sensor_counts = window_sensor_counts(columns, time_steps, stride)
+    n_windows = len(starts)
+
+    # For labeled data, use the original activity tracking method
+    if labeled:
+        start_times, end_times, durations = [], [], []
+        # (event index, activity name, action, time) of the well-formed activity events
+        activity_changes = []
+        for event_idx, activity in activity_events:
+            activity_parts = activity.replace(" ", "").split(",")
+            if len(activity_parts) != 2:
+                continue
+            event_dt = event_times[event_idx]
+            if event_dt is None:
+                event_dt = datetime.now()
+            activity_changes.append((event_idx, activity_parts[0], activity_parts[1], event_dt))
+
+        global_active_activities = {}  # Activities open before the first event of the current window
+        global_position = 0  # Activity changes already applied to global_active_activities
+        last_majority_activity = None
+
+        for i in starts.tolist():
+            # Bring the open activities up to the start of the window
+            while global_position < len(activity_changes) and activity_changes[global_position][0] < i:
+                event_idx, activity_name, action, event_dt = activity_changes[global_position]
+                global_position += 1
+                if action == "begin":
+                    global_active_activities[activity_name] = (event_idx - i, event_dt)
+                elif action == "end":
+                    global_active_activities.pop(activity_name, None)
+
+            activity_durations = {}
+            active_activities = global_active_activities.copy()
+
+            # Process the events of the window carrying activity information
+            k = global_position
+            while k < len(activity_changes) and activity_changes[k][0] < i + time_steps:
+                event_idx, activity_name, action, event_dt = activity_changes[k]
+                k += 1
+
+                if action == "begin":
+                    active_activities[activity_name] = (event_idx - i, event_dt)
+                elif action == "end":
+                    if activity_name in active_activities:
+                        start_idx, start_dt = active_activities[activity_name]
+                        duration_sec = (event_dt - start_dt).total_seconds()
+                        activity_durations[activity_name] = duration_sec
+                        del active_activities[activity_name]
+
+            # Handle activities that haven't ended
+            for activity, (start_idx, start_dt) in active_activities.items():
+                last_event_dt = event_times[i + time_steps - 1]
+                if last_event_dt is None:
+                    raise ValueError(f"Unparsable date/time for event {i + time_steps - 1}")
+                duration_sec = (last_event_dt - start_dt).total_seconds()
+                activity_durations[activity] = duration_sec
+
+            if activity_durations:
+                majority_activity = max(activity_durations.items(), key=lambda x: x[1])[0]
+            else:
+                majority_activity = last_majority_activity or "None"
+
+            if majority_activity == "None" and last_majority_activity:
+                majority_activity = last_majority_activity
+            last_majority_activity = majority_activity
+
+            start_dt = active_activities.get(majority_activity, (0, None))[1]
+            end_dt = start_dt + timedelta(seconds=activity_durations.get(majority_activity, 0)) if start_dt else None
+
+            duration_norm = activity_durations.get(majority_activity, 0) / 86400
+            duration_norm = max(duration_norm, 0.0001)
+
+            start_times.append(start_dt)
+            end_times.append(end_dt)
+            durations.append(duration_norm)
+            y.append(majority_activity)
+
+    # For unlabeled data, simply use the first and last event times in each time window.
+    else:
+        times = np.array(event_times, dtype="datetime64[us]")
+        start_times = times[starts]
+        end_times = times[starts + time_steps - 1]
+        unparsable = np.isnat(start_times) | np.isnat(end_times)
+        if unparsable.any():
+            raise ValueError(f"Unparsable date/time in window {int(np.argmax(unparsable))}")
+
+        # Compute duration between first and last event; default to a minimal value if zero.
+        duration_sec = (end_times - start_times).astype(np.int64) / 1e6
+        durations = np.maximum(duration_sec / 86400, 0.0001)
+
+    # Feature vector: 10 start time features, 10 end time features, normalized duration, 34 sensor counts
+    X = np.empty((n_windows, 21 + sensor_counts.shape[1]), dtype=np.float32)
+    X[:, 0:10] = encode_time_features(start_times)
+    X[:, 10:20] = encode_time_features(end_times)
+    X[:, 20] = durations
+    X[:, 21:] = sensor_counts
+    if labeled:
+        return X, np.array(y)
+    else:
+        return X
+
+
+def create_dataset_loop(data, time_steps=5, labeled=True):
+    """
+    Previous event-by-event implementation of create_dataset(), kept as the reference for benchmark().
+
+    Create a dataset for LSTM input. For labeled data, activity information is processed and labels are generated.
+    For unlabeled data (labeled=False), it extracts features using the first and last event timestamps of each window
+    and computes sensor counts. Only the feature matrix (X) is returned for unlabeled data.
     
     Args:
         data: list of sensor events (each event is a dict with keys such as "date", "time", "sensor", "state", and optionally "activity")
@@ -370,9 +516,29 @@ def create_dataset(data, time_steps=5, labeled=True):
         return X
 
 
-def save_dataset_to_file(X, y, filename="dataset_output.txt"):
+def benchmark(data, time_steps=5):
+    """Time create_dataset() against create_dataset_loop() on the same data and check X/y are identical."""
+    records = list(data)
+
+    start = time.perf_counter()
+    X_loop, y_loop = create_dataset_loop(records, time_steps)
+    loop_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    X, y = create_dataset(data, time_steps)
+    seconds = time.perf_counter() - start
+
+    print(f"Benchmark on {len(records)} events, {len(X)} windows of {time_steps} events:")
+    print(f"  per-window loop: {loop_seconds:.3f} s")
+    print(f"  vectorized:      {seconds:.3f} s")
+    print(f"  speedup: x{loop_seconds / max(seconds, 1e-9):.1f}")
+    print(f"  identical X/y: {X_loop.tobytes() == X.tobytes() and np.array_equal(y_loop, y)}")
+
+
+def save_dataset_to_file(X, y, filename="dataset_output.txt", max_rows=None):
     """
     Save the dataset to a readable text file, with named features for easy inspection.
+    Only the first max_rows windows are written if given; use dataset_io.save_dataset() for the full dataset.
     """
     # Build the correct list of feature names based on create_dataset output
     feature_names = []
@@ -405,7 +571,8 @@ def save_dataset_to_file(X, y, filename="dataset_output.txt"):
     feature_names.extend(["D001", "D003", "D004"])
     
     with open(filename, 'w') as f:
-        for i in range(len(X)):
+        n_rows = len(X) if max_rows is None else min(len(X), max_rows)
+        for i in range(n_rows):
             f.write(f"X[{i}]: [\n")
             
             # Write time features (20 features)
@@ -428,4 +595,14 @@ def save_dataset_to_file(X, y, filename="dataset_output.txt"):
             
             f.write("]\n")
             f.write(f"y[{i}]: '{y[i]}'\n")
-            f.write("_" * 50 + "\n\n")
\ No newline at end of file
+            f.write("_" * 50 + "\n\n")
+
+
+if __name__ == "__main__":
+    # Benchmark on the full labeled dataset:
+    # python LSTM_Model/event_based_segmentation/Create_LSTM_Input.py [file.json] [time_steps]
+    sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "eventStore"))
+    from event_store import load_events
+    file_path = sys.argv[1] if len(sys.argv) > 1 else 'LSTM_Model/event_based_segmentation/M_and_D_sensors_labeled_AllSensors.json'
+    time_steps = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    benchmark(load_events(file_path).records(), time_steps)
@@ -1,83 +1,21 @@
-import re
-import ast
+import os
+import sys
 import numpy as np
-import tensorflow as tf
-import pickle
 from sklearn.metrics import classification_report, f1_score
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "eventStore"))
+from event_store import load_events
+from dataset_io import load_feature_text
+from inference import Predictor
+from sequence_windows import DEFAULT_MAX_GAP_SECONDS
+from window_features import event_columns, window_starts, window_times
 
-# -------------------------------
-# Step 1: Parse features from text file
-# -------------------------------
-def parse_feature_file(filename):
-    """
-    Parses a feature file containing blocks of X[i] and y[i] entries.
-    Returns two lists: features (dicts) and labels.
-    """
-    X = []
-    y = []
-
-    with open(filename, 'r') as f:
-        content = f.read()
-
-    blocks = content.split("__________________________________________________")
-    for block in blocks:
-        block = block.strip()
-        if not block:
-            continue
-
-        # Extract features
-        match = re.search(r"X\[\d+\]:\s*\[(.*?)\]\s*", block, re.DOTALL)
-        if match:
-            features_text = match.group(1).strip()
-            lines = features_text.splitlines()
-            cleaned_lines = []
-            for line in lines:
-                line = line.split('#')[0].strip()
-                if line.endswith(','):
-                    line = line[:-1].strip()
-                if line:
-                    cleaned_lines.append(line)
-            dict_str = "{" + ", ".join(cleaned_lines) + "}"
-            try:
-                feature_dict = ast.literal_eval(dict_str)
-                X.append(feature_dict)
-            except Exception as e:
-                print(f"Error parsing block: {e}")
-                continue
-        else:
-            print("No features found in block:")
-            print(block)
-            continue
-
-        # Extract label (if exists)
-        match_y = re.search(r"y\[\d+\]:\s*'([^']*)'", block)
-        if match_y:
-            label = match_y.group(1)
-            y.append(label if label and label.lower() != "none" else None)
-        else:
-            y.append(None)
-
-    return X, y
-
-# -------------------------------
-# Step 2: Load and prepare data
-# -------------------------------
-feature_file = "LSTM_Model/event_based_segmentation/featureExtracted(w=5).txt"
-X_all, y_all = parse_feature_file(feature_file)
-
-# Convert all to labeled
-X_labeled = X_all
-y_labeled = y_all
-
-# Simulate unlabeled data (for prediction only)
-X_unlabeled = X_all.copy()
-
-print(f"Loaded {len(X_all)} samples:")
-print(f"  {len(X_labeled)} labeled")
-print(f"  {len(X_unlabeled)} used as unlabeled for prediction")
+# Event log the windows were built from (needed for models trained with --sequence-length K)
+events_file = 'LSTM_Model/event_based_segmentation/M_and_D_sensors_labeled_AllSensors.json'
+time_steps = 5
 
 # -------------------------------
-# Step 3: Define feature names (must match the order in the .txt)
+# Step 1: Define feature names (order of the model input)
 # -------------------------------
 feature_names = [
     'start_hour_sin', 'start_hour_cos', 'start_minute_sin', 'start_minute_cos',
@@ -93,60 +31,79 @@ for i in range(1, 32):
 feature_names.extend(["D001", "D003", "D004"])
 
 # -------------------------------
-# Step 4: Helper to convert dict -> vector
+# Step 2: Load and prepare data
 # -------------------------------
-def features_to_vector(feature_dict, feature_names):
-    return np.array([feature_dict.get(name, 0.0) for name in feature_names], dtype=np.float32)
+# The full dataset exported by the training script (featureExtracted(w=5).npz) is loaded if present;
+# otherwise the .txt dump is parsed once (streaming) and cached as featureExtracted(w=5).cache.npz
+feature_file = "LSTM_Model/event_based_segmentation/featureExtracted(w=5).txt"
+X_all_np, y_all = load_feature_text(feature_file, feature_names)
 
-# Convert to NumPy arrays
-X_labeled_np = np.array([features_to_vector(f, feature_names) for f in X_labeled])
-X_unlabeled_np = np.array([features_to_vector(f, feature_names) for f in X_unlabeled])
+# Convert all to labeled
+X_labeled_np = X_all_np
+y_labeled = y_all
+
+# Simulate unlabeled data (for prediction only)
+X_unlabeled_np = X_all_np
+
+print(f"Loaded {len(X_all_np)} samples:")
+print(f"  {len(X_labeled_np)} labeled")
+print(f"  {len(X_unlabeled_np)} used as unlabeled for prediction")
 
 # -------------------------------
-# Step 5: Load model, scaler, and classes
+# Step 3: Load model, scaler, and classes
 # -------------------------------
 model_path = 'LSTM_Model/event_based_segmentation/scaler_and_dependencies/lstm_activity_classifier_fold1_with_extended_time.keras'
 scaler_path = 'LSTM_Model/event_based_segmentation/scaler_and_dependencies/feature_scaler_fold1_with_extended_time.pkl'
 classes_path = 'LSTM_Model/event_based_segmentation/scaler_and_dependencies/activity_classes.npy'
 
-print("Loading model...")
-model = tf.keras.models.load_model(model_path, compile=False)
-
-print("Loading scaler...")
-with open(scaler_path, 'rb') as f:
-    scaler = pickle.load(f)
+print("Loading model, scaler and class labels...")
+predictor = Predictor(model_path, scaler_path, classes_path)
+print(f"Activity classes: {predictor.classes}")
+print(f"Scaler folded into the first layer: {predictor.folded}")
+
+# One batched forward pass: the labeled and "unlabeled" sets are the same windows
+print("Predicting...")
+if predictor.sequence_length > 1:
+    # Model trained with --sequence-length K: one sample per window ending a sequence of K windows
+    # (same day, no gap above DEFAULT_MAX_GAP_SECONDS), as in training
+    print(f"Sequence model: {predictor.sequence_length} windows per sample")
+    _, event_times, _ = event_columns(load_events(events_file).records())
+    starts = window_starts(len(event_times), time_steps)
+    start_times, end_times = window_times(event_times, starts, starts + time_steps - 1)
+    model_inputs = predictor.sequence_inputs(X_all_np, start_times, end_times, DEFAULT_MAX_GAP_SECONDS)
+    window_rows = model_inputs.last_rows()
+    # The windows without K - 1 predecessors in their run get no prediction
+    y_labeled = [y_all[i] for i in window_rows.tolist()]
+    X_labeled_np = X_unlabeled_np = X_all_np[window_rows]
+    print(f"{len(window_rows)} sequences of {predictor.sequence_length} windows")
+else:
+    model_inputs = X_all_np
+pred_classes_all, probabilities_all = predictor.predict(model_inputs)
+pred_activities_all = predictor.activities(pred_classes_all)
 
-print("Loading class labels...")
-class_labels = np.load(classes_path, allow_pickle=True)
-print(f"Activity classes: {class_labels}")
+print("\nInference latency/throughput:")
+predictor.benchmark(model_inputs)
 
 # -------------------------------
-# Step 6: Predict on unlabeled data
+# Step 4: Predict on unlabeled data
 # -------------------------------
 if X_unlabeled_np.size == 0:
     print("No unlabeled data available.")
 else:
-    print("Standardizing and predicting on unlabeled data...")
-    X_unlabeled_scaled = scaler.transform(X_unlabeled_np)
-    X_unlabeled_scaled = X_unlabeled_scaled.reshape((X_unlabeled_scaled.shape[0], 1, X_unlabeled_scaled.shape[1]))
-    preds_unlabeled = model.predict(X_unlabeled_scaled)
-    pred_classes_unlabeled = np.argmax(preds_unlabeled, axis=1)
-    pred_activities_unlabeled = class_labels[pred_classes_unlabeled]
+    pred_classes_unlabeled = pred_classes_all
+    pred_activities_unlabeled = pred_activities_all
 
     print("\nPredictions on unlabeled data:")
     for i, activity in enumerate(pred_activities_unlabeled[:20]):
         print(f"Sample {i+1}: Predicted Activity: {activity}")
 
 # -------------------------------
-# Step 7: Evaluate on labeled data
+# Step 5: Evaluate on labeled data
 # -------------------------------
 if len(X_labeled_np) > 0:
-    print("Standardizing and evaluating labeled data...")
-    X_labeled_scaled = scaler.transform(X_labeled_np)
-    X_labeled_scaled = X_labeled_scaled.reshape((X_labeled_scaled.shape[0], 1, X_labeled_scaled.shape[1]))
-    preds_labeled = model.predict(X_labeled_scaled)
-    pred_classes_labeled = np.argmax(preds_labeled, axis=1)
-    pred_activities_labeled = class_labels[pred_classes_labeled]
+    print("Evaluating labeled data...")
+    pred_classes_labeled = pred_classes_all
+    pred_activities_labeled = pred_activities_all
 
     unique_acts = np.unique(np.append(y_labeled, pred_activities_labeled))
     label_map = {label: i for i, label in enumerate(unique_acts)}
@@ -162,7 +119,7 @@ if len(X_labeled_np) > 0:
     print(f"Overall Macro F1 Score: {report['macro avg']['f1-score']:.4f}")
 
 # -------------------------------
-# Step 8: Save results to file
+# Step 6: Save results to file
 # -------------------------------
 with open('prediction_results.txt', 'w') as f:
     f.write("Predictions on Unlabeled Data:\n")
@@ -0,0 +1,209 @@
+"""
+feature_cache.py
+
+On-disk cache of the datasets built by create_dataset(), so that a training run does not rebuild
+X/y from the raw JSON when neither the data nor the segmentation parameters changed.
+
+Each entry is a directory named after a key derived from:
+- the SHA-256 of the event store load_events() reads for the input file (columns and vocabularies),
+  so a store rewritten from another source (csv_to_json, cleaning.py) changes the key,
+- the segmentation parameters (e.g. {"segmentation": "event", "time_steps": 10}),
+- FEATURES_VERSION, to be increased whenever the feature extraction changes.
+
+An entry holds X.npy (float32, opened memory-mapped), y.npy and meta.json (feature names, parameters,
+size, creation and last use times). The cache is bounded in size: after every insertion the least
+recently used entries are removed until the total fits in max_bytes.
+
+Command line:
+    python LSTM_Model/feature_cache.py list [--dir DIR]
+    python LSTM_Model/feature_cache.py clear [KEY ...] [--dir DIR]
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sys
+import time
+import numpy as np
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "eventStore"))
+from event_store import COLUMN_DTYPES, ensure_event_store
+from window_features import FEATURE_NAMES
+
+FEATURES_VERSION = 1
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "feature_cache")
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3
+HASH_CHUNK_SIZE = 1 << 20
+
+
+def data_hash(path):
+    """
+    SHA-256 of the events load_events(path) returns: the column files and the meta.json of the store
+    it opens (built or refreshed first if needed), read in chunks. The source fingerprint of meta.json
+    is left out, so touching an unchanged JSON file keeps the key.
+    """
+    store_path = ensure_event_store(path)
+    with open(os.path.join(store_path, "meta.json"), "r") as f:
+        meta = json.load(f)
+    meta.pop("source", None)
+    digest = hashlib.sha256(json.dumps(meta, sort_keys=True).encode("utf-8"))
+    for column in COLUMN_DTYPES:
+        with open(os.path.join(store_path, f"{column}.bin"), "rb") as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+
+def cache_key(input_path, params):
+    """Key of the dataset built from input_path with the given segmentation parameters."""
+    description = json.dumps(
+        {"data": data_hash(input_path), "params": params, "version": FEATURES_VERSION}, sort_keys=True
+    )
+    return hashlib.sha256(description.encode("utf-8")).hexdigest()[:24]
+
+
+class FeatureCache:
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        """
+        Args:
+            cache_dir: directory holding one sub-directory per entry
+            max_bytes: total size above which the least recently used entries are evicted
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+
+    def _entry_dir(self, key):
+        return os.path.join(self.cache_dir, key)
+
+    def _read_meta(self, key):
+        with open(os.path.join(self._entry_dir(key), "meta.json"), "r") as f:
+            return json.load(f)
+
+    def _write_meta(self, key, meta):
+        meta_path = os.path.join(self._entry_dir(key), "meta.json")
+        with open(meta_path + ".tmp", "w") as f:
+            json.dump(meta, f, indent=2)
+        os.replace(meta_path + ".tmp", meta_path)
+
+    def get(self, key, mmap=True):
+        """
+        Returns:
+            (X, y, feature_names) of the entry, or None if it is not cached.
+            X is memory-mapped (read-only) unless mmap is False.
+        """
+        entry_dir = self._entry_dir(key)
+        if not os.path.exists(os.path.join(entry_dir, "meta.json")):
+            return None
+        meta = self._read_meta(key)
+        X = np.load(os.path.join(entry_dir, "X.npy"), mmap_mode="r" if mmap else None)
+        y = np.load(os.path.join(entry_dir, "y.npy"))
+        meta["last_used"] = time.time()
+        self._write_meta(key, meta)
+        return X, y, meta["feature_names"]
+
+    def put(self, key, X, y, feature_names=FEATURE_NAMES, params=None, source=None):
+        """Store a dataset under key, then evict least recently used entries beyond max_bytes."""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        entry_dir = self._entry_dir(key)
+        tmp_dir = entry_dir + ".tmp"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+        np.save(os.path.join(tmp_dir, "X.npy"), np.asarray(X, dtype=np.float32))
+        np.save(os.path.join(tmp_dir, "y.npy"), np.asarray(y).astype(str))
+        size = sum(os.path.getsize(os.path.join(tmp_dir, name)) for name in ("X.npy", "y.npy"))
+        now = time.time()
+        meta = {
+            "key": key,
+            "source": source,
+            "params": params,
+            "feature_names": list(feature_names),
+            "shape": list(np.shape(X)),
+            "size": size,
+            "created": now,
+            "last_used": now,
+        }
+        with open(os.path.join(tmp_dir, "meta.json"), "w") as f:
+            json.dump(meta, f, indent=2)
+        # The entry only appears once complete
+        shutil.rmtree(entry_dir, ignore_errors=True)
+        os.replace(tmp_dir, entry_dir)
+        self.evict(keep=key)
+
+    def entries(self):
+        """meta.json content of every entry, most recently used first."""
+        if not os.path.isdir(self.cache_dir):
+            return []
+        entries = []
+        for key in os.listdir(self.cache_dir):
+            if not key.endswith(".tmp") and os.path.exists(os.path.join(self._entry_dir(key), "meta.json")):
+                entries.append(self._read_meta(key))
+        entries.sort(key=lambda meta: meta["last_used"], reverse=True)
+        return entries
+
+    def evict(self, max_bytes=None, keep=None):
+        """Remove least recently used entries (never keep) until the cache fits in max_bytes."""
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        entries = self.entries()
+        total = sum(meta["size"] for meta in entries)
+        for meta in reversed(entries):
+            if total <= max_bytes:
+                break
+            if meta["key"] == keep:
+                continue
+            self.remove(meta["key"])
+            total -= meta["size"]
+            print(f"Feature cache: evicted {meta['key']} ({meta['size'] / 1e6:.1f} MB)")
+
+    def remove(self, key):
+        shutil.rmtree(self._entry_dir(key), ignore_errors=True)
+
+    def clear(self):
+        for meta in self.entries():
+            self.remove(meta["key"])
+
+    def load_or_create(self, input_path, params, build):
+        """
+        Cached dataset for input_path and params, built with build() -> (X, y) on a miss.
+
+        Returns:
+            X, y
+        """
+        key = cache_key(input_path, params)
+        cached = self.get(key)
+        if cached is not None:
+            X, y, _ = cached
+            print(f"Loaded features from cache ({key}): {X.shape[0]} sequences")
+            return X, y
+        X, y = build()
+        self.put(key, X, y, params=params, source=os.path.abspath(input_path))
+        print(f"Features saved to cache ({key})")
+        return X, y
+
+
+def main():
+    parser = argparse.ArgumentParser(description="List or clear the cached feature datasets.")
+    parser.add_argument("command", choices=["list", "clear"])
+    parser.add_argument("keys", nargs="*", help="Entries to remove with clear (default: all)")
+    parser.add_argument("--dir", default=DEFAULT_CACHE_DIR, help="Cache directory")
+    args = parser.parse_args()
+
+    cache = FeatureCache(args.dir)
+    if args.command == "list":
+        entries = cache.entries()
+        for meta in entries:
+            last_used = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(meta["last_used"]))
+            print(f"{meta['key']}  {meta['size'] / 1e6:8.1f} MB  last used {last_used}  "
+                  f"shape {tuple(meta['shape'])}  {meta['params']}  {meta['source']}")
+        print(f"{len(entries)} entries, {sum(m['size'] for m in entries) / 1e6:.1f} MB in {args.dir}")
+    else:
+        if args.keys:
+            for key in args.keys:
+                cache.remove(key)
+        else:
+            cache.clear()
+        print("Feature cache cleared")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+fold_scheduler.py
+
+Runs the folds of a cross-validation in a process pool instead of one after the other.
+
+The training script provides a module-level function
+    train_fold(fold, X_train, y_train, X_val, y_val) -> dict
+(extra arguments can be bound with functools.partial) that trains and evaluates one fold and returns
+picklable results: metrics, history dict, fitted scaler, path of the saved model (Keras models are
+saved by the worker and reloaded by the parent, not sent between processes).
+
+run_folds() returns these dicts in fold order, so the scripts build the same plots and summary
+whatever the number of workers. With workers > 1, each worker is a fresh "spawn" process (TensorFlow
+does not survive a fork) whose TensorFlow runtime is limited to intra_op_threads / inter_op_threads,
+so that the workers share the cores instead of each one sizing its thread pools for the whole machine.
+"""
+
+import multiprocessing
+import os
+import time
+
+# Data and fold function of a worker process, set once by _init_worker
+_worker = {}
+
+
+def default_thread_limits(workers):
+    """(intra_op_threads, inter_op_threads) giving each of the workers an equal share of the cores."""
+    return max(1, (os.cpu_count() or 1) // workers), 1
+
+
+def add_scheduler_arguments(parser):
+    """--workers / --intra-op-threads / --inter-op-threads options of the CV scripts."""
+    parser.add_argument("--workers", type=int, default=1, help="Folds trained in parallel (default 1)")
+    parser.add_argument("--intra-op-threads", type=int, default=None,
+                        help="TensorFlow intra-op threads per worker (default: cores / workers)")
+    parser.add_argument("--inter-op-threads", type=int, default=None,
+                        help="TensorFlow inter-op threads per worker (default: 1 with several workers)")
+    return parser
+
+
+def configure_tensorflow_threads(intra_op_threads=None, inter_op_threads=None):
+    """
+    Limit the TensorFlow thread pools of the current process (None keeps the TensorFlow default).
+    Must be called before TensorFlow runs its first operation.
+    """
+    import tensorflow as tf
+    if intra_op_threads:
+        tf.config.threading.set_intra_op_parallelism_threads(intra_op_threads)
+    if inter_op_threads:
+        tf.config.threading.set_inter_op_parallelism_threads(inter_op_threads)
+
+
+def _init_worker(train_fold, X, y, intra_op_threads, inter_op_threads):
+    configure_tensorflow_threads(intra_op_threads, inter_op_threads)
+    _worker["train_fold"] = train_fold
+    _worker["X"] = X
+    _worker["y"] = y
+
+
+def _run_fold(task):
+    fold, train_idx, val_idx = task
+    X, y = _worker["X"], _worker["y"]
+    start = time.perf_counter()
+    result = _worker["train_fold"](fold, X[train_idx], y[train_idx], X[val_idx], y[val_idx])
+    result["fold"] = fold
+    result["seconds"] = time.perf_counter() - start
+    # Libère le graphe du pli avant le suivant dans le même worker
+    import tensorflow as tf
+    tf.keras.backend.clear_session()
+    return result
+
+
+def run_folds(train_fold, X, y, splits, workers=1, intra_op_threads=None, inter_op_threads=None):
+    """
+    Args:
+        train_fold: module-level function (or functools.partial of one) training one fold
+        X, y: arrays indexed by the splits
+        splits: iterable of (train_idx, val_idx), e.g. StratifiedKFold(...).split(X, y)
+        workers: number of folds trained at the same time (1: in this process, sequentially)
+        intra_op_threads, inter_op_threads: TensorFlow thread limits per worker
+                                            (default_thread_limits(workers) when workers > 1)
+
+    Returns:
+        list of the train_fold results in fold order, each with "fold" (1-based) and "seconds" added
+    """
+    tasks = [(fold, train_idx, val_idx) for fold, (train_idx, val_idx) in enumerate(splits, start=1)]
+    workers = max(1, min(workers, len(tasks)))
+    start = time.perf_counter()
+
+    if workers == 1:
+        _init_worker(train_fold, X, y, intra_op_threads, inter_op_threads)
+        results = [_run_fold(task) for task in tasks]
+    else:
+        if intra_op_threads is None and inter_op_threads is None:
+            intra_op_threads, inter_op_threads = default_thread_limits(workers)
+        print(f"Training {len(tasks)} folds on {workers} workers "
+              f"({intra_op_threads} intra-op / {inter_op_threads} inter-op threads each)")
+        context = multiprocessing.get_context("spawn")
+        results = []
+        with context.Pool(workers, initializer=_init_worker,
+                          initargs=(train_fold, X, y, intra_op_threads, inter_op_threads)) as pool:
+            for result in pool.imap_unordered(_run_fold, tasks):
+                print(f"Fold {result['fold']} done in {result['seconds']:.1f}s")
+                results.append(result)
+        results.sort(key=lambda result: result["fold"])
+
+    print(f"{len(tasks)} folds trained in {time.perf_counter() - start:.1f}s "
+          f"(sum of fold times {sum(r['seconds'] for r in results):.1f}s)")
+    return results
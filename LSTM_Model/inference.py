@@ -0,0 +1,236 @@
+"""
+inference.py
+
+Predictor: activity recognition with a trained fold model, loaded once.
+
+- The model, its StandardScaler and activity_classes.npy are loaded in the constructor.
+- The scaler is folded into the input kernel and bias of the first layer (Dense, LSTM, GRU, or their
+  Bidirectional wrapper): for x = (r - mean) / scale,
+      x . W + b = r . (W / scale[:, None]) + (b - (mean / scale) . W)
+  so raw feature vectors are fed directly. If the first layer cannot be folded (or the folded model does
+  not match the original on a probe batch), the standardization runs as a fused step inside the compiled
+  forward pass instead.
+- predict() runs one batched forward pass through a tf.function with a fixed input signature (no
+  model.predict() overhead, no retracing between batch sizes) and returns class ids and probabilities.
+- benchmark() reports the latency per batch and the throughput for several batch sizes.
+- Models trained with --sequence-length K take (n, K, n_features) inputs (sequence_length = K):
+  predict_sequences() builds the sequences of K consecutive windows with build_sequences() and
+  predicts the window each of them ends with.
+"""
+
+import os
+import pickle
+import sys
+import time
+import numpy as np
+import tensorflow as tf
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from sequence_windows import DEFAULT_MAX_GAP_SECONDS, SequenceDataset, build_sequences
+
+FOLD_TOLERANCE = 1e-4
+SEQUENCE_CHUNK = 4096  # Sequences gathered per forward pass when no batch size is given
+
+
+def _standardization(scaler, n_features):
+    mean = scaler.mean_ if getattr(scaler, "mean_", None) is not None else np.zeros(n_features)
+    scale = scaler.scale_ if getattr(scaler, "scale_", None) is not None else np.ones(n_features)
+    return np.asarray(mean, dtype=np.float64), np.asarray(scale, dtype=np.float64)
+
+
+def fold_standard_scaler(model, mean, scale):
+    """
+    Fold (x - mean) / scale into the first layer of model, in place.
+
+    Returns:
+        True if the first layer was folded, False if its type is not supported (model unchanged)
+    """
+    layer = model.layers[0]
+    targets = [layer]
+    if isinstance(layer, tf.keras.layers.Bidirectional):
+        targets = [layer.forward_layer, layer.backward_layer]
+    recurrent = (tf.keras.layers.LSTM, tf.keras.layers.GRU, tf.keras.layers.SimpleRNN)
+    if not all(isinstance(t, recurrent + (tf.keras.layers.Dense,)) for t in targets):
+        return False
+
+    new_weights = []
+    for target in targets:
+        weights = target.get_weights()
+        kernel = weights[0].astype(np.float64)
+        if kernel.shape[0] != len(mean):
+            return False
+        weights[0] = (kernel / scale[:, None]).astype(weights[0].dtype)
+        shift = (mean / scale) @ kernel
+        if target.use_bias:
+            bias_index = 2 if isinstance(target, recurrent) else 1
+            bias = weights[bias_index].astype(np.float64)
+            # GRU(reset_after=True) has (2, units * 3) biases: the first row is the input bias
+            if bias.ndim == 2:
+                bias[0] -= shift
+            else:
+                bias -= shift
+            weights[bias_index] = bias.astype(weights[bias_index].dtype)
+        elif np.any(shift):
+            return False
+        new_weights.append(weights)
+    for target, weights in zip(targets, new_weights):
+        target.set_weights(weights)
+    return True
+
+
+class Predictor:
+    """
+    Attributes:
+        model: Keras model (first layer folded with the scaler if folded is True)
+        classes: activity names, indexed by class id
+        folded: whether the scaler is folded into the model
+        sequence_length: windows per sample the model was trained on (K, 1 for single windows)
+    """
+
+    def __init__(self, model_path, scaler_path, classes_path, fold_scaler=True):
+        """
+        Args:
+            model_path: .keras model saved by the CV scripts
+            scaler_path: pickled StandardScaler of the same fold
+            classes_path: activity_classes.npy (label encoder classes)
+            fold_scaler: fold the scaler into the first layer (False: fused standardization step)
+        """
+        self.model = tf.keras.models.load_model(model_path, compile=False)
+        with open(scaler_path, "rb") as f:
+            scaler = pickle.load(f)
+        self.classes = np.load(classes_path, allow_pickle=True)
+        self.n_features = int(self.model.input_shape[-1])
+        self.sequence_length = int(self.model.input_shape[1] or 1)
+        mean, scale = _standardization(scaler, self.n_features)
+        self._mean = tf.constant(mean, dtype=tf.float32)
+        self._inverse_scale = tf.constant(1.0 / scale, dtype=tf.float32)
+
+        self.folded = False
+        signature = [tf.TensorSpec((None, None, self.n_features), tf.float32)]
+        self._forward = tf.function(self._call, input_signature=signature)
+        if fold_scaler:
+            self._fold(mean, scale)
+
+    def _call(self, x):
+        if not self.folded:
+            x = (x - self._mean) * self._inverse_scale
+        return self.model(x, training=False)
+
+    def _fold(self, mean, scale):
+        original = [w.copy() for w in self.model.layers[0].get_weights()]
+        probe = np.random.default_rng(0).normal(
+            mean, scale, (8, self.sequence_length, self.n_features)).astype(np.float32)
+        expected = self._forward(tf.constant(probe)).numpy()
+        if not fold_standard_scaler(self.model, mean, scale):
+            return
+        self.folded = True
+        # New tf.function: the traced graph of the fused version is not reused
+        self._forward = tf.function(self._call, input_signature=self._forward.input_signature)
+        if np.max(np.abs(self._forward(tf.constant(probe)).numpy() - expected)) > FOLD_TOLERANCE:
+            self.model.layers[0].set_weights(original)
+            self.folded = False
+            self._forward = tf.function(self._call, input_signature=self._forward.input_signature)
+
+    def _as_input(self, X):
+        if isinstance(X, SequenceDataset):
+            return X.to_array()
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim == 2:
+            if self.sequence_length > 1:
+                raise ValueError(f"The model takes sequences of {self.sequence_length} windows: "
+                                 "use predict_sequences() or pass (n, time_steps, n_features) inputs")
+            X = X.reshape(-1, 1, X.shape[1])
+        return X
+
+    def predict_proba(self, X, batch_size=None):
+        """
+        Args:
+            X: raw (unscaled) features, (n, n_features) or (n, time_steps, n_features), or a
+               SequenceDataset (gathered chunk by chunk)
+            batch_size: windows per forward pass (default: all at once)
+
+        Returns:
+            float32 array (n, n_classes)
+        """
+        if isinstance(X, SequenceDataset):
+            if len(X) == 0:
+                return np.zeros((0, len(self.classes)), dtype=np.float32)
+            chunk = batch_size or SEQUENCE_CHUNK
+            view = X.view()
+            batches = (np.ascontiguousarray(view[X.starts[i:i + chunk]], dtype=np.float32)
+                       for i in range(0, len(X), chunk))
+            return np.concatenate([self._forward(tf.constant(batch)).numpy() for batch in batches])
+        X = self._as_input(X)
+        if len(X) == 0:
+            return np.zeros((0, len(self.classes)), dtype=np.float32)
+        if batch_size is None or batch_size >= len(X):
+            return self._forward(tf.constant(X)).numpy()
+        return np.concatenate([self._forward(tf.constant(X[i:i + batch_size])).numpy()
+                               for i in range(0, len(X), batch_size)])
+
+    def predict(self, X, batch_size=None):
+        """
+        Returns:
+            class ids (n,), probabilities (n, n_classes)
+        """
+        probabilities = self.predict_proba(X, batch_size)
+        return np.argmax(probabilities, axis=1), probabilities
+
+    def sequence_inputs(self, X, start_times, end_times, max_gap_seconds=DEFAULT_MAX_GAP_SECONDS):
+        """
+        Sequences of sequence_length consecutive windows of X (never across a day change or a gap
+        larger than max_gap_seconds, as in training).
+
+        Args:
+            X: raw window features (n_windows, n_features), windows in time order
+            start_times, end_times: first and last event time of every window (window_features.window_times)
+
+        Returns:
+            SequenceDataset
+        """
+        sequences, _ = build_sequences(X, None, start_times, end_times, self.sequence_length, max_gap_seconds)
+        return sequences
+
+    def predict_sequences(self, X, start_times, end_times, max_gap_seconds=DEFAULT_MAX_GAP_SECONDS, batch_size=None):
+        """
+        predict() for a model trained on sequences: one prediction per window that ends a sequence.
+
+        Returns:
+            window indices into X (last window of each sequence), class ids, probabilities
+        """
+        sequences = self.sequence_inputs(X, start_times, end_times, max_gap_seconds)
+        class_ids, probabilities = self.predict(sequences, batch_size)
+        return sequences.last_rows(), class_ids, probabilities
+
+    def activities(self, class_ids):
+        """Activity names of class ids."""
+        return self.classes[class_ids]
+
+    def benchmark(self, X, batch_sizes=(1, 32, 256, 2048), max_windows=5000):
+        """
+        Latency per batch and throughput of predict() for each batch size, on (at most max_windows of) X
+        (window features, model inputs, or a SequenceDataset).
+
+        Returns:
+            list of dicts {"batch_size", "batches", "ms_per_batch", "windows_per_s"}
+        """
+        X = self._as_input(X[:max_windows])
+        results = []
+        for batch_size in batch_sizes:
+            if batch_size > len(X):
+                continue
+            n_batches = len(X) // batch_size
+            self._forward(tf.constant(X[:batch_size]))  # warm-up
+            start = time.perf_counter()
+            for i in range(n_batches):
+                self._forward(tf.constant(X[i * batch_size:(i + 1) * batch_size])).numpy()
+            elapsed = time.perf_counter() - start
+            result = {
+                "batch_size": batch_size,
+                "batches": n_batches,
+                "ms_per_batch": elapsed / n_batches * 1000,
+                "windows_per_s": n_batches * batch_size / elapsed,
+            }
+            print(f"batch {batch_size:5d}: {result['ms_per_batch']:8.3f} ms/batch, "
+                  f"{result['windows_per_s']:10.0f} windows/s")
+            results.append(result)
+        return results
@@ -0,0 +1,294 @@
+"""
+model_benchmark.py
+
+Benchmark of candidate architectures on the same features X (55 per window) and the same fixed split,
+to compare the current Bi-LSTM of create_model() with lighter models:
+
+    bilstm  Bi-LSTM 256 + LSTM 128 + dense layers (create_model of the CV scripts)
+    lstm    one LSTM layer
+    gru     one GRU layer
+    cnn1d   1D convolutions over the feature vector
+    mlp     dense layers only
+    gbt     gradient-boosted trees (sklearn HistGradientBoostingClassifier), no Keras
+
+Every model is trained on the same stratified 80/20 split (random_state 42, StandardScaler fit on the
+training part) in its own process, so that its peak RAM is measured alone, and reports:
+weighted/macro F1 on the test part, training time, inference latency per window (one window per call)
+and throughput (batches of 256), number of parameters, peak RAM of the process.
+
+    python LSTM_Model/model_benchmark.py [--dataset featureExtracted(w=5).npz] [--models bilstm mlp gbt]
+                                         [--epochs 30] [--output model_benchmark.json]
+
+The results are written as JSON (one object per model) and printed as a table.
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+import numpy as np
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from dataset_io import load_dataset, load_feature_text, label_or_none
+
+try:
+    import resource
+except ImportError:  # Windows: peak RAM is not reported
+    resource = None
+
+DEFAULT_DATASET = os.path.join("LSTM_Model", "event_based_segmentation", "featureExtracted(w=5).npz")
+DEFAULT_OUTPUT = "model_benchmark.json"
+LATENCY_CALLS = 200
+THROUGHPUT_BATCH_SIZE = 256
+
+
+def _compile(model):
+    model.compile(optimizer='adam', loss='sparse_categorical_crossentropy', metrics=['accuracy'])
+    return model
+
+
+def build_bilstm(input_shape, num_classes):
+    # Same architecture as create_model() of the time-based CV script
+    from tensorflow.keras import Sequential
+    from tensorflow.keras.layers import LSTM, Dense, Dropout, Bidirectional, Input
+    return _compile(Sequential([
+        Input(shape=input_shape),
+        Bidirectional(LSTM(256, return_sequences=True)),
+        Dropout(0.2),
+        LSTM(128),
+        Dropout(0.2),
+        Dense(128, activation='relu'),
+        Dropout(0.2),
+        Dense(64, activation='relu'),
+        Dense(num_classes, activation='softmax'),
+    ]))
+
+
+def build_lstm(input_shape, num_classes):
+    from tensorflow.keras import Sequential
+    from tensorflow.keras.layers import LSTM, Dense, Dropout, Input
+    return _compile(Sequential([
+        Input(shape=input_shape),
+        LSTM(128),
+        Dropout(0.2),
+        Dense(64, activation='relu'),
+        Dense(num_classes, activation='softmax'),
+    ]))
+
+
+def build_gru(input_shape, num_classes):
+    from tensorflow.keras import Sequential
+    from tensorflow.keras.layers import GRU, Dense, Dropout, Input
+    return _compile(Sequential([
+        Input(shape=input_shape),
+        GRU(128),
+        Dropout(0.2),
+        Dense(64, activation='relu'),
+        Dense(num_classes, activation='softmax'),
+    ]))
+
+
+def build_cnn1d(input_shape, num_classes):
+    # The (time_steps, n_features) input is read as one signal of time_steps * n_features values
+    from tensorflow.keras import Sequential
+    from tensorflow.keras.layers import Conv1D, Dense, Dropout, GlobalMaxPooling1D, Input, Reshape
+    return _compile(Sequential([
+        Input(shape=input_shape),
+        Reshape((input_shape[0] * input_shape[1], 1)),
+        Conv1D(32, 3, activation='relu', padding='same'),
+        Conv1D(64, 3, activation='relu', padding='same'),
+        GlobalMaxPooling1D(),
+        Dropout(0.2),
+        Dense(64, activation='relu'),
+        Dense(num_classes, activation='softmax'),
+    ]))
+
+
+def build_mlp(input_shape, num_classes):
+    from tensorflow.keras import Sequential
+    from tensorflow.keras.layers import Dense, Dropout, Flatten, Input
+    return _compile(Sequential([
+        Input(shape=input_shape),
+        Flatten(),
+        Dense(128, activation='relu'),
+        Dropout(0.2),
+        Dense(64, activation='relu'),
+        Dense(num_classes, activation='softmax'),
+    ]))
+
+
+def build_gbt(input_shape, num_classes):
+    from sklearn.ensemble import HistGradientBoostingClassifier
+    return HistGradientBoostingClassifier(max_iter=200, early_stopping=True, random_state=42)
+
+
+# name -> builder(input_shape, num_classes); Keras models get (1, n_features) inputs
+MODELS = {
+    "bilstm": build_bilstm,
+    "lstm": build_lstm,
+    "gru": build_gru,
+    "cnn1d": build_cnn1d,
+    "mlp": build_mlp,
+    "gbt": build_gbt,
+}
+KERAS_MODELS = ("bilstm", "lstm", "gru", "cnn1d", "mlp")
+
+
+def load_benchmark_data(path):
+    """
+    Labeled windows of a dataset (.npz of save_dataset, or a featureExtracted*.txt dump; for a dump, the
+    full dataset exported next to it by the training script is used if it exists).
+
+    Returns:
+        X (float32), y (array of str); windows without label are dropped
+    """
+    if path.endswith(".npz"):
+        X, y, _ = load_dataset(path)
+        labels = [None] * len(X) if y is None else [label_or_none(label) for label in y.tolist()]
+    else:
+        X, labels = load_feature_text(path)
+    keep = np.array([label is not None for label in labels], dtype=bool)
+    return np.asarray(X)[keep], np.array([label for label in labels if label is not None])
+
+
+def fixed_split(X, y):
+    """Stratified 80/20 split (random_state 42) and StandardScaler fit on the training part."""
+    from sklearn.model_selection import train_test_split
+    from sklearn.preprocessing import LabelEncoder, StandardScaler
+    y_enc = LabelEncoder().fit_transform(y)
+    X_train, X_test, y_train, y_test = train_test_split(X, y_enc, test_size=0.2, random_state=42, stratify=y_enc)
+    scaler = StandardScaler().fit(X_train)
+    return (scaler.transform(X_train).astype(np.float32), y_train,
+            scaler.transform(X_test).astype(np.float32), y_test, int(y_enc.max()) + 1)
+
+
+def peak_ram_mb():
+    """Peak resident memory of the current process in MB (None where resource is unavailable)."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 ** 2 if sys.platform == "darwin" else peak / 1024
+
+
+def _time_inference(predict, X_test):
+    """(median ms for one window per call, windows/s by batches of THROUGHPUT_BATCH_SIZE)."""
+    predict(X_test[:1])  # warm-up
+    latencies = []
+    for i in range(min(LATENCY_CALLS, len(X_test))):
+        start = time.perf_counter()
+        predict(X_test[i:i + 1])
+        latencies.append(time.perf_counter() - start)
+    start = time.perf_counter()
+    for i in range(0, len(X_test), THROUGHPUT_BATCH_SIZE):
+        predict(X_test[i:i + THROUGHPUT_BATCH_SIZE])
+    throughput = len(X_test) / (time.perf_counter() - start)
+    return float(np.median(latencies) * 1000), throughput
+
+
+def run_model(name, X_train, y_train, X_test, y_test, num_classes, epochs=30, batch_size=32):
+    """
+    Train and score one registered model in the current process.
+
+    Returns:
+        dict of the measured values
+    """
+    from sklearn.metrics import f1_score
+    result = {"model": name}
+    if name in KERAS_MODELS:
+        import tensorflow as tf
+        from tensorflow.keras.callbacks import EarlyStopping
+        from input_pipeline import make_dataset
+        tf.keras.utils.set_random_seed(42)
+        X_train3 = X_train.reshape(-1, 1, X_train.shape[1])
+        X_test3 = X_test.reshape(-1, 1, X_test.shape[1])
+        model = MODELS[name]((1, X_train.shape[1]), num_classes)
+        n_val = len(X_train3) // 10
+        train_ds = make_dataset(X_train3[n_val:], y_train[n_val:], batch_size, shuffle=True, seed=42)
+        val_ds = make_dataset(X_train3[:n_val], y_train[:n_val], batch_size)
+
+        start = time.perf_counter()
+        history = model.fit(train_ds, epochs=epochs, validation_data=val_ds, verbose=0,
+                            callbacks=[EarlyStopping(monitor='val_loss', patience=5, restore_best_weights=True)])
+        result["train_seconds"] = time.perf_counter() - start
+        result["epochs"] = len(history.history["loss"])
+        result["parameters"] = int(model.count_params())
+
+        # Direct call of the model (no model.predict overhead per call)
+        forward = tf.function(lambda x: model(x, training=False),
+                              input_signature=[tf.TensorSpec((None,) + X_test3.shape[1:], tf.float32)])
+        def predict(x):
+            return forward(tf.constant(x)).numpy()
+        y_pred = np.argmax(predict(X_test3), axis=1)
+        latency_ms, throughput = _time_inference(predict, X_test3)
+    else:
+        model = MODELS[name]((1, X_train.shape[1]), num_classes)
+        start = time.perf_counter()
+        model.fit(X_train, y_train)
+        result["train_seconds"] = time.perf_counter() - start
+        result["epochs"] = int(model.n_iter_)
+        # Trees of the ensemble (one per class and iteration) instead of weights
+        result["parameters"] = None
+        result["trees"] = int(model.n_trees_per_iteration_ * model.n_iter_)
+        y_pred = model.predict(X_test)
+        latency_ms, throughput = _time_inference(model.predict_proba, X_test)
+
+    result["f1_weighted"] = float(f1_score(y_test, y_pred, average="weighted"))
+    result["f1_macro"] = float(f1_score(y_test, y_pred, average="macro"))
+    result["latency_ms_per_window"] = latency_ms
+    result["throughput_windows_per_s"] = throughput
+    result["peak_ram_mb"] = peak_ram_mb()
+    return result
+
+
+def benchmark(X, y, models=tuple(MODELS), epochs=30, batch_size=32):
+    """
+    Run every model of models on the fixed split, each in a fresh process.
+
+    Returns:
+        list of the run_model() results
+    """
+    X_train, y_train, X_test, y_test, num_classes = fixed_split(X, y)
+    print(f"Train {X_train.shape}, test {X_test.shape}, {num_classes} classes")
+    context = multiprocessing.get_context("spawn")
+    results = []
+    for name in models:
+        if name not in MODELS:
+            raise ValueError(f"Unknown model {name!r}, expected one of {sorted(MODELS)}")
+        print(f"Benchmarking {name}...")
+        with context.Pool(1) as pool:
+            result = pool.apply(run_model, (name, X_train, y_train, X_test, y_test, num_classes, epochs, batch_size))
+        result.update({"train_windows": len(X_train), "test_windows": len(X_test)})
+        results.append(result)
+    return results
+
+
+def print_results(results):
+    print(f"{'model':8s} {'F1 w':>7s} {'F1 m':>7s} {'train s':>9s} {'ms/win':>8s} {'win/s':>10s} "
+          f"{'params':>10s} {'RAM MB':>8s}")
+    for r in results:
+        params = r["parameters"] if r["parameters"] is not None else f"{r['trees']} trees"
+        ram = f"{r['peak_ram_mb']:.0f}" if r["peak_ram_mb"] is not None else "-"
+        print(f"{r['model']:8s} {r['f1_weighted']:7.4f} {r['f1_macro']:7.4f} {r['train_seconds']:9.1f} "
+              f"{r['latency_ms_per_window']:8.3f} {r['throughput_windows_per_s']:10.0f} {str(params):>10s} {ram:>8s}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark model architectures on the window features.")
+    parser.add_argument("--dataset", default=DEFAULT_DATASET, help="Dataset .npz (save_dataset) or featureExtracted*.txt")
+    parser.add_argument("--models", nargs="+", default=list(MODELS), choices=list(MODELS))
+    parser.add_argument("--epochs", type=int, default=30, help="Max epochs of the Keras models (early stopping)")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="JSON results file")
+    args = parser.parse_args()
+
+    X, y = load_benchmark_data(args.dataset)
+    results = benchmark(X, y, args.models, args.epochs, args.batch_size)
+    print_results(results)
+    with open(args.output, "w") as f:
+        json.dump({"dataset": args.dataset, "results": results}, f, indent=2)
+    print(f"Results saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+"""
+sequence_windows.py
+
+Multi-step LSTM input: instead of reshaping every window feature vector to (1, n_features), a sample is
+the sequence of K consecutive windows (rows of the X matrix of create_dataset) ending at the window to
+classify, shape (K, n_features), labeled with the label of that last window.
+
+- segment_ids() splits the windows into runs that a sequence may not cross: a new run starts when the
+  day changes or when the gap between two consecutive windows exceeds max_gap_seconds.
+- SequenceDataset keeps the X matrix once plus the first row of every valid sequence; the (n, K, n_features)
+  samples are a zero-copy stride view over X (sequence_view), materialized only batch by batch
+  (input_pipeline.make_dataset gathers them in the tf.data pipeline) or on demand (to_array).
+  It is indexable like an array (X[idx], len, shape), so train_test_split, StratifiedKFold and
+  fold_scheduler.run_folds split it as they split X.
+- model_input()/scaler_rows() let train_fold() handle plain X matrices (time_steps=1, as before) and
+  SequenceDataset the same way.
+- Consecutive sequences share K - 1 windows, so a random split would put almost every validation
+  sequence's windows in the training set. holdout_split()/fold_splits() keep each run (its group id)
+  on one side for a SequenceDataset (StratifiedGroupKFold), and split plain X matrices as before.
+"""
+
+import numpy as np
+
+DEFAULT_MAX_GAP_SECONDS = 3600
+
+
+def sequence_view(X, sequence_length):
+    """
+    Read-only view of shape (n - K + 1, K, n_features): view[i] is X[i:i + K], no copy.
+    """
+    X = np.asarray(X)
+    return np.lib.stride_tricks.sliding_window_view(X, sequence_length, axis=0).transpose(0, 2, 1)
+
+
+def segment_ids(start_times, end_times, max_gap_seconds=DEFAULT_MAX_GAP_SECONDS, split_days=True):
+    """
+    Run number of every window (non-decreasing): a window starts a new run if its start is on another day
+    than the end of the previous window (split_days), more than max_gap_seconds after it, or if either
+    time is missing.
+
+    Args:
+        start_times, end_times: datetime64 arrays (or lists of datetime/None), first and last event of each window
+    """
+    start_times = np.asarray(start_times, dtype="datetime64[us]")
+    end_times = np.asarray(end_times, dtype="datetime64[us]")
+    if len(start_times) == 0:
+        return np.zeros(0, dtype=np.int64)
+    previous_end, start = end_times[:-1], start_times[1:]
+    breaks = np.isnat(previous_end) | np.isnat(start)
+    breaks |= (start - previous_end) > np.timedelta64(int(max_gap_seconds * 1e6), "us")
+    if split_days:
+        breaks |= start.astype("datetime64[D]") != previous_end.astype("datetime64[D]")
+    return np.concatenate(([0], np.cumsum(breaks)))
+
+
+class SequenceDataset:
+    """
+    Sequences of sequence_length consecutive rows of X.
+
+    Attributes:
+        rows: (n_windows, n_features) matrix shared by all the sequences (and by the subsets)
+        starts: int64 array, first row of each sequence
+        sequence_length: K
+        groups: run id of each sequence (segment_ids), None if unknown
+    """
+
+    def __init__(self, rows, starts, sequence_length, groups=None):
+        self.rows = rows
+        self.starts = np.asarray(starts, dtype=np.int64)
+        self.sequence_length = sequence_length
+        self.groups = None if groups is None else np.asarray(groups, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.starts)
+
+    @property
+    def shape(self):
+        return (len(self.starts), self.sequence_length, self.rows.shape[1])
+
+    def __getitem__(self, index):
+        """Subset of the sequences (same rows, no copy of X)."""
+        groups = None if self.groups is None else self.groups[index]
+        return SequenceDataset(self.rows, self.starts[index], self.sequence_length, groups)
+
+    def last_rows(self):
+        """Row of the window each sequence ends with (the one it is labeled with)."""
+        return self.starts + self.sequence_length - 1
+
+    def covered_rows(self):
+        """Rows used by at least one sequence, e.g. to fit the scaler on the training sequences only."""
+        covered = np.zeros(len(self.rows), dtype=bool)
+        for offset in range(self.sequence_length):
+            covered[self.starts + offset] = True
+        return self.rows[covered]
+
+    def transform_rows(self, transform):
+        """Same sequences over transform(rows), e.g. scaler.transform."""
+        return SequenceDataset(np.asarray(transform(self.rows), dtype=np.float32), self.starts, self.sequence_length,
+                               self.groups)
+
+    def view(self):
+        """Zero-copy (n_windows - K + 1, K, n_features) view; the sequences are view()[starts]."""
+        return sequence_view(self.rows, self.sequence_length)
+
+    def to_array(self):
+        """Materialized (len, K, n_features) float32 array."""
+        return np.ascontiguousarray(self.view()[self.starts], dtype=np.float32)
+
+
+def build_sequences(X, y, start_times, end_times, sequence_length, max_gap_seconds=DEFAULT_MAX_GAP_SECONDS,
+                    split_days=True):
+    """
+    Args:
+        X: (n_windows, n_features) matrix from create_dataset (windows in time order)
+        y: labels of the windows (None for unlabeled data)
+        start_times, end_times: first and last event time of every window (window_features.window_times)
+        sequence_length: windows per sequence (K)
+        max_gap_seconds, split_days: boundaries a sequence may not cross (see segment_ids)
+
+    Returns:
+        SequenceDataset, labels of the sequences (label of their last window; None if y is None)
+    """
+    X = np.asarray(X, dtype=np.float32)
+    if len(start_times) != len(X) or len(end_times) != len(X):
+        raise ValueError(f"{len(start_times)} window times for {len(X)} windows")
+    if sequence_length < 1:
+        raise ValueError(f"sequence_length must be >= 1, got {sequence_length}")
+    runs = segment_ids(start_times, end_times, max_gap_seconds, split_days)
+    last = np.arange(sequence_length - 1, len(X))
+    # runs is non-decreasing: the K windows are in the same run iff the first and last are
+    starts = (last - sequence_length + 1)[runs[last - sequence_length + 1] == runs[last]]
+    sequences = SequenceDataset(X, starts, sequence_length, groups=runs[starts])
+    if y is None:
+        return sequences, None
+    return sequences, np.asarray(y)[sequences.last_rows()]
+
+
+def scaler_rows(X):
+    """Rows to fit the StandardScaler on: X itself, or the rows covered by a SequenceDataset."""
+    if isinstance(X, SequenceDataset):
+        return X.covered_rows()
+    return X
+
+
+def model_input(X, scaler):
+    """
+    Scaled model input: SequenceDataset over the scaled rows, or (n, 1, n_features) array for a plain X.
+    """
+    if isinstance(X, SequenceDataset):
+        return X.transform_rows(scaler.transform)
+    X_scaled = scaler.transform(X)
+    return X_scaled.reshape(-1, 1, X_scaled.shape[1])
+
+
+def _groups(X):
+    groups = getattr(X, "groups", None)
+    if isinstance(X, SequenceDataset) and groups is None:
+        raise ValueError("SequenceDataset without groups: build it with build_sequences()")
+    return groups
+
+
+def holdout_split(X, y, test_size=0.2, random_state=42):
+    """
+    Stratified train / hold-out split. The sequences of a SequenceDataset are split by run, so that
+    no hold-out sequence shares a window with a training one (the hold-out part is one fold of a
+    StratifiedGroupKFold with round(1 / test_size) folds, i.e. about test_size of the sequences).
+
+    Returns:
+        X_train, X_test, y_train, y_test
+    """
+    groups = _groups(X)
+    y = np.asarray(y)
+    if groups is None:
+        from sklearn.model_selection import train_test_split
+        return train_test_split(X, y, test_size=test_size, stratify=y, random_state=random_state)
+    from sklearn.model_selection import StratifiedGroupKFold
+    splitter = StratifiedGroupKFold(n_splits=int(round(1 / test_size)), shuffle=True, random_state=random_state)
+    train_index, test_index = next(splitter.split(np.zeros(len(y)), y, groups))
+    return X[train_index], X[test_index], y[train_index], y[test_index]
+
+
+def fold_splits(X, y, n_splits=10, random_state=42):
+    """
+    (train indices, validation indices) of the cross-validation folds: StratifiedKFold for a plain X,
+    StratifiedGroupKFold over the runs for a SequenceDataset.
+    """
+    groups = _groups(X)
+    y = np.asarray(y)
+    if groups is None:
+        from sklearn.model_selection import StratifiedKFold
+        return StratifiedKFold(n_splits=n_splits, shuffle=True, random_state=random_state).split(np.zeros(len(y)), y)
+    from sklearn.model_selection import StratifiedGroupKFold
+    splitter = StratifiedGroupKFold(n_splits=n_splits, shuffle=True, random_state=random_state)
+    return splitter.split(np.zeros(len(y)), y, groups)
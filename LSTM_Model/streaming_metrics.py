@@ -0,0 +1,85 @@
+"""
+streaming_metrics.py
+
+F1 score as a stateful Keras metric: the confusion matrix is accumulated batch by batch during the
+passes model.fit() already makes (training, and validation with validation_data), so the per-epoch
+validation F1 ("val_f1" in the history) costs no extra model.predict() on the validation fold,
+unlike F1ScoreCallback.
+
+The values are those of sklearn.metrics.f1_score(y_true, y_pred, average=...) on the same pass:
+- weighted: per-class F1 weighted by the number of true windows of the class,
+- macro: unweighted mean over the classes present in y_true or y_pred.
+"""
+
+import tensorflow as tf
+
+
+def f1_from_confusion(confusion, average="weighted"):
+    """
+    Args:
+        confusion: (num_classes, num_classes) matrix, rows = true class, columns = predicted class
+        average: "weighted" or "macro"
+
+    Returns:
+        scalar F1 tensor
+    """
+    confusion = tf.cast(confusion, tf.float32)
+    true_positives = tf.linalg.diag_part(confusion)
+    support = tf.reduce_sum(confusion, axis=1)
+    predicted = tf.reduce_sum(confusion, axis=0)
+    # 2 TP + FP + FN = (TP + FN) + (TP + FP)
+    denominator = support + predicted
+    per_class = tf.math.divide_no_nan(2.0 * true_positives, denominator)
+    if average == "weighted":
+        return tf.math.divide_no_nan(tf.reduce_sum(per_class * support), tf.reduce_sum(support))
+    present = tf.cast(denominator > 0, tf.float32)
+    return tf.math.divide_no_nan(tf.reduce_sum(per_class * present), tf.reduce_sum(present))
+
+
+@tf.keras.utils.register_keras_serializable(package="activity_recognition")
+class StreamingF1(tf.keras.metrics.Metric):
+    """
+    F1 of sparse integer labels against softmax outputs, from a confusion matrix accumulated on the
+    fly (reset by Keras at the start of every epoch and of every evaluation pass).
+    """
+
+    def __init__(self, num_classes, average="weighted", name="f1", **kwargs):
+        """
+        Args:
+            num_classes: number of output classes
+            average: "weighted" or "macro"
+            name: metric name in the logs ("f1" -> "f1" / "val_f1")
+        """
+        super().__init__(name=name, **kwargs)
+        if average not in ("weighted", "macro"):
+            raise ValueError(f"average must be 'weighted' or 'macro', got {average!r}")
+        self.num_classes = num_classes
+        self.average = average
+        self.confusion = self.add_weight(
+            name="confusion", shape=(num_classes, num_classes), initializer="zeros", dtype="float32"
+        )
+
+    def update_state(self, y_true, y_pred, sample_weight=None):
+        y_true = tf.reshape(tf.cast(y_true, tf.int32), [-1])
+        y_pred = tf.reshape(tf.argmax(y_pred, axis=-1, output_type=tf.int32), [-1])
+        if sample_weight is not None:
+            sample_weight = tf.reshape(tf.cast(sample_weight, tf.float32), [-1])
+        self.confusion.assign_add(tf.math.confusion_matrix(
+            y_true, y_pred, num_classes=self.num_classes, weights=sample_weight, dtype=tf.float32
+        ))
+
+    def result(self):
+        return f1_from_confusion(self.confusion, self.average)
+
+    def reset_state(self):
+        self.confusion.assign(tf.zeros((self.num_classes, self.num_classes), dtype=tf.float32))
+
+    def get_config(self):
+        config = super().get_config()
+        config.update({"num_classes": self.num_classes, "average": self.average})
+        return config
+
+
+def f1_metrics(num_classes):
+    """Weighted ("f1") and macro ("macro_f1") streaming F1 metrics for model.compile()."""
+    return [StreamingF1(num_classes, "weighted", name="f1"), StreamingF1(num_classes, "macro", name="macro_f1")]
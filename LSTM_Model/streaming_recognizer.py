@@ -0,0 +1,453 @@
+"""
+streaming_recognizer.py
+
+Online activity recognition over live sensor events, instead of create_dataset(..., labeled=False) on a
+whole JSON file.
+
+- OnlineWindow keeps the last time_steps events and the 34 running sensor counts: every event adds its
+  sensor and removes the one leaving the window, so the cost per event is constant. When a window
+  closes (every stride events, as window_starts() segments the log offline) it returns the same
+  55-feature vector as the unlabeled create_dataset() of the event-based segmentation: time features of
+  the first and last event, normalized duration, sensor counts.
+- StreamingRecognizer classifies every closed window with an inference.Predictor and measures the
+  processing time of every event (featurization, plus the forward pass for the events closing a window).
+  For a model trained with --sequence-length K it keeps the last K windows of the current run
+  (sequence_windows.segment_ids: same day, no gap above max_gap_seconds) and classifies a window once it
+  ends K windows of one run, as build_sequences() does offline.
+- Event sources, each a generator of event dicts ({"date", "time", "sensor", "state", ...}):
+      tail_events()    lines appended to a JSON-lines file
+      socket_events()  line-delimited JSON over a TCP connection
+      queue_events()   a queue.Queue, as a local stand-in for a message broker
+- replay() feeds a recorded event log to one of these sources at N x real time.
+
+Command line:
+    # replay in the same process through a queue, 60 x real time (--speed 0: as fast as possible)
+    python LSTM_Model/streaming_recognizer.py replay data.json --speed 60
+    # recognizer listening on a socket / tailing a file, and the replay feeding it
+    python LSTM_Model/streaming_recognizer.py listen --port 5555
+    python LSTM_Model/streaming_recognizer.py replay data.json --speed 60 --send localhost:5555
+    python LSTM_Model/streaming_recognizer.py tail live.jsonl
+    python LSTM_Model/streaming_recognizer.py replay data.json --speed 60 --append live.jsonl
+
+--no-model only builds the windows (no TensorFlow needed), to measure the featurization alone.
+"""
+
+import argparse
+import json
+import os
+import queue
+import socket
+import sys
+import threading
+import time
+from collections import deque
+import numpy as np
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "eventStore"))
+from event_store import load_events
+from timestamps import parse_datetime
+from sequence_windows import DEFAULT_MAX_GAP_SECONDS, segment_ids
+from window_features import ALL_SENSORS, NOT_COUNTED, encode_time_features, sensor_column
+
+MIN_DURATION = 0.0001  # Normalized duration of a window whose events share the same time
+LATENCY_SAMPLES = 100000  # Per-event latencies kept for the statistics (most recent ones)
+END_OF_STREAM = None  # Queue item ending queue_events()
+
+DEFAULT_DEPENDENCIES = os.path.join("LSTM_Model", "event_based_segmentation", "scaler_and_dependencies")
+DEFAULT_MODEL = os.path.join(DEFAULT_DEPENDENCIES, "lstm_activity_classifier_fold1_with_extended_time.keras")
+DEFAULT_SCALER = os.path.join(DEFAULT_DEPENDENCIES, "feature_scaler_fold1_with_extended_time.pkl")
+DEFAULT_CLASSES = os.path.join(DEFAULT_DEPENDENCIES, "activity_classes.npy")
+
+
+class OnlineWindow:
+    """
+    Current window of the event stream.
+
+    Attributes:
+        time_steps: events per window
+        stride: events between the starts of two consecutive windows (time_steps: non-overlapping)
+        seen: events pushed so far
+        counts: ON/OPEN events of each of ALL_SENSORS among the last time_steps events
+    """
+
+    def __init__(self, time_steps=5, stride=None):
+        self.time_steps = time_steps
+        self.stride = time_steps if stride is None else stride
+        if self.stride < 1:
+            raise ValueError(f"stride must be >= 1, got {self.stride}")
+        self.seen = 0
+        self.counts = np.zeros(len(ALL_SENSORS), dtype=np.int64)
+        self._events = deque()  # (sensor column, datetime64) of the last time_steps events
+
+    def push(self, event):
+        """
+        Add one event to the window.
+
+        Returns:
+            the (55,) float32 feature vector if this event closes a window, else None.
+            Raises ValueError if the first or last event of the closed window has no valid time.
+        """
+        column = sensor_column(event.get("sensor"), event.get("state"))
+        if len(self._events) == self.time_steps:
+            evicted, _ = self._events.popleft()
+            if evicted != NOT_COUNTED:
+                self.counts[evicted] -= 1
+        if column != NOT_COUNTED:
+            self.counts[column] += 1
+        self._events.append((column, parse_datetime(event.get("date"), event.get("time"))))
+        self.seen += 1
+
+        if self.seen < self.time_steps or (self.seen - self.time_steps) % self.stride:
+            return None
+        return self.features()
+
+    def bounds(self):
+        """Time of the first and of the last event of the current window."""
+        return self._events[0][1], self._events[-1][1]
+
+    def features(self):
+        """Feature vector of the current window, same values as create_dataset(labeled=False)."""
+        start_time, end_time = self.bounds()
+        if np.isnat(start_time) or np.isnat(end_time):
+            raise ValueError(f"Unparsable date/time in the window ending at event {self.seen - 1}")
+        x = np.empty(21 + len(self.counts), dtype=np.float32)
+        x[0:20] = encode_time_features(np.array([start_time, end_time])).reshape(-1)
+        duration_sec = (end_time - start_time).astype(np.int64) / 1e6
+        x[20] = max(duration_sec / 86400, MIN_DURATION)
+        x[21:] = self.counts
+        return x
+
+
+class StreamingRecognizer:
+    """
+    Activity of every window closed by the event stream.
+
+    Attributes:
+        window: OnlineWindow
+        predictor: inference.Predictor (None: windows are built but not classified)
+        windows: windows closed so far
+        skipped: closed windows dropped because of an unparsable time
+        max_gap_seconds: gap between two windows that starts a new run (sequence models only)
+    """
+
+    def __init__(self, predictor=None, time_steps=5, stride=None, max_gap_seconds=DEFAULT_MAX_GAP_SECONDS):
+        self.window = OnlineWindow(time_steps, stride)
+        self.predictor = predictor
+        self.windows = 0
+        self.skipped = 0
+        self.max_gap_seconds = max_gap_seconds
+        sequence_length = predictor.sequence_length if predictor is not None else 1
+        self._run = deque(maxlen=sequence_length)  # (features, start, end) of the last windows of the current run
+        self._latencies = deque(maxlen=LATENCY_SAMPLES)  # seconds, every event
+        self._window_latencies = deque(maxlen=LATENCY_SAMPLES)  # seconds, events closing a window
+
+    def process(self, event):
+        """
+        Feed one event.
+
+        Returns:
+            None, or for an event closing a window a dict
+            {"window", "start", "end", "features", "activity", "probability"}
+            (activity and probability are None without a predictor, or for a sequence model until the
+            window ends sequence_length windows of one run)
+        """
+        start = time.perf_counter()
+        try:
+            features = self.window.push(event)
+        except ValueError as error:
+            print(f"WARNING: window skipped: {error}")
+            self.skipped += 1
+            self._run.clear()  # A window without a valid time ends the run, as in segment_ids()
+            features = None
+        result = None
+        if features is not None:
+            result = self._classify(features)
+        elapsed = time.perf_counter() - start
+        self._latencies.append(elapsed)
+        if features is not None:
+            self._window_latencies.append(elapsed)
+        return result
+
+    def _classify(self, features):
+        start_time, end_time = self.window.bounds()
+        result = {"window": self.windows, "start": start_time, "end": end_time, "features": features,
+                  "activity": None, "probability": None}
+        self.windows += 1
+        if self._run and segment_ids([self._run[-1][1], start_time], [self._run[-1][2], end_time],
+                                     self.max_gap_seconds)[-1]:
+            self._run.clear()
+        self._run.append((features, start_time, end_time))
+        if self.predictor is not None and len(self._run) == self._run.maxlen:
+            if self._run.maxlen > 1:
+                inputs = np.stack([run_features for run_features, _, _ in self._run])[None, :, :]
+            else:
+                inputs = features[None, :]
+            class_ids, probabilities = self.predictor.predict(inputs)
+            result["activity"] = str(self.predictor.activities(class_ids)[0])
+            result["probability"] = float(probabilities[0, class_ids[0]])
+        return result
+
+    def run(self, events, on_window=None, max_events=None):
+        """
+        Process an event source until it ends (or max_events events).
+
+        Args:
+            events: iterable of event dicts (tail_events, socket_events, queue_events, a list...)
+            on_window: called with the result of every closed window (default: print it)
+        """
+        on_window = on_window or print_window
+        for n, event in enumerate(events, 1):
+            result = self.process(event)
+            if result is not None:
+                on_window(result)
+            if max_events is not None and n >= max_events:
+                break
+
+    def latency_stats(self):
+        """
+        Per-event processing time, in microseconds, over the last LATENCY_SAMPLES events.
+
+        Returns:
+            dict {"events", "windows", "skipped", "mean_us", "p50_us", "p99_us", "max_us",
+                  "window_mean_us", "window_p99_us"} (latencies None before the first event)
+        """
+        latencies = np.array(self._latencies) * 1e6
+        window_latencies = np.array(self._window_latencies) * 1e6
+
+        def stat(values, function):
+            return float(function(values)) if len(values) else None
+        return {
+            "events": self.window.seen,
+            "windows": self.windows,
+            "skipped": self.skipped,
+            "mean_us": stat(latencies, np.mean),
+            "p50_us": stat(latencies, lambda v: np.percentile(v, 50)),
+            "p99_us": stat(latencies, lambda v: np.percentile(v, 99)),
+            "max_us": stat(latencies, np.max),
+            "window_mean_us": stat(window_latencies, np.mean),
+            "window_p99_us": stat(window_latencies, lambda v: np.percentile(v, 99)),
+        }
+
+
+def print_window(result):
+    activity = result["activity"] if result["activity"] is not None else "-"
+    probability = f" ({result['probability']:.2f})" if result["probability"] is not None else ""
+    print(f"window {result['window']:6d} {result['start']} -> {result['end']}: {activity}{probability}")
+
+
+def print_latency_stats(stats):
+    def us(value):
+        return f"{value:.1f} us" if value is not None else "-"
+    print(f"{stats['events']} events, {stats['windows']} windows ({stats['skipped']} skipped)")
+    print(f"Per event: mean {us(stats['mean_us'])}, p50 {us(stats['p50_us'])}, p99 {us(stats['p99_us'])}, "
+          f"max {us(stats['max_us'])}")
+    print(f"Events closing a window: mean {us(stats['window_mean_us'])}, p99 {us(stats['window_p99_us'])}")
+
+
+# -------------------------------
+# Event sources
+# -------------------------------
+def tail_events(path, from_start=False, poll_interval=0.1, idle_timeout=None):
+    """
+    Events of the JSON lines appended to path (one event dict per line), like tail -f.
+
+    Args:
+        from_start: also read the lines already in the file
+        poll_interval: seconds between two reads at the end of the file
+        idle_timeout: stop after this many seconds without a new line (None: never)
+    """
+    with open(path, "r") as f:
+        if not from_start:
+            f.seek(0, os.SEEK_END)
+        partial = ""
+        last_data = time.monotonic()
+        while True:
+            line = f.readline()
+            if not line:
+                if idle_timeout is not None and time.monotonic() - last_data > idle_timeout:
+                    return
+                time.sleep(poll_interval)
+                continue
+            last_data = time.monotonic()
+            # A line being written may be read in several pieces
+            partial += line
+            if not partial.endswith("\n"):
+                continue
+            line, partial = partial.strip(), ""
+            if line:
+                yield json.loads(line)
+
+
+def socket_events(host="localhost", port=5555, ready=None):
+    """
+    Events sent as line-delimited JSON by one client connecting to (host, port); ends when it disconnects.
+
+    Args:
+        ready: optional threading.Event set once the socket is listening
+    """
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as server:
+        server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        server.bind((host, port))
+        server.listen(1)
+        print(f"Listening on {host}:{port}")
+        if ready is not None:
+            ready.set()
+        connection, address = server.accept()
+        print(f"Connection from {address[0]}:{address[1]}")
+        with connection, connection.makefile("r", encoding="utf-8") as lines:
+            for line in lines:
+                line = line.strip()
+                if line:
+                    yield json.loads(line)
+
+
+def queue_events(event_queue):
+    """Events taken from a queue.Queue until END_OF_STREAM."""
+    while True:
+        event = event_queue.get()
+        if event is END_OF_STREAM:
+            return
+        yield event
+
+
+# -------------------------------
+# Replay of a recorded log
+# -------------------------------
+def replay(events, send, speed=1.0, max_events=None):
+    """
+    Send recorded events with their original spacing divided by speed.
+
+    The schedule is absolute (event time relative to the first event), so the time spent in send()
+    does not accumulate as drift. Events without a valid time are sent right away.
+
+    Args:
+        events: iterable of event dicts in time order (e.g. load_events(path).records())
+        send: called with every event dict
+        speed: N x real time (0: no waiting)
+
+    Returns:
+        number of events sent
+    """
+    first_time = None
+    wall_start = time.monotonic()
+    n = 0
+    for event in events:
+        if max_events is not None and n >= max_events:
+            break
+        event_time = parse_datetime(event.get("date"), event.get("time"))
+        if speed > 0 and not np.isnat(event_time):
+            if first_time is None:
+                first_time = event_time
+            offset = (event_time - first_time).astype(np.int64) / 1e6 / speed
+            delay = wall_start + offset - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+        send(event)
+        n += 1
+    return n
+
+
+def _line(event):
+    return json.dumps(event) + "\n"
+
+
+def _socket_sender(address):
+    host, _, port = address.rpartition(":")
+    connection = socket.create_connection((host or "localhost", int(port)))
+    return connection, lambda event: connection.sendall(_line(event).encode("utf-8"))
+
+
+def _file_appender(path):
+    f = open(path, "a")
+
+    def send(event):
+        f.write(_line(event))
+        f.flush()
+    return f, send
+
+
+def _make_recognizer(args):
+    predictor = None
+    if not args.no_model:
+        from inference import Predictor
+        predictor = Predictor(args.model, args.scaler, args.classes)
+        print(f"Activity classes: {predictor.classes}")
+        if predictor.sequence_length > 1:
+            print(f"Sequence model: {predictor.sequence_length} windows per sample")
+    return StreamingRecognizer(predictor, args.time_steps, args.stride, args.max_gap_seconds)
+
+
+def _recognize(recognizer, events, args):
+    on_window = (lambda result: None) if args.quiet else print_window
+    try:
+        recognizer.run(events, on_window, args.max_events)
+    except KeyboardInterrupt:
+        pass
+    print_latency_stats(recognizer.latency_stats())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Online activity recognition over a live stream of sensor events.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    def add_recognizer_arguments(sub):
+        sub.add_argument("--model", default=DEFAULT_MODEL)
+        sub.add_argument("--scaler", default=DEFAULT_SCALER)
+        sub.add_argument("--classes", default=DEFAULT_CLASSES)
+        sub.add_argument("--no-model", action="store_true", help="Build the windows without classifying them")
+        sub.add_argument("--time-steps", type=int, default=5, help="Events per window")
+        sub.add_argument("--stride", type=int, default=None, help="Events between two windows (default: time steps)")
+        sub.add_argument("--max-gap-seconds", type=float, default=DEFAULT_MAX_GAP_SECONDS,
+                         help="Gap between two windows that starts a new run (sequence models)")
+        sub.add_argument("--max-events", type=int, default=None)
+        sub.add_argument("--quiet", action="store_true", help="Only print the latency statistics")
+
+    replay_parser = subparsers.add_parser("replay", help="Replay a recorded event log")
+    replay_parser.add_argument("log", help="JSON event file or event store directory")
+    replay_parser.add_argument("--speed", type=float, default=1.0, help="N x real time (0: as fast as possible)")
+    target = replay_parser.add_mutually_exclusive_group()
+    target.add_argument("--send", metavar="HOST:PORT", help="Send to a recognizer listening on a socket")
+    target.add_argument("--append", metavar="FILE", help="Append JSON lines to a file tailed by a recognizer")
+    add_recognizer_arguments(replay_parser)
+
+    listen_parser = subparsers.add_parser("listen", help="Recognize events received on a socket")
+    listen_parser.add_argument("--host", default="localhost")
+    listen_parser.add_argument("--port", type=int, default=5555)
+    add_recognizer_arguments(listen_parser)
+
+    tail_parser = subparsers.add_parser("tail", help="Recognize events appended to a JSON-lines file")
+    tail_parser.add_argument("path")
+    tail_parser.add_argument("--from-start", action="store_true", help="Also read the events already in the file")
+    tail_parser.add_argument("--idle-timeout", type=float, default=None, help="Stop after this many idle seconds")
+    add_recognizer_arguments(tail_parser)
+    args = parser.parse_args()
+
+    if args.command == "listen":
+        _recognize(_make_recognizer(args), socket_events(args.host, args.port), args)
+    elif args.command == "tail":
+        _recognize(_make_recognizer(args), tail_events(args.path, args.from_start, idle_timeout=args.idle_timeout), args)
+    elif args.send or args.append:
+        records = load_events(args.log).records()
+        resource, send = _socket_sender(args.send) if args.send else _file_appender(args.append)
+        with resource:
+            start = time.monotonic()
+            n = replay(records, send, args.speed, args.max_events)
+        print(f"Replayed {n} events in {time.monotonic() - start:.1f} s")
+    else:
+        # Replay and recognition in the same process, through a queue
+        records = load_events(args.log).records()
+        recognizer = _make_recognizer(args)
+        event_queue = queue.Queue()
+
+        def feed():
+            try:
+                replay(records, event_queue.put, args.speed, args.max_events)
+            finally:
+                event_queue.put(END_OF_STREAM)
+        feeder = threading.Thread(target=feed, daemon=True)
+        feeder.start()
+        _recognize(recognizer, queue_events(event_queue), args)
+
+
+if __name__ == "__main__":
+    main()
@@ -12,6 +12,8 @@ This file focuses on preparing time-series data for LSTM-based activity recognit
 3. create_dataset(): The core function that processes sensor event data to create feature vectors for LSTM.
    It tracks activity start/end times, calculates durations, extracts time features, and counts sensor
    activations to build a comprehensive feature set.
+   The segments themselves come from time_segments(), which finds gaps and target end times on the
+   timestamp array (np.diff / np.searchsorted) instead of walking the log event by event.
 
 4. save_dataset_to_file(): Outputs the generated dataset to a text file with labeled features for inspection.
 
@@ -19,8 +21,14 @@ The file handles complex event sequences by tracking overlapping activities, det
 in time windows, and encoding time data in a way that preserves cyclical relationships.
 """
 
+import os
+import sys
 import numpy as np
 from datetime import datetime, timedelta
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "eventStore"))
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from timestamps import event_datetimes
+from window_features import event_columns, encode_time_features, SensorCountCube
 
 # Time feature encoding functions
 def encode_cyclical_feature(value, period):
@@ -108,21 +116,109 @@ def get_event_datetime(event):
     """
     Safely extract a datetime object from an event.
     Returns None if either the "date" or "time" key is missing or if parsing fails.
+    For whole datasets use event_datetimes(data), which parses every event in one pass.
     """
-    if 'date' not in event or 'time' not in event:
-        return None
-    date_str = event['date']
-    time_str = event['time']
-    try:
-        return datetime.strptime(f"{date_str} {time_str}", "%Y-%m-%d %H:%M:%S.%f")
-    except ValueError:
-        try:
-            return datetime.strptime(f"{date_str} {time_str}", "%Y-%m-%d %H:%M:%S")
-        except Exception:
-            return None
+    return event_datetimes([event])[0]
+
+def time_segments(event_times, target_duration_seconds=300, tolerance_seconds=30):
+    """
+    Segment boundaries of the time-based segmentation.
+
+    A segment starts at an event with a valid time whose next event is not more than
+    target + tolerance later, and ends at the first of:
+    - the event before a gap larger than target + tolerance between two consecutive events,
+    - the first event reaching start + target - tolerance (or the one before it if it is already
+      past start + target + tolerance),
+    - the last event of the log.
+
+    Gaps are found with one np.diff over the timestamps and the target end with np.searchsorted on
+    their running maximum, so the whole log is segmented in O(N log N) with no limit on the number
+    of events per segment.
+
+    Args:
+        event_times: list of datetime objects (None for missing/unparsable times)
+        target_duration_seconds: Target duration for each segment in seconds
+        tolerance_seconds: Allowed tolerance in seconds
+
+    Returns:
+        list of (start index, end index (inclusive), start time, end time), segments of at least
+        two events, in log order
+    """
+    n = len(event_times)
+    missing = np.iinfo(np.int64).min
+    times = np.array(event_times, dtype="datetime64[us]").astype(np.int64).reshape(-1)
+    valid = times != missing
+    target = timedelta(seconds=target_duration_seconds)
+    tolerance = timedelta(seconds=tolerance_seconds)
+    microsecond = timedelta(microseconds=1)
+    max_gap_us = (target_duration_seconds + tolerance_seconds) * 1e6
+    min_end_us = (target - tolerance) // microsecond
+    max_end_us = (target + tolerance) // microsecond
+
+    # too_far[e]: events e and e+1 both have a time and are more than target + tolerance apart
+    too_far = valid[1:] & valid[:-1] & (np.diff(times) > max_gap_us)
+    # Positions e where the gap from event e-1 to event e is too large
+    gap_breaks = np.flatnonzero(too_far) + 1
+    # Events that can start a segment: valid time, next event not more than target + tolerance later
+    next_gap = np.zeros(n, dtype=bool)
+    next_gap[:-1] = too_far
+    starts = np.flatnonzero(valid & ~next_gap)
+    # Running maximum of the valid times: the first event at or after a time x, when every earlier
+    # event is before x, is found by binary search on it
+    running_max = np.maximum.accumulate(np.where(valid, times, missing)) if n else times
+
+    def first_reaching(c, x):
+        """First event e > c with a valid time >= x (n if none)."""
+        if running_max[c] < x:
+            return int(np.searchsorted(running_max, x, side="left"))
+        # Log not sorted around c: fall back to a scan
+        for e in range(c + 1, n):
+            if valid[e] and times[e] >= x:
+                return e
+        return n
+
+    segments = []
+    current_idx = 0
+    while True:
+        # Skip events without a time, and events followed by a gap larger than target + tolerance
+        k = np.searchsorted(starts, current_idx, side="left")
+        if k == len(starts):
+            break
+        current_idx = int(starts[k])
+        start_time = event_times[current_idx]
+
+        k = np.searchsorted(gap_breaks, current_idx, side="right")
+        gap_idx = int(gap_breaks[k]) if k < len(gap_breaks) else n
+        reach_idx = first_reaching(current_idx, times[current_idx] + min_end_us)
+
+        if gap_idx <= reach_idx and gap_idx < n:
+            # End the segment at the event before the gap
+            end_idx = gap_idx - 1
+            end_time = event_times[end_idx]
+        elif reach_idx < n:
+            if times[reach_idx] <= times[current_idx] + max_end_us:
+                end_idx = reach_idx
+                end_time = event_times[end_idx]
+            else:
+                # Beyond the tolerance: use the previous event instead
+                end_idx = reach_idx - 1
+                end_time = event_times[end_idx]
+                if end_time is None:
+                    end_time = start_time + timedelta(seconds=target_duration_seconds)
+        else:
+            # Reached the end of the data: use the last event available
+            end_idx = n - 1
+            end_time = event_times[end_idx]
+            if end_time is None:
+                end_time = start_time + timedelta(seconds=target_duration_seconds)
+
+        if end_idx > current_idx:
+            segments.append((current_idx, end_idx, start_time, end_time))
+        current_idx = end_idx + 1
+    return segments
 
 # Updated create_dataset function with start/end times and duration
-def create_dataset(data, target_duration_seconds=300, tolerance_seconds=30):
+def create_dataset(data, target_duration_seconds=300, tolerance_seconds=30, cube=None):
     """
     Create a dataset for LSTM by segmenting data based on time duration instead of fixed event count.
 
@@ -130,107 +226,30 @@ def create_dataset(data, target_duration_seconds=300, tolerance_seconds=30):
         data: List of sensor events with datetime information
         target_duration_seconds: Target duration for each segment in seconds (default: 5 minutes)
         tolerance_seconds: Allowed tolerance in seconds (default: 30 seconds)
+        cube: optional SensorCountCube of the same data (built here otherwise); the sensor counts of
+              every segment are two row lookups in it
 
     Returns:
         X: Feature vectors
         y: Activity labels
     """
-    X, y = [], []
-    all_sensors = [f"M{i:03d}" for i in range(1, 32)] + ["D001", "D003", "D004"]
+    durations, y = [], []
+    start_times, end_times = [], []
 
     global_active_activities = {}  # Format: {activity: (start_idx, start_dt)}
     last_majority_activity = None
 
-    # Feature names for time features
-    start_time_feature_names = [
-        'start_hour_sin', 'start_hour_cos', 'start_minute_sin', 'start_minute_cos',
-        'start_day_sin', 'start_day_cos', 'start_month_sin', 'start_month_cos',
-        'start_day_of_week_sin', 'start_day_of_week_cos'
-    ]
-    end_time_feature_names = [
-        'end_hour_sin', 'end_hour_cos', 'end_minute_sin', 'end_minute_cos',
-        'end_day_sin', 'end_day_cos', 'end_month_sin', 'end_month_cos',
-        'end_day_of_week_sin', 'end_day_of_week_cos'
-    ]
-
-    current_idx = 0
-
-    while current_idx < len(data):
-        # Get start time of the segment; skip if missing/unparsable
-        start_time = get_event_datetime(data[current_idx])
-        if start_time is None:
-            current_idx += 1
-            continue
-
-        sequence_start_idx = current_idx
-
-        # Check the next event's time if available
-        next_idx = current_idx + 1
-        next_time = None
-        if next_idx < len(data):
-            next_time = get_event_datetime(data[next_idx])
-
-        # If the time difference exceeds target + tolerance, skip this event
-        if next_time and (next_time - start_time).total_seconds() > (target_duration_seconds + tolerance_seconds):
-            current_idx += 1
-            continue
-
-        target_end_time = start_time + timedelta(seconds=target_duration_seconds)
-        min_end_time = target_end_time - timedelta(seconds=tolerance_seconds)
-        max_end_time = target_end_time + timedelta(seconds=tolerance_seconds)
-
-        end_idx = current_idx + 1
-        end_time = None
-
-        # Search for an event to mark the segment's end
-        while end_idx < len(data) and end_idx < current_idx + 1000:  # Safety limit
-            event_time = get_event_datetime(data[end_idx])
-            if event_time is None:
-                end_idx += 1
-                continue
-
-            # Check the time difference with the previous event
-            prev_idx = end_idx - 1
-            prev_time = None
-            if prev_idx >= current_idx:
-                prev_time = get_event_datetime(data[prev_idx])
-            if prev_time and (event_time - prev_time).total_seconds() > (target_duration_seconds + tolerance_seconds):
-                # End the segment at the previous event
-                end_idx = prev_idx
-                end_time = get_event_datetime(data[end_idx])
-                if end_time is None:
-                    end_time = prev_time
-                break
-
-            # If we've reached the target duration window
-            if event_time >= min_end_time:
-                if event_time <= max_end_time:
-                    end_time = event_time
-                    break
-                else:
-                    # If beyond the tolerance, use the previous event instead
-                    end_idx -= 1
-                    end_time = get_event_datetime(data[end_idx])
-                    if end_time is None:
-                        end_time = start_time + timedelta(seconds=target_duration_seconds)
-                    break
-
-            end_idx += 1
-
-        # If we reach the end of the data, use the last event available
-        if end_idx >= len(data):
-            end_idx = len(data) - 1
-            end_time = get_event_datetime(data[end_idx])
-            if end_time is None:
-                end_time = start_time + timedelta(seconds=target_duration_seconds)
-
-        sequence = data[current_idx:end_idx+1]
+    # Parse every timestamp once up front (None for missing/unparsable ones), sensor columns for the counts
+    columns, event_times, activity_events = event_columns(data)
+    if cube is None:
+        cube = SensorCountCube.build(columns)
+    elif len(cube) != len(columns):
+        raise ValueError(f"SensorCountCube covers {len(cube)} events, data has {len(columns)}")
 
-        # Ensure the sequence has at least two valid events
-        if len(sequence) < 2:
-            current_idx = end_idx + 1
-            continue
+    segments = time_segments(event_times, target_duration_seconds, tolerance_seconds)
+    activity_position = 0  # Next entry of activity_events (segments are in event order)
 
+    for current_idx, end_idx, start_time, end_time in segments:
         # Calculate sequence duration
         if end_time:
             sequence_duration_sec = (end_time - start_time).total_seconds()
@@ -242,30 +261,34 @@ def create_dataset(data, target_duration_seconds=300, tolerance_seconds=30):
         active_activities = global_active_activities.copy()
         activity_durations = {}
 
-        # Process events within the sequence to compute durations for activities
-        for j, event in enumerate(sequence):
-            if event.get("activity"):
-                activity_parts = event["activity"].replace(" ", "").split(",")
-                if len(activity_parts) != 2:
-                    continue
-                activity_name, action = activity_parts
-
-                event_dt = get_event_datetime(event)
-                if event_dt is None:
-                    event_dt = datetime.now()  # or consider skipping the event
-
-                if action == "begin":
-                    active_activities[activity_name] = (j, event_dt)
-                elif action == "end":
-                    if activity_name in active_activities:
-                        start_idx_inner, start_dt = active_activities[activity_name]
-                        duration_sec = (event_dt - start_dt).total_seconds()
-                        activity_durations[activity_name] = activity_durations.get(activity_name, 0) + duration_sec
-                        del active_activities[activity_name]
+        # Process the events of the segment carrying activity information (only those are visited,
+        # events between two segments are skipped)
+        while activity_position < len(activity_events) and activity_events[activity_position][0] < current_idx:
+            activity_position += 1
+        while activity_position < len(activity_events) and activity_events[activity_position][0] <= end_idx:
+            event_idx, activity = activity_events[activity_position]
+            activity_position += 1
+            activity_parts = activity.replace(" ", "").split(",")
+            if len(activity_parts) != 2:
+                continue
+            activity_name, action = activity_parts
+
+            event_dt = event_times[event_idx]
+            if event_dt is None:
+                event_dt = datetime.now()  # or consider skipping the event
+
+            if action == "begin":
+                active_activities[activity_name] = (event_idx - current_idx, event_dt)
+            elif action == "end":
+                if activity_name in active_activities:
+                    start_idx_inner, start_dt = active_activities[activity_name]
+                    duration_sec = (event_dt - start_dt).total_seconds()
+                    activity_durations[activity_name] = activity_durations.get(activity_name, 0) + duration_sec
+                    del active_activities[activity_name]
 
         # Handle activities that started but did not finish within the segment
         for activity, (start_idx_inner, start_dt) in active_activities.items():
-            last_event_dt = get_event_datetime(sequence[-1])
+            last_event_dt = event_times[end_idx]
             if last_event_dt is None:
                 last_event_dt = datetime.now()
             duration_sec = (last_event_dt - start_dt).total_seconds()
@@ -283,32 +306,26 @@ def create_dataset(data, target_duration_seconds=300, tolerance_seconds=30):
             majority_activity = last_majority_activity
         last_majority_activity = majority_activity
 
-        start_features = extract_time_features(start_time, "start_")
-        end_features = extract_time_features(end_time, "end_")
-
-        # Count sensor activations (count states "ON" and "OPEN")
-        sensor_counts = [
-            sum(1 for e in sequence if e.get("sensor") == s and (e.get("state") == "ON" or e.get("state") == "OPEN"))
-            for s in all_sensors
-        ]
-
-        feature_vector = (
-            [start_features[name] for name in start_time_feature_names] +
-            [end_features[name] for name in end_time_feature_names] +
-            [sequence_duration_norm] +  # normalized duration
-            sensor_counts
-        )
-
-        X.append(feature_vector)
+        start_times.append(start_time)
+        end_times.append(end_time)
+        durations.append(sequence_duration_norm)
         y.append(majority_activity)
 
-        current_idx = end_idx + 1
+    # Count sensor activations (states "ON" and "OPEN") of every segment from the prefix sums
+    sensor_counts = cube.window_counts([(start_idx, end_idx) for start_idx, end_idx, _, _ in segments])
 
-    return np.array(X, dtype=np.float32), np.array(y)
+    # Feature vector: 10 start time features, 10 end time features (encoded in one batch), duration, sensor counts
+    X = np.empty((len(durations), 21 + sensor_counts.shape[1]), dtype=np.float32)
+    X[:, 0:10] = encode_time_features(start_times)
+    X[:, 10:20] = encode_time_features(end_times)
+    X[:, 20] = durations
+    X[:, 21:] = sensor_counts
+    return X, np.array(y)
 
-def save_dataset_to_file(X, y, filename="dataset_output.txt"):
+def save_dataset_to_file(X, y, filename="dataset_output.txt", max_rows=None):
     """
     Save the dataset to a readable text file, with named features for easy inspection.
+    Only the first max_rows windows are written if given; use dataset_io.save_dataset() for the full dataset.
     """
     feature_names = []
     
@@ -340,7 +357,8 @@ def save_dataset_to_file(X, y, filename="dataset_output.txt"):
     feature_names.extend(["D001", "D003", "D004"])
     
     with open(filename, 'w') as f:
-        for i in range(len(X)):
+        n_rows = len(X) if max_rows is None else min(len(X), max_rows)
+        for i in range(n_rows):
             f.write(f"X[{i}]: [\n")
             
             f.write("    # Time Features (20 features: 10 for start date, 10 for end date)\n")
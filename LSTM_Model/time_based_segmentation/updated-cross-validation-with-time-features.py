@@ -18,12 +18,14 @@ Key improvements:
 # Import required libraries
 import numpy as np
 import matplotlib.pyplot as plt
-from tensorflow.keras.models import Sequential
+from tensorflow.keras.models import Sequential, load_model
 from tensorflow.keras.layers import LSTM, Dense, Dropout, Bidirectional
 from sklearn.metrics import accuracy_score, classification_report, confusion_matrix, f1_score
 from sklearn.preprocessing import LabelEncoder, StandardScaler
-from sklearn.model_selection import StratifiedKFold, train_test_split
+import argparse
 import os
+import sys
+from functools import partial
 from datetime import datetime, timedelta
 import json
 import pickle
@@ -31,9 +33,21 @@ import tensorflow as tf
 # FIXED: Added import for Callback
 from tensorflow.keras.callbacks import Callback, EarlyStopping, ReduceLROnPlateau
 # Import functions from Create_LSTM_Input.py
-from Create_LSTM_Input import encode_cyclical_feature, extract_time_features, create_dataset, save_dataset_to_file
+from Create_LSTM_Input import encode_cyclical_feature, extract_time_features, create_dataset, save_dataset_to_file, time_segments
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "eventStore"))
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from event_store import load_events
+from feature_cache import FeatureCache
+from dataset_io import save_dataset
+from fold_scheduler import add_scheduler_arguments, run_folds
+from input_pipeline import BASE_BATCH_SIZE, fold_datasets, make_dataset, set_learning_rate
+from sequence_windows import (DEFAULT_MAX_GAP_SECONDS, build_sequences, fold_splits, holdout_split,
+                              model_input, scaler_rows)
+from window_features import event_columns, window_times
+from streaming_metrics import f1_metrics
 
-# Custom F1 Score metrics for Keras via callback
+# Exact sklearn F1 via callback (optional: one extra predict per epoch; val_f1 already comes from
+# the StreamingF1 metrics computed during the validation pass)
 class F1ScoreCallback(Callback):
     def __init__(self, validation_data=None, **kwargs):
         super(F1ScoreCallback, self).__init__(**kwargs)
@@ -52,7 +66,7 @@ class F1ScoreCallback(Callback):
             logs['val_f1'] = _val_f1
             print(f' - val_f1: {_val_f1:.4f}')
 
-# Function to create and train LSTM model - updated to remove f1_keras
+# Function to create and train LSTM model - F1 tracked by streaming confusion-matrix metrics
 def create_model(input_shape, num_classes):
     model = Sequential()
     model.add(Bidirectional(LSTM(256, activation='tanh', return_sequences=True), 
@@ -68,13 +82,90 @@ def create_model(input_shape, num_classes):
     model.compile(
         optimizer='adam', 
         loss='sparse_categorical_crossentropy', 
-        metrics=['accuracy']  # Removed f1_keras, using callback instead
+        metrics=['accuracy'] + f1_metrics(num_classes)  # Weighted and macro F1, no extra pass
     )
     
     return model
 
+# Train and evaluate one fold (runs in a run_folds worker)
+def train_fold(fold, X_train_fold, y_train_fold, X_val_fold, y_val_fold, num_classes, save_dir,
+               batch_size=BASE_BATCH_SIZE, f1_callback=False, verbose=1):
+    print(f"\n\n{'='*50}")
+    print(f"Fold {fold}")
+    print(f"{'='*50}")
+    print(f"[Fold {fold}] Train shape: {X_train_fold.shape}, Val shape: {X_val_fold.shape}")
+    
+    # Standardize features - using only training data for fitting
+    scaler = StandardScaler().fit(scaler_rows(X_train_fold))
+    
+    # LSTM input: (n, 1, n_features), or (n, K, n_features) sequences with --sequence-length K
+    X_train_fold_scaled = model_input(X_train_fold, scaler)
+    X_val_fold_scaled = model_input(X_val_fold, scaler)
+    
+    # Create model
+    model = create_model(input_shape=X_train_fold_scaled.shape[1:], num_classes=num_classes)
+    # Linear learning rate scaling for batch sizes above 32
+    set_learning_rate(model, batch_size)
+    
+    # Define callbacks
+    early_stopping = EarlyStopping(monitor='val_loss', patience=5, restore_best_weights=True)
+    reduce_lr = ReduceLROnPlateau(monitor='val_loss', factor=0.2, patience=3, min_lr=0.0001)
+    callbacks = [early_stopping, reduce_lr]
+    if f1_callback:
+        callbacks.insert(0, F1ScoreCallback(validation_data=(make_dataset(X_val_fold_scaled, batch_size=batch_size), y_val_fold)))
+    
+    # Train model
+    print(f"\nTraining model for fold {fold}...")
+    # tf.data pipeline: cache, shuffle, batch, prefetch
+    train_ds, val_ds = fold_datasets(X_train_fold_scaled, y_train_fold, X_val_fold_scaled, y_val_fold,
+                                     batch_size, seed=fold)
+    history = model.fit(
+        train_ds,
+        epochs=50,
+        validation_data=val_ds,
+        callbacks=callbacks,
+        verbose=verbose
+    )
+    
+    # Evaluate model
+    print(f"\nEvaluating model for fold {fold}...")
+    val_predictions = model.predict(make_dataset(X_val_fold_scaled, batch_size=batch_size), verbose=0)
+    predicted_classes = np.argmax(val_predictions, axis=1)
+    
+    # Save model and scaler for this fold
+    model_path = os.path.join(save_dir, f"lstm_activity_classifier_fold{fold}.keras")
+    model.save(model_path)
+    print(f"Model saved to {model_path}")
+    
+    scaler_path = os.path.join(save_dir, f"feature_scaler_fold{fold}.pkl")
+    with open(scaler_path, 'wb') as f:
+        pickle.dump(scaler, f)
+    print(f"Scaler saved to {scaler_path}")
+    
+    return {
+        'accuracy': accuracy_score(y_val_fold, predicted_classes),
+        'f1': f1_score(y_val_fold, predicted_classes, average='weighted'),
+        'history': history.history,
+        'val_f1s': history.history['val_f1'],
+        'y_val': y_val_fold,
+        'predicted_classes': predicted_classes,
+        'scaler': scaler,
+        'model_path': model_path,
+    }
+
 # Main execution
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="10-fold cross-validation of the LSTM on the time-based features.")
+    parser.add_argument("--batch-size", type=int, default=BASE_BATCH_SIZE,
+                        help="Training batch size (learning rate scaled linearly above 32)")
+    parser.add_argument("--sequence-length", type=int, default=1,
+                        help="Consecutive segments per LSTM sample (1: one segment, as before)")
+    parser.add_argument("--max-gap", type=float, default=DEFAULT_MAX_GAP_SECONDS,
+                        help="Largest gap (s) between two segments of the same sequence")
+    parser.add_argument("--f1-callback", action="store_true",
+                        help="Recompute the validation F1 with sklearn (one extra predict per epoch)")
+    args = add_scheduler_arguments(parser).parse_args()
+
     print("\nStep 1: Data Preparation")
     
     # File handling
@@ -88,19 +179,25 @@ if __name__ == "__main__":
         os.makedirs(save_dir)
         print(f"Created directory: {save_dir}")
 
-    with open(file_path, 'r') as f:
-        M_and_D_sensors_labeled_AllSensors = json.load(f)
+    M_and_D_sensors_labeled_AllSensors = load_events(file_path).records()
 
     if not M_and_D_sensors_labeled_AllSensors:
         print("❌ Error: Data not loaded")
         exit(1)
 
     print("Creating dataset with extended time features...")
-    X, y = create_dataset(M_and_D_sensors_labeled_AllSensors)
+    # Reuse the cached features while the data and the segmentation parameters are unchanged
+    X, y = FeatureCache().load_or_create(
+        file_path, {"segmentation": "time", "target_duration_seconds": 300, "tolerance_seconds": 30},
+        lambda: create_dataset(M_and_D_sensors_labeled_AllSensors, 300, 30)
+    )
     print(f"Dataset created with {len(X)} sequences")
     print(f"Feature vector size: {X.shape[1]} (includes start/end time features, duration, and sensor data)")
     print("saving data")
-    save_dataset_to_file(X, y, "featureExtracted_AllSensors_ExtendedTimeFeatures.txt")
+    save_dataset("featureExtracted_AllSensors_ExtendedTimeFeatures.npz", X, y,
+                 params={"segmentation": "time", "target_duration_seconds": 300, "tolerance_seconds": 30})
+    # Human-readable preview of the first sequences only
+    save_dataset_to_file(X, y, "featureExtracted_AllSensors_ExtendedTimeFeatures.txt", max_rows=100)
     print("data saved")
     
     # Display feature information
@@ -113,21 +210,35 @@ if __name__ == "__main__":
     # Label encoding
     label_encoder = LabelEncoder()
     y_encoded = label_encoder.fit_transform(y)
+    
+    # Sequence mode: K consecutive segments per sample, never across a day change or a gap
+    if args.sequence_length > 1:
+        _, event_times, _ = event_columns(M_and_D_sensors_labeled_AllSensors)
+        segments = time_segments(event_times, 300, 30)
+        start_times, end_times = window_times(event_times, [s[0] for s in segments], [s[1] for s in segments])
+        X, y_encoded = build_sequences(X, y_encoded, start_times, end_times, args.sequence_length, args.max_gap)
+        print(f"{len(X)} sequences of {args.sequence_length} segments")
     num_classes = len(label_encoder.classes_)
     print(f"Number of activity classes: {num_classes}")
     
     # NEW: Initial train+CV / hold-out split (80% / 20%)
     print("\nStep 2: Performing initial 80/20 train/hold-out split")
-    X_train_cv, X_holdout, y_train_cv, y_holdout = train_test_split(
-        X, y_encoded, test_size=0.2, random_state=42, stratify=y_encoded
-    )
+    # With sequences, whole runs go to one side: overlapping sequences never straddle the split
+    X_train_cv, X_holdout, y_train_cv, y_holdout = holdout_split(X, y_encoded, test_size=0.2, random_state=42)
     print(f"Training+CV data: {X_train_cv.shape}, Hold-out data: {X_holdout.shape}")
     
     # Step 3: Cross-Validation Implementation
     print("\nStep 3: Implementing K-Fold Cross-Validation on 80% of data")
     
     n_splits = 10  # Number of folds
-    kf = StratifiedKFold(n_splits=n_splits, shuffle=True, random_state=42)
+    
+    # Train the folds (in parallel with --workers)
+    results = run_folds(
+        partial(train_fold, num_classes=num_classes, save_dir=save_dir, batch_size=args.batch_size, f1_callback=args.f1_callback,
+                verbose=1 if args.workers == 1 else 2),
+        X_train_cv, y_train_cv, fold_splits(X_train_cv, y_train_cv, n_splits=n_splits, random_state=42),
+        workers=args.workers, intra_op_threads=args.intra_op_threads, inter_op_threads=args.inter_op_threads
+    )
     
     # Metrics storage
     cv_accuracy = []
@@ -137,129 +248,70 @@ if __name__ == "__main__":
     # For visualization
     plt.figure(figsize=(15, 15))
     
-    fold = 1
-    best_model = None
+    best_fold = None
     best_f1 = 0
-    best_scaler = None
     
-    for train_index, val_index in kf.split(X_train_cv, y_train_cv):
-        print(f"\n\n{'='*50}")
-        print(f"Fold {fold}/{n_splits}")
-        print(f"{'='*50}")
-        
-        # Split data for this fold
-        X_train_fold, X_val_fold = X_train_cv[train_index], X_train_cv[val_index]
-        y_train_fold, y_val_fold = y_train_cv[train_index], y_train_cv[val_index]
-        
-        print(f"[Fold {fold}] Train shape: {X_train_fold.shape}, Val shape: {X_val_fold.shape}")
-        
-        # Standardize features - using only training data for fitting
-        scaler = StandardScaler()
-        X_train_fold_scaled = scaler.fit_transform(X_train_fold)
-        X_val_fold_scaled = scaler.transform(X_val_fold)
-        
-        # Reshape data for LSTM
-        time_steps = 1
-        X_train_fold_scaled = X_train_fold_scaled.reshape((X_train_fold_scaled.shape[0], time_steps, X_train_fold_scaled.shape[1]))
-        X_val_fold_scaled = X_val_fold_scaled.reshape((X_val_fold_scaled.shape[0], time_steps, X_val_fold_scaled.shape[1]))
-        
-        # Create model
-        model = create_model(input_shape=(time_steps, X_train_fold.shape[1]), num_classes=num_classes)
-        
-        # Define callbacks
-        f1_callback = F1ScoreCallback(validation_data=(X_val_fold_scaled, y_val_fold))
-        early_stopping = EarlyStopping(monitor='val_loss', patience=5, restore_best_weights=True)
-        reduce_lr = ReduceLROnPlateau(monitor='val_loss', factor=0.2, patience=3, min_lr=0.0001)
-        
-        # Train model
-        print(f"\nTraining model for fold {fold}...")
-        history = model.fit(
-            X_train_fold_scaled, y_train_fold,
-            epochs=50,  
-            batch_size=32,
-            validation_data=(X_val_fold_scaled, y_val_fold),
-            callbacks=[f1_callback, early_stopping, reduce_lr],
-            verbose=1
-        )
-        
-        # Evaluate model
-        print(f"\nEvaluating model for fold {fold}...")
-        val_predictions = model.predict(X_val_fold_scaled)
-        predicted_classes = np.argmax(val_predictions, axis=1)
-        
-        # Calculate metrics
-        accuracy = accuracy_score(y_val_fold, predicted_classes)
-        f1 = f1_score(y_val_fold, predicted_classes, average='weighted')
+    for result in results:
+        fold, history = result['fold'], result['history']
+        accuracy, f1 = result['accuracy'], result['f1']
         
         print(f"Fold {fold} - Accuracy: {accuracy:.4f}, F1 Score: {f1:.4f}")
         
         # Track best model based on F1 score
         if f1 > best_f1:
             best_f1 = f1
-            best_model = model
-            best_scaler = scaler
+            best_fold = result
             print(f"New best model found in fold {fold} with F1: {best_f1:.4f}")
         
         # Store metrics
         cv_accuracy.append(accuracy)
         cv_f1_scores.append(f1)
         cv_histories.append({
-            'loss': history.history['loss'],
-            'val_loss': history.history['val_loss'],
-            'accuracy': history.history['accuracy'],
-            'val_accuracy': history.history['val_accuracy'],
-            'val_f1': f1_callback.val_f1s
+            'loss': history['loss'],
+            'val_loss': history['val_loss'],
+            'accuracy': history['accuracy'],
+            'val_accuracy': history['val_accuracy'],
+            'val_f1': result['val_f1s']
         })
         
         # Plot training progress for this fold
         plt.subplot(n_splits, 3, (fold-1)*3 + 1)
-        plt.plot(history.history['loss'], label='Train Loss')
-        plt.plot(history.history['val_loss'], label='Validation Loss')
+        plt.plot(history['loss'], label='Train Loss')
+        plt.plot(history['val_loss'], label='Validation Loss')
         plt.title(f"Fold {fold} - Loss")
         plt.legend()
         
         plt.subplot(n_splits, 3, (fold-1)*3 + 2)
-        plt.plot(history.history['accuracy'], label='Train Accuracy')
-        plt.plot(history.history['val_accuracy'], label='Validation Accuracy')
+        plt.plot(history['accuracy'], label='Train Accuracy')
+        plt.plot(history['val_accuracy'], label='Validation Accuracy')
         plt.title(f"Fold {fold} - Accuracy")
         plt.legend()
         
         plt.subplot(n_splits, 3, (fold-1)*3 + 3)
-        plt.plot(f1_callback.val_f1s, label='Validation F1 Score')
+        plt.plot(result['val_f1s'], label='Validation F1 Score')
         plt.title(f"Fold {fold} - F1 Score")
         plt.legend()
         
         # Print classification report for this fold
         print("\nClassification Report for fold {}:".format(fold))
         print(classification_report(
-            y_val_fold,
-            predicted_classes,
+            result['y_val'],
+            result['predicted_classes'],
             target_names=label_encoder.classes_,
             zero_division=0
         ))
-        
-        # Save model and scaler for this fold
-        model_path = os.path.join(save_dir, f"lstm_activity_classifier_fold{fold}.keras")
-        model.save(model_path)
-        print(f"Model saved to {model_path}")
-        
-        scaler_path = os.path.join(save_dir, f"feature_scaler_fold{fold}.pkl")
-        with open(scaler_path, 'wb') as f:
-            pickle.dump(scaler, f)
-        print(f"Scaler saved to {scaler_path}")
-        
-        # Increment fold counter
-        fold += 1
+    
+    best_model = load_model(best_fold['model_path'])
+    best_scaler = best_fold['scaler']
     
     # Step 4: Final evaluation on hold-out set
     print("\nStep 4: Final evaluation on 20% hold-out set")
     
     # Scale and reshape hold-out data using best scaler
-    X_holdout_scaled = best_scaler.transform(X_holdout)
-    X_holdout_scaled = X_holdout_scaled.reshape((X_holdout_scaled.shape[0], time_steps, X_holdout_scaled.shape[1]))
+    X_holdout_scaled = model_input(X_holdout, best_scaler)
     
     # Evaluate on hold-out set
-    holdout_predictions = best_model.predict(X_holdout_scaled)
+    holdout_predictions = best_model.predict(make_dataset(X_holdout_scaled))
     holdout_classes = np.argmax(holdout_predictions, axis=1)
     
     # Calculate final metrics
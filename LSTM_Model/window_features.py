@@ -0,0 +1,291 @@
+"""
+window_features.py
+
+Column-oriented helpers shared by the create_dataset() functions of the LSTM inputs
+(event_based_segmentation, time_based_segmentation and the Bi-LStm copy):
+
+1. event_columns(): turns the event log (EventStore records or a list of event dicts) into
+   - the sensor column of every event: index of its sensor in ALL_SENSORS if the event is an
+     ON/OPEN activation of one of the 34 sensors, NOT_COUNTED otherwise,
+   - the parsed datetime of every event (None if missing/unparsable),
+   - the (index, activity) pairs of the events carrying an activity.
+
+2. SensorCountCube: per-sensor cumulative counts of a whole dataset ((events + 1) x 34, compact
+   unsigned dtype, optionally saved and memory-mapped), built once. The counts of any window
+   (start_idx, end_idx) are the difference of two of its rows, whatever the segmentation
+   (event-based, overlapping, time-based).
+
+3. window_sensor_counts(): the 34 sensor counts of windows of time_steps events starting every
+   stride events. Non-overlapping windows (stride == time_steps) are counted with a single
+   np.bincount; overlapping ones (e.g. stride 1) with a SensorCountCube, so no window is rescanned
+   and memory stays linear in the number of events.
+
+4. encode_time_features(): the cyclical sin/cos time features of a whole array of timestamps as one
+   (n, 2 * len(components)) float32 block, same values as extract_time_features() but without a
+   dict per timestamp.
+"""
+
+import os
+import sys
+import numpy as np
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "eventStore"))
+from event_store import NO_MARKER
+from timestamps import event_datetimes
+
+# Cyclical time components: name -> period, in the order of the feature vector
+TIME_COMPONENTS = {
+    "hour": 24,
+    "minute": 60,
+    "second": 60,
+    "day": 31,  # Using 31 as max days in month
+    "month": 12,
+    "day_of_week": 7,
+    "time_of_day": 86400,
+}
+# The 10 start/end time features used by create_dataset()
+WINDOW_TIME_COMPONENTS = ("hour", "minute", "day", "month", "day_of_week")
+
+ALL_SENSORS = [f"M{i:03d}" for i in range(1, 32)] + ["D001", "D003", "D004"]
+ACTIVE_STATES = ("ON", "OPEN")
+NOT_COUNTED = -1
+
+_SENSOR_INDEX = {s: i for i, s in enumerate(ALL_SENSORS)}
+
+# Column names of the X matrix built by create_dataset()
+FEATURE_NAMES = (
+    [f"start_{name}_{part}" for name in WINDOW_TIME_COMPONENTS for part in ("sin", "cos")] +
+    [f"end_{name}_{part}" for name in WINDOW_TIME_COMPONENTS for part in ("sin", "cos")] +
+    ["activity_duration_normalized"] +
+    ALL_SENSORS
+)
+
+
+def _store_columns(store):
+    """event_columns() for an EventStore: lookups on the vocabularies, no dict per event."""
+    sensor_table = np.full(256, NOT_COUNTED, dtype=np.int16)
+    for code, name in enumerate(store.sensor_names):
+        sensor_table[code] = _SENSOR_INDEX.get(name, NOT_COUNTED)
+    columns = np.where(store.state_mask(ACTIVE_STATES), sensor_table[np.asarray(store.sensors)],
+                       NOT_COUNTED).astype(np.int16)
+
+    times = store.datetimes().astype(object).tolist()
+
+    activities = []
+    if store.marker_field == "activity":
+        markers = np.asarray(store.markers)
+        indices = np.flatnonzero(markers != NO_MARKER)
+        for i, code in zip(indices.tolist(), markers[indices].tolist()):
+            if store.marker_names[code]:
+                activities.append((i, store.marker_names[code]))
+    return columns, times, activities
+
+
+def sensor_column(sensor, state):
+    """Column of a single event: ALL_SENSORS index if it is an ON/OPEN activation, NOT_COUNTED otherwise."""
+    if state not in ACTIVE_STATES:
+        return NOT_COUNTED
+    return _SENSOR_INDEX.get(sensor, NOT_COUNTED)
+
+
+def event_columns(data):
+    """
+    Column view of the event log used by the featurizers.
+
+    Args:
+        data: EventStore records (load_events(...).records()) or a list of event dicts
+
+    Returns:
+        columns: int16 array, ALL_SENSORS index of each ON/OPEN event, NOT_COUNTED otherwise
+        times: list of datetime (None for missing/unparsable timestamps)
+        activities: list of (event index, activity string) for events with a non-empty "activity"
+    """
+    store = getattr(data, "store", None)
+    if store is not None:
+        return _store_columns(store)
+
+    columns = np.array([
+        _SENSOR_INDEX.get(e.get("sensor"), NOT_COUNTED) if e.get("state") in ACTIVE_STATES else NOT_COUNTED
+        for e in data
+    ], dtype=np.int16)
+    times = event_datetimes(data)
+    activities = [(i, e["activity"]) for i, e in enumerate(data) if e.get("activity")]
+    return columns, times, activities
+
+
+def window_times(event_times, first_events, last_events):
+    """
+    Time of the first and of the last event of each window (e.g. for sequence_windows.build_sequences).
+
+    Args:
+        event_times: times from event_columns() (list of datetime/None) or a datetime64 array
+        first_events, last_events: event indices of the windows (inclusive)
+
+    Returns:
+        start_times, end_times: datetime64[us] arrays (NaT for missing times)
+    """
+    times = np.asarray(event_times, dtype="datetime64[us]")
+    return times[np.asarray(first_events, dtype=np.int64)], times[np.asarray(last_events, dtype=np.int64)]
+
+
+def window_starts(n_events, time_steps, stride=None):
+    """
+    First event of each window of time_steps events, one window every stride events
+    (stride defaults to time_steps: non-overlapping windows). Incomplete windows are dropped.
+    """
+    stride = time_steps if stride is None else stride
+    if stride < 1:
+        raise ValueError(f"stride must be >= 1, got {stride}")
+    return np.arange(0, n_events - time_steps + 1, stride)
+
+
+def window_sensor_counts(columns, time_steps, stride=None):
+    """
+    Sensor counts of the windows data[i:i + time_steps] for i in window_starts(len(columns), time_steps, stride).
+
+    Args:
+        columns: output of event_columns()
+        time_steps: number of events per window
+        stride: events between the starts of two windows (default time_steps)
+
+    Returns:
+        int64 array of shape (n_windows, len(ALL_SENSORS))
+    """
+    n_sensors = len(ALL_SENSORS)
+    if stride is not None and stride != time_steps:
+        starts = window_starts(len(columns), time_steps, stride)
+        return SensorCountCube.build(columns).counts(starts, starts + time_steps - 1)
+
+    n_windows = len(columns) // time_steps
+    windows = np.asarray(columns[:n_windows * time_steps], dtype=np.int64).reshape(n_windows, time_steps)
+    # One bincount over all windows: slot 0 of each window collects the NOT_COUNTED events
+    slots = windows + 1 + np.arange(n_windows)[:, None] * (n_sensors + 1)
+    counts = np.bincount(slots.ravel(), minlength=n_windows * (n_sensors + 1))
+    return counts.reshape(n_windows, n_sensors + 1)[:, 1:]
+
+
+class SensorCountCube:
+    """
+    Prefix sums of the sensor activations: row k holds the counts of events 0..k-1 per sensor, so
+    the counts of events start_idx..end_idx are cumulative[end_idx + 1] - cumulative[start_idx].
+
+    Attributes:
+        cumulative: array of shape (n_events + 1, len(ALL_SENSORS)), uint16/uint32/uint64 depending
+                    on the number of events (a np.memmap when loaded from disk)
+    """
+
+    def __init__(self, cumulative):
+        self.cumulative = cumulative
+
+    def __len__(self):
+        """Number of events covered."""
+        return len(self.cumulative) - 1
+
+    @staticmethod
+    def count_dtype(n_events):
+        """Smallest unsigned dtype holding counts up to n_events."""
+        for dtype in (np.uint16, np.uint32):
+            if n_events <= np.iinfo(dtype).max:
+                return dtype
+        return np.uint64
+
+    @classmethod
+    def build(cls, columns, path=None):
+        """
+        Args:
+            columns: sensor columns from event_columns()
+            path: optional .npy file; the cube is written there and returned memory-mapped
+
+        Returns:
+            SensorCountCube
+        """
+        columns = np.asarray(columns)
+        shape = (len(columns) + 1, len(ALL_SENSORS))
+        dtype = cls.count_dtype(len(columns))
+        if path is None:
+            cumulative = np.zeros(shape, dtype=dtype)
+        else:
+            cumulative = np.lib.format.open_memmap(path, mode="w+", dtype=dtype, shape=shape)
+            cumulative[:] = 0
+        counted = np.flatnonzero(columns != NOT_COUNTED)
+        cumulative[counted + 1, columns[counted]] = 1
+        np.cumsum(cumulative, axis=0, out=cumulative)
+        if path is not None:
+            cumulative.flush()
+            return cls.load(path)
+        return cls(cumulative)
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """Cube written by build(columns, path)."""
+        return cls(np.load(path, mmap_mode="r" if mmap else None))
+
+    def counts(self, start_indices, end_indices):
+        """
+        Sensor counts of the windows start_indices[k]..end_indices[k] (both inclusive).
+
+        Returns:
+            int64 array of shape (n_windows, len(ALL_SENSORS))
+        """
+        starts = np.asarray(start_indices, dtype=np.int64)
+        ends = np.asarray(end_indices, dtype=np.int64) + 1
+        return self.cumulative[ends].astype(np.int64) - self.cumulative[starts].astype(np.int64)
+
+    def window_counts(self, windows):
+        """counts() for a list of (start_idx, end_idx) pairs."""
+        windows = np.asarray(windows, dtype=np.int64).reshape(-1, 2)
+        return self.counts(windows[:, 0], windows[:, 1])
+
+
+def time_components(timestamps, components=WINDOW_TIME_COMPONENTS):
+    """
+    Integer calendar components of datetime64 timestamps (NaT rows are returned as 0).
+
+    Returns:
+        int64 array of shape (n, len(components)), same values as the datetime attributes
+        (day_of_week: 0 = Monday, time_of_day: seconds since midnight)
+    """
+    timestamps = np.asarray(timestamps, dtype="datetime64[us]")
+    missing = np.isnat(timestamps)
+    timestamps = np.where(missing, np.datetime64(0, "us"), timestamps)
+
+    days = timestamps.astype("datetime64[D]")
+    months = timestamps.astype("datetime64[M]")
+    seconds = (timestamps - days).astype("timedelta64[s]").astype(np.int64)
+    values = {
+        "hour": lambda: seconds // 3600,
+        "minute": lambda: seconds // 60 % 60,
+        "second": lambda: seconds % 60,
+        "day": lambda: (days - months).astype(np.int64) + 1,
+        "month": lambda: months.astype(np.int64) % 12 + 1,
+        "day_of_week": lambda: (days.astype(np.int64) + 3) % 7,  # 1970-01-01 was a Thursday
+        "time_of_day": lambda: seconds,
+    }
+    result = np.zeros((len(timestamps), len(components)), dtype=np.int64)
+    for k, name in enumerate(components):
+        result[:, k] = values[name]()
+    result[missing] = 0
+    return result
+
+
+def encode_time_features(timestamps, components=WINDOW_TIME_COMPONENTS, missing_value=0.0):
+    """
+    Batched version of extract_time_features(): sin/cos encoding of the calendar components.
+
+    Args:
+        timestamps: datetime64 array, or a list of datetime objects (None for missing times)
+        components: names from TIME_COMPONENTS, in output order
+        missing_value: value of all the features of a missing timestamp (0 like extract_time_features,
+                       or np.nan to mask them)
+
+    Returns:
+        float32 array of shape (n, 2 * len(components)): [c0_sin, c0_cos, c1_sin, c1_cos, ...]
+    """
+    timestamps = np.asarray(timestamps, dtype="datetime64[us]").reshape(-1)
+    periods = np.array([TIME_COMPONENTS[name] for name in components])
+    # Same operation order as encode_cyclical_feature, so the float32 values are identical
+    angles = 2 * np.pi * time_components(timestamps, components) / periods
+    features = np.empty((len(timestamps), 2 * len(components)), dtype=np.float32)
+    features[:, 0::2] = np.sin(angles)
+    features[:, 1::2] = np.cos(angles)
+    features[np.isnat(timestamps)] = missing_value
+    return features
@@ -1,10 +1,13 @@
 import json
 from datetime import datetime
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "eventStore"))
+from event_store import load_events
 
 def load_sensor_data(file_path):
     """Load sensor data from JSON file"""
-    with open(file_path, 'r') as file:
-        return json.load(file)
+    return load_events(file_path).records()
 
 def find_activities(sensor_data):
     """Extract activities with begin/end markers from sensor data"""
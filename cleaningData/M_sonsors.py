@@ -1,4 +1,8 @@
 import json
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "eventStore"))
+from event_store import load_events
 
 # Define sensor categories
 M0_sensors = [
@@ -9,8 +13,7 @@ M0_sensors = [
 ]
 
 # Load the JSON data
-with open("./ValidData.json", "r") as file:
-    data = json.load(file)
+data = load_events("./ValidData.json").records()
 l=[]
 for d in data:
     if d['sensor'] not in M0_sensors :
@@ -1,33 +1,38 @@
 import json
-from datetime import datetime, timedelta
+from datetime import timedelta
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "eventStore"))
+from event_store import load_events
+from timestamps import unparsable_rows
 
 # Load data from data.json
-with open("data.json", "r") as file:
-    data = json.load(file)
+events = load_events("data.json")
+data = events.records()
 
-# Function to parse datetime
-def parse_datetime(date_str, time_str):
-    try:
-        return datetime.strptime(f"{date_str} {time_str}", "%Y-%m-%d %H:%M:%S.%f")
-    except ValueError:
-        return datetime.strptime(f"{date_str} {time_str}", "%Y-%m-%d %H:%M:%S")
+# Timestamps straight from the store column (no formatting/parsing round trip)
+timestamps = events.datetimes()
+bad_rows = unparsable_rows(timestamps)
+if len(bad_rows):
+    raise ValueError(f"{len(bad_rows)} events have an unparsable date/time, e.g. rows {bad_rows[:5].tolist()}")
+event_times = timestamps.astype(object).tolist()
 
 # Dictionary to store durations for each activity
 durations = {}
 
 # Iterate through the data to find begin and end events
-for entry in data:
+for entry, entry_time in zip(data, event_times):
     description = entry.get("description")
     if description:
         activity, event = description.split(',')
         if event == "begin":
             if activity not in durations:
                 durations[activity] = []
-            durations[activity].append({"begin": parse_datetime(entry["date"], entry["time"])})
+            durations[activity].append({"begin": entry_time})
         elif event == "end" and activity in durations:
             for duration in durations[activity]:
                 if "end" not in duration:
-                    duration["end"] = parse_datetime(entry["date"], entry["time"])
+                    duration["end"] = entry_time
                     break
 
 # Calculate the durations and averages
@@ -1,4 +1,10 @@
+import argparse
 import json
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "eventStore"))
+from event_store import load_events, default_store_path, source_fingerprint
+from validation import validate_events, print_summary, write_problem_rows
 
 # Define sensor categories
 M0_sensors = [
@@ -10,50 +16,40 @@ M0_sensors = [
 D0_sensors = ["D001", "D002", "D003", "D004"]
 T0_sensors = ["T001", "T002", "T003", "T004", "T005"]
 
-# All sensors in one list
-sensors = M0_sensors + D0_sensors + T0_sensors
-
-# Load the JSON data
-with open("data.json", "r") as file:
-    data = json.load(file)
-
-# Apply validation and modification
-for d in data:
-
-    # Ensure the sensor is in the valid list of sensors
-    if d['sensor'] not in sensors:
-        print(f"Erreur : Le capteur '{d['sensor']}' n'est pas dans la liste des capteurs valides : {d}")
-        d.pop(d['sensor'])
-
-for d in data:
-    if d['sensor'] in M0_sensors :
-        if d["state"] not in ["OFF", "ON"]:
-            print(f"Erreur : L'état du capteur '{d['sensor']}' doit être 'ON' ou 'OFF' : {d}")
-            if "OF" in d["state"]:
-                d["state"] = "OFF"
-            if   "ON" in d["state"]:
-                d["state"] = "ON"
-for d in data:
-    if d['sensor'] in D0_sensors :
-        if d["state"] not in ["OPEN", "CLOSE"]:
-            print(f"Erreur : L'état du capteur '{d['sensor']}' doit être 'OPEN' ou 'CLOSE' : {d}")
-            if "OP" in d["state"]:
-                d["state"] = "OPEN"
-            if   "CL" in d["state"]:
-                d["state"] = "CLOSE"
-           
-
-for d in data:    # Check conditions for T0_sensors
-    if d['sensor'] in T0_sensors:
-        try:
-            # Try converting the state to a float
-            float(d["state"])
-        except (ValueError, TypeError):
-            print(f"Erreur : L'état du capteur '{d['sensor']}' doit être un nombre flottant : {d}")
-            
-
-# Write the modified data back to a new JSON file
-with open("modified_data.json", "w") as file:
-    json.dump(data, file, indent=4)
-
-print("Modifications terminées. Les données ont été enregistrées dans 'modified_data.json'.")
+# Validation rules: sensors outside these lists are removed, invalid states are repaired
+# when a repair pattern matches (applied in turn, as the original loop did) and reported otherwise
+rules = [
+    {"name": "M_state", "sensors": M0_sensors, "allowed": ["OFF", "ON"],
+     "repairs": [("OF", "OFF"), ("ON", "ON")]},
+    {"name": "D_state", "sensors": D0_sensors, "allowed": ["OPEN", "CLOSE"],
+     "repairs": [("OP", "OPEN"), ("CL", "CLOSE")]},
+    {"name": "T_state", "sensors": T0_sensors, "numeric": True},
+]
+
+parser = argparse.ArgumentParser(description="Validate and clean the event log (data.json -> modified_data.events)")
+parser.add_argument("--json", action="store_true", help="also write modified_data.json as an indented JSON list")
+args = parser.parse_args()
+
+# Load the event data
+events = load_events("data.json")
+
+# Apply validation and modification in a single pass
+cleaned, summary, problems = validate_events(events, rules)
+print_summary(summary)
+
+rejected_file = "rejected_rows.ndjson"
+n_problems = write_problem_rows(events, problems, rejected_file)
+print(f"{n_problems} rejected or invalid rows written to '{rejected_file}'")
+
+# Write the modified data as an event store (load_events("modified_data.json") picks it up);
+# pass --json to also write the JSON list. Without it the store has no source file: an older
+# modified_data.json left by a previous run does not replace it (see event_store._is_stale)
+output_file = "modified_data.json"
+source = None
+if args.json:
+    with open(output_file, "w") as file:
+        json.dump(list(cleaned.records()), file, indent=4)
+    source = source_fingerprint(output_file)
+cleaned.save(default_store_path(output_file), source=source)
+
+print(f"Modifications terminées. Les données ont été enregistrées dans '{default_store_path(output_file)}'.")
@@ -1,37 +1,152 @@
+"""
+csv_to_json.py
+
+Converts the raw CASAS log (one "date time sensor state description" event per line, separated by
+commas or whitespace) into the event format used by the rest of the pipeline.
+
+Two modes:
+- streaming (default): the log is read in chunks of --chunk-size lines, each row is validated
+  (enough fields, parsable date/time) and appended directly to a columnar event store
+  (see eventStore/event_store.py), so memory stays bounded whatever the size of the log.
+  An NDJSON copy (one event per line) can be written alongside with --ndjson for debugging.
+- --json: the original behaviour, a single indented JSON list (the whole log is held in memory).
+
+Downstream scripts keep calling load_events("data.json"): the default store path data.events
+is picked up even if data.json itself was never written.
+"""
+
+import argparse
 import json
+import os
+import sys
+from itertools import islice
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "eventStore"))
+from event_store import EventStoreWriter, default_store_path, source_fingerprint
+
+MAX_REPORTED_ERRORS = 10
+
+
+def parse_line(line):
+    """
+    Split one log line into (date, time, sensor, state, description).
+    Returns None for empty or malformed lines (less than date, time and sensor).
+    """
+    line = line.strip()
+    if not line:
+        return None
+    parts = line.split(',') if ',' in line else line.split()
+    # Ensure the line has at least 3 parts (date, time, sensor)
+    if len(parts) < 3:
+        return None
+    return (
+        parts[0],
+        parts[1],
+        parts[2],
+        parts[3] if len(parts) > 3 else None,
+        ','.join(parts[4:]) if len(parts) > 4 else None,
+    )
+
+
+def to_entry(row):
+    date, time, sensor, state, description = row
+    return {"date": date, "time": time, "sensor": sensor, "state": state, "description": description}
+
+
+def stream_ingest(input_file, store_path, chunk_size=100000, ndjson_file=None):
+    """
+    Parse the log chunk by chunk and append it to an event store.
+
+    Args:
+        input_file: raw log path
+        store_path: output event store directory
+        chunk_size: number of lines held in memory at once
+        ndjson_file: optional path of an NDJSON copy of the accepted events
+
+    Returns:
+        (number of events written, number of rejected lines)
+    """
+    rejected = 0
+    ndjson = open(ndjson_file, 'w') if ndjson_file else None
+
+    def reject(line_number, line, reason):
+        nonlocal rejected
+        rejected += 1
+        if rejected <= MAX_REPORTED_ERRORS:
+            print(f"Skipping line {line_number} ({reason}): {line.strip()}")
+
+    try:
+        with open(input_file, 'r') as file, \
+                EventStoreWriter(store_path, "description", source_fingerprint(input_file)) as writer:
+            line_number = 0
+            while True:
+                lines = list(islice(file, chunk_size))
+                if not lines:
+                    break
+
+                rows, row_lines = [], []
+                for line in lines:
+                    line_number += 1
+                    row = parse_line(line)
+                    if row is None:
+                        if line.strip():
+                            reject(line_number, line, "malformed")
+                        continue
+                    rows.append(row)
+                    row_lines.append((line_number, line))
+                if not rows:
+                    continue
+
+                dates, times, sensors, states, descriptions = zip(*rows)
+                bad_rows = set(writer.append(dates, times, sensors, states, descriptions).tolist())
+                for k in sorted(bad_rows):
+                    reject(*row_lines[k], "unparsable date/time")
+
+                if ndjson:
+                    for k, row in enumerate(rows):
+                        if k not in bad_rows:
+                            ndjson.write(json.dumps(to_entry(row)) + "\n")
+                print(f"Ingested {line_number} lines ({writer.count} events)")
+            written = writer.count
+    finally:
+        if ndjson:
+            ndjson.close()
+
+    if rejected > MAX_REPORTED_ERRORS:
+        print(f"... {rejected - MAX_REPORTED_ERRORS} more rejected lines not shown")
+    return written, rejected
+
+
+def convert_to_json(input_file, output_file):
+    """Original conversion: the whole log as one indented JSON list."""
+    data = []
+    with open(input_file, 'r') as file:
+        for line in file:
+            row = parse_line(line)
+            if row is None:
+                if line.strip():
+                    print(f"Skipping malformed line: {line.strip()}")
+                continue
+            data.append(to_entry(row))
+
+    with open(output_file, 'w') as json_file:
+        json.dump(data, json_file, indent=4)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert the raw CASAS log into events")
+    parser.add_argument("input_file", nargs="?", default="data.csv")
+    parser.add_argument("--output", default=None,
+                        help="event store directory (default: data.events), or JSON file with --json")
+    parser.add_argument("--json", action="store_true", help="write a single indented JSON list instead")
+    parser.add_argument("--ndjson", default=None, help="also write the accepted events as NDJSON")
+    parser.add_argument("--chunk-size", type=int, default=100000, help="lines parsed per chunk")
+    args = parser.parse_args()
 
-# Input and output file paths
-input_file = "data.csv"
-output_file = "data.json"
-
-# Open the input file and parse lines into a list of dictionaries
-data = []
-with open(input_file, 'r') as file:
-    for line in file:
-        # Skip empty lines
-        if not line.strip():
-            continue
-        
-        # Split the line into parts
-        parts = line.strip().split(',')
-
-        # Ensure the line has at least 3 parts (date, time, sensor)
-        if len(parts) < 3:
-            print(f"Skipping malformed line: {line.strip()}")
-            continue
-        
-        # Create a dictionary for each line
-        entry = {
-            "date": parts[0],
-            "time": parts[1],
-            "sensor": parts[2],
-            "state": parts[3] if len(parts) > 3 else None,
-            "description": ','.join(parts[4:]) if len(parts) > 4 else None
-        }
-        data.append(entry)
-
-# Write the parsed data to a JSON file
-with open(output_file, 'w') as json_file:
-    json.dump(data, json_file, indent=4)
-
-print("Conversion completed! JSON file saved as", output_file)
+    if args.json:
+        output_file = args.output or "data.json"
+        convert_to_json(args.input_file, output_file)
+        print("Conversion completed! JSON file saved as", output_file)
+    else:
+        output_store = args.output or default_store_path("data.json")
+        written, rejected = stream_ingest(args.input_file, output_store, args.chunk_size, args.ndjson)
+        print(f"Conversion completed! {written} events saved to {output_store} ({rejected} lines rejected)")
@@ -1,20 +1,23 @@
 import json
-from datetime import datetime
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "eventStore"))
+import numpy as np
+from event_store import load_events
+from timestamps import parse_datetimes
 
 # Load data from data.json
-with open("data.json", "r") as file:
-    data = json.load(file)
+data = load_events("data.json").records()
 
 # Filter D sensors and sort by date and time
 d_sensors = [entry for entry in data if entry["sensor"].startswith("D")]
 
-def parse_datetime(date_str, time_str):
-    try:
-        return datetime.strptime(f"{date_str} {time_str}", "%Y-%m-%d %H:%M:%S.%f")
-    except ValueError:
-        return datetime.strptime(f"{date_str} {time_str}", "%Y-%m-%d %H:%M:%S")
+def sort_by_datetime(entries):
+    # Parse all timestamps in one pass, then apply a stable sort on them
+    timestamps = parse_datetimes([e['date'] for e in entries], [e['time'] for e in entries])
+    return [entries[i] for i in np.argsort(timestamps, kind='stable')]
 
-d_sensors.sort(key=lambda x: parse_datetime(x['date'], x['time']))
+d_sensors = sort_by_datetime(d_sensors)
 
 # Load existing data from M&D_sensors.json
 try:
@@ -25,7 +28,7 @@ except FileNotFoundError:
 
 # Merge and sort the combined data
 combined_sensors = md_sensors + d_sensors
-combined_sensors.sort(key=lambda x: parse_datetime(x['date'], x['time']))
+combined_sensors = sort_by_datetime(combined_sensors)
 
 # Write the combined data back to M&D_sensors.json
 with open("M&D_sensors.json", "w") as file:
@@ -1,6 +1,8 @@
 import pandas as pd
-import json
 import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "eventStore"))
+from event_store import load_events
 
 # File handling
 
@@ -8,8 +10,7 @@ file_name = "processed_events.json"
 
 
 # Load JSON data
-with open(file_name, 'r') as f:
-    M_and_D_sensors_labeled_SensorsIntegration = json.load(f)
+M_and_D_sensors_labeled_SensorsIntegration = list(load_events(file_name).records())
 
 # Convert JSON data to DataFrame
 df = pd.DataFrame(M_and_D_sensors_labeled_SensorsIntegration)
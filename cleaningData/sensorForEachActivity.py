@@ -1,71 +1,154 @@
+"""
+sensorForEachActivity.py
+
+Counts, for every begin/end interval of every activity, how many events each sensor produced
+inside the interval, and the totals per activity.
+
+Begin and end markers are paired in one pass over the marker events, and the events of each
+interval are located with two binary searches on the sorted timestamps (eventStore/intervals.py)
+instead of rescanning the whole log for every interval.
+
+Run with --benchmark N to compare against the previous O(intervals x events) scan on the first
+N events (both results are checked to be identical).
+"""
+
 import json
-from datetime import datetime
-
-# Load data from M&D_sensors.json
-print("Loading data from M&D_sensors.json...")
-with open("M&D_sensors.json", "r") as file:
-    data = json.load(file)
-print(f"Loaded {len(data)} entries from M&D_sensors.json.")
-
-# Function to parse datetime
-def parse_datetime(date_str, time_str):
-    try:
-        return datetime.strptime(f"{date_str} {time_str}", "%Y-%m-%d %H:%M:%S.%f")
-    except ValueError:
-        return datetime.strptime(f"{date_str} {time_str}", "%Y-%m-%d %H:%M:%S")
-
-# Dictionary to store durations and sensor occurrences for each activity
-durations = {}
-sensor_occurrences = {}
-
-# Iterate through the data to find begin and end events
-print("Processing entries to find begin and end events...")
-for entry in data:
-    description = entry.get("description")
-    if description:
-        activity, event = description.split(',')
-        if event == "begin":
-            if activity not in durations:
-                durations[activity] = []
-                sensor_occurrences[activity] = {"activity": activity, "details": [], "total_sensors": {}}
-            durations[activity].append({"begin": parse_datetime(entry["date"], entry["time"])})
-        elif event == "end" and activity in durations:
-            for duration in durations[activity]:
-                if "end" not in duration:
-                    duration["end"] = parse_datetime(entry["date"], entry["time"])
-                    break
-print("Finished processing begin and end events.")
-
-# Calculate the sensor occurrences
-print("Calculating sensor occurrences for each activity...")
-for activity, times in durations.items():
-    print(f"Processing activity: {activity}")
-    for time in times:
-        if "end" in time:
-            print(f"Processing time range: {time['begin']} to {time['end']}")
-            sensors = {}
-            # Count the occurrences of each sensor between begin and end
-            for entry in data:
-                entry_time = parse_datetime(entry["date"], entry["time"])
-                if time["begin"] <= entry_time <= time["end"]:
-                    sensor = entry["sensor"]
-                    if sensor not in sensors:
-                        sensors[sensor] = 0
-                    sensors[sensor] += 1
-                    if sensor not in sensor_occurrences[activity]["total_sensors"]:
-                        sensor_occurrences[activity]["total_sensors"][sensor] = 0
-                    sensor_occurrences[activity]["total_sensors"][sensor] += 1
-                    print(f"Sensor {sensor} triggered at {entry_time}, count: {sensors[sensor]}")
-            sensor_occurrences[activity]["details"].append({
-                "begin": time["begin"].strftime("%Y-%m-%d %H:%M:%S.%f"),
-                "end": time["end"].strftime("%Y-%m-%d %H:%M:%S.%f"),
-                "sensors": sensors
+import os
+import sys
+import time
+import numpy as np
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "eventStore"))
+from event_store import load_events, MISSING_CODE
+from intervals import pair_intervals, TimeIndex
+from timestamps import unparsable_rows
+
+
+def format_time(timestamp):
+    # Same text as datetime.strftime("%Y-%m-%d %H:%M:%S.%f")
+    return str(np.datetime64(int(timestamp), "us")).replace("T", " ")
+
+
+def count_sensor_occurrences(events):
+    """
+    Sensor occurrences for each activity interval.
+
+    Returns:
+        {activity: {"activity", "details": [{"begin", "end", "sensors"}], "total_sensors"}}
+    """
+    timestamps = np.asarray(events.timestamps)
+    sensors = np.asarray(events.sensors)
+    sensor_names = [events.sensor_names[c] if c < len(events.sensor_names) else None
+                    for c in range(MISSING_CODE + 1)]
+    time_index = TimeIndex(events)
+
+    sensor_occurrences = {}
+    for activity, intervals in pair_intervals(events, match="first").items():
+        print(f"Processing activity: {activity}")
+        occurrences = {"activity": activity, "details": [], "total_sensors": {}}
+        total_sensors = occurrences["total_sensors"]
+        for begin_idx, end_idx in intervals:
+            if end_idx is None:
+                continue
+            begin, end = timestamps[begin_idx], timestamps[end_idx]
+            codes = sensors[time_index.events_between(begin, end)]
+            # Count with one bincount, keep sensors in order of first appearance in the interval
+            counts = np.bincount(codes, minlength=MISSING_CODE + 1)
+            _, first_seen = np.unique(codes, return_index=True)
+            interval_sensors = {}
+            for code in codes[np.sort(first_seen)].tolist():
+                name = sensor_names[code]
+                interval_sensors[name] = int(counts[code])
+                total_sensors[name] = total_sensors.get(name, 0) + int(counts[code])
+            occurrences["details"].append({
+                "begin": format_time(begin),
+                "end": format_time(end),
+                "sensors": interval_sensors,
             })
-            print(f"Finished processing time range: {time['begin']} to {time['end']}")
-    print(f"Finished processing activity: {activity}")
-
-# Write the results to sensorForEachActivity.json
-print("Writing results to sensorForEachActivity.json...")
-with open("sensorForEachActivity.json", "w") as file:
-    json.dump(sensor_occurrences, file, indent=4)
-print("Results saved to sensorForEachActivity.json")
\ No newline at end of file
+        sensor_occurrences[activity] = occurrences
+    return sensor_occurrences
+
+
+def count_sensor_occurrences_naive(events):
+    """
+    Previous implementation (full scan of the log for every interval), kept for --benchmark.
+    """
+    data = list(events.records())
+    timestamps = events.datetimes()
+    bad_rows = unparsable_rows(timestamps)
+    if len(bad_rows):
+        raise ValueError(f"{len(bad_rows)} events have an unparsable date/time, e.g. rows {bad_rows[:5].tolist()}")
+    event_times = timestamps.astype(object).tolist()
+    durations = {}
+    sensor_occurrences = {}
+    for entry, entry_time in zip(data, event_times):
+        description = entry.get("description")
+        if description:
+            activity, event = description.split(',')
+            if event == "begin":
+                if activity not in durations:
+                    durations[activity] = []
+                    sensor_occurrences[activity] = {"activity": activity, "details": [], "total_sensors": {}}
+                durations[activity].append({"begin": entry_time})
+            elif event == "end" and activity in durations:
+                for duration in durations[activity]:
+                    if "end" not in duration:
+                        duration["end"] = entry_time
+                        break
+    for activity, times in durations.items():
+        for time_range in times:
+            if "end" in time_range:
+                sensors = {}
+                for entry, entry_time in zip(data, event_times):
+                    if time_range["begin"] <= entry_time <= time_range["end"]:
+                        sensor = entry["sensor"]
+                        sensors[sensor] = sensors.get(sensor, 0) + 1
+                        totals = sensor_occurrences[activity]["total_sensors"]
+                        totals[sensor] = totals.get(sensor, 0) + 1
+                sensor_occurrences[activity]["details"].append({
+                    "begin": time_range["begin"].strftime("%Y-%m-%d %H:%M:%S.%f"),
+                    "end": time_range["end"].strftime("%Y-%m-%d %H:%M:%S.%f"),
+                    "sensors": sensors
+                })
+    return sensor_occurrences
+
+
+def benchmark(events, n_events):
+    """Time both implementations on the first n_events events and check they agree."""
+    n_events = min(n_events, len(events))
+    subset = events.take(np.arange(n_events))
+
+    start = time.perf_counter()
+    naive = count_sensor_occurrences_naive(subset)
+    naive_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    fast = count_sensor_occurrences(subset)
+    fast_seconds = time.perf_counter() - start
+
+    print(f"\nBenchmark on {n_events} events:")
+    print(f"  full scan per interval: {naive_seconds:.3f} s")
+    print(f"  sorted index lookup:    {fast_seconds:.3f} s")
+    print(f"  speedup: x{naive_seconds / max(fast_seconds, 1e-9):.1f}")
+    print(f"  identical results: {naive == fast}")
+
+
+if __name__ == "__main__":
+    # Load data from M&D_sensors.json
+    print("Loading data from M&D_sensors.json...")
+    events = load_events("M&D_sensors.json")
+    print(f"Loaded {len(events)} entries from M&D_sensors.json.")
+
+    if "--benchmark" in sys.argv:
+        position = sys.argv.index("--benchmark")
+        n_events = int(sys.argv[position + 1]) if len(sys.argv) > position + 1 else 20000
+        benchmark(events, n_events)
+        sys.exit(0)
+
+    print("Calculating sensor occurrences for each activity...")
+    sensor_occurrences = count_sensor_occurrences(events)
+
+    # Write the results to sensorForEachActivity.json
+    print("Writing results to sensorForEachActivity.json...")
+    with open("sensorForEachActivity.json", "w") as file:
+        json.dump(sensor_occurrences, file, indent=4)
+    print("Results saved to sensorForEachActivity.json")
@@ -1,5 +1,9 @@
 
 import json
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "eventStore"))
+from event_store import load_events
 activities = {
     "Meal_Preparation,begin": set(),
     "Meal_Preparation,end": set(),
@@ -24,8 +28,7 @@ activities = {
     "Respirate,begin": set(),
     "Respirate,end": set()
 }
-with open("M_and_D_sensors.json", "r") as file:
-    data = json.load(file)
+data = load_events("M_and_D_sensors.json").records()
 
 # Apply validation and modification
 for d in data:
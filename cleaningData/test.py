@@ -1,64 +1,84 @@
 import json
-from collections import defaultdict
+import os
+import sys
 import time
+import numpy as np
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "eventStore"))
+from event_store import load_events, format_timestamp, MISSING_CODE
+from intervals import pair_intervals, TimeIndex
 
-def analyze_sensor_activities(data):
+def analyze_sensor_activities(events):
+    """
+    Sensor occurrences between the begin and end markers of every activity.
+
+    Begin/end markers are paired per activity in one pass (pair_intervals), and the events of each
+    pair are found by binary search on the sorted timestamps (TimeIndex), so the whole analysis is
+    O(N log N). Intervals are compared on full timestamps and may cross midnight.
+    """
     start_time = time.time()
-    
-    # Remove duplicates
+
+    # Remove duplicates (same timestamp, sensor, state and description), keeping the first occurrence
     print("Removing duplicates...")
-    unique_data = []
-    seen = set()
-    for item in data:
-        key = (item['date'], item['time'], item['sensor'], item['state'], item['description'])
-        if key not in seen:
-            unique_data.append(item)
-            seen.add(key)
-    print(f"Removed duplicates. Unique entries count: {len(unique_data)}")
-    
-    # Track activities
+    keys = np.stack([
+        np.asarray(events.timestamps, dtype=np.int64),
+        np.asarray(events.sensors, dtype=np.int64),
+        np.asarray(events.states, dtype=np.int64),
+        np.asarray(events.markers, dtype=np.int64),
+    ], axis=1)
+    _, first_occurrences = np.unique(keys, axis=0, return_index=True)
+    unique_events = events.take(np.sort(first_occurrences))
+    print(f"Removed duplicates. Unique entries count: {len(unique_events)}")
+
+    # Track activities: per-activity begin/end pairs and a timestamp-sorted event index
     print("Tracking activities...")
-    activities = {}
-    activities_found = set(item['description'].split(',')[0] for item in unique_data if item.get('description') and item['description'].endswith(',begin'))
-    print(f"Found activities: {activities_found}")
+    intervals = pair_intervals(unique_events, match="first")
+    time_index = TimeIndex(unique_events)
+    timestamps = np.asarray(unique_events.timestamps)
+    sensors = np.asarray(unique_events.sensors)
+    sensor_names = [unique_events.sensor_names[c] if c < len(unique_events.sensor_names) else None
+                    for c in range(MISSING_CODE + 1)]
+    print(f"Found activities: {set(intervals)}")
+
+    def marker_time(i):
+        date, time_str = format_timestamp(timestamps[i])
+        return f"{date} {time_str}"
 
-    for activity in activities_found:
+    activities = {}
+    for activity, pairs in intervals.items():
         print(f"Processing activity: {activity}")
         # Initialize activity entry
         activities[activity] = {}
-        
-        # Find all begin-end couples for this activity
-        begin_entries = [e for e in unique_data if e.get('description') == f'{activity},begin']
-        end_entries = [e for e in unique_data if e.get('description') == f'{activity},end']
-        print(f"Found {len(begin_entries)} begin entries and {len(end_entries)} end entries for activity: {activity}")
+        completed = [(b, e) for b, e in pairs if e is not None]
+        print(f"Found {len(pairs)} begin entries and {len(completed)} matching end entries for activity: {activity}")
 
         # Track total sensor occurrences for this activity
-        total_sensor_occurrences = defaultdict(int)
-        
+        total_sensor_occurrences = {}
+
         # Process each begin-end couple
-        for i, (begin_entry, end_entry) in enumerate(zip(begin_entries, end_entries), 1):
-            print(f"Processing begin-end pair {i} for activity: {activity}")
-            # Find sensors between begin and end
-            sensors = defaultdict(int)
-            for item in unique_data:
-                if (begin_entry['date'] == item['date'] and 
-                    begin_entry['time'] <= item['time'] <= end_entry['time'] and
-                    item['sensor'] not in [begin_entry['sensor'], end_entry['sensor']]):
-                    sensors[item['sensor']] += 1
-                    total_sensor_occurrences[item['sensor']] += 1
-            
+        for i, (begin_idx, end_idx) in enumerate(completed, 1):
+            # Find sensors between begin and end, excluding the sensors of the markers themselves
+            codes = sensors[time_index.events_between(timestamps[begin_idx], timestamps[end_idx])]
+            codes = codes[(codes != sensors[begin_idx]) & (codes != sensors[end_idx])]
+            counts = np.bincount(codes, minlength=MISSING_CODE + 1)
+            _, first_seen = np.unique(codes, return_index=True)
+            sensor_counts = {}
+            for code in codes[np.sort(first_seen)].tolist():
+                name = sensor_names[code]
+                sensor_counts[name] = int(counts[code])
+                total_sensor_occurrences[name] = total_sensor_occurrences.get(name, 0) + int(counts[code])
+
             # Create an entry for this begin-end couple
             if i == 1:
-                activities[activity]['begin date'] = f"{begin_entry['date']} {begin_entry['time']}"
-                activities[activity]['end date'] = f"{end_entry['date']} {end_entry['time']}"
-                activities[activity]['sensors'] = dict(sensors)
+                activities[activity]['begin date'] = marker_time(begin_idx)
+                activities[activity]['end date'] = marker_time(end_idx)
+                activities[activity]['sensors'] = sensor_counts
             else:
-                activities[activity][f'begin date {i}'] = f"{begin_entry['date']} {begin_entry['time']}"
-                activities[activity][f'end date {i}'] = f"{end_entry['date']} {end_entry['time']}"
-                activities[activity][f'sensors {i}'] = dict(sensors)
-        
+                activities[activity][f'begin date {i}'] = marker_time(begin_idx)
+                activities[activity][f'end date {i}'] = marker_time(end_idx)
+                activities[activity][f'sensors {i}'] = sensor_counts
+
         # Add total sensor occurrences
-        activities[activity]['total_sensor_occurrences'] = dict(total_sensor_occurrences)
+        activities[activity]['total_sensor_occurrences'] = total_sensor_occurrences
         print(f"Finished processing activity: {activity}")
 
     end_time = time.time()
@@ -67,8 +87,7 @@ def analyze_sensor_activities(data):
 
 # Process data and write to file
 print("Loading data from M&D_sensors.json...")
-with open('M&D_sensors.json', 'r') as file:
-    data = json.load(file)
+data = load_events('M&D_sensors.json')
 print(f"Loaded {len(data)} entries from M&D_sensors.json.")
 
 result = analyze_sensor_activities(data)
@@ -76,4 +95,4 @@ result = analyze_sensor_activities(data)
 print("Writing results to sensorForEachActivity.json...")
 with open('sensorForEachActivity.json', 'w') as outfile:
     json.dump(result, outfile, indent=2)
-print("Results saved to sensorForEachActivity.json")
\ No newline at end of file
+print("Results saved to sensorForEachActivity.json")
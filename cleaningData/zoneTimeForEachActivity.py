@@ -1,16 +1,14 @@
 import json
-from datetime import datetime
 from collections import defaultdict
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "eventStore"))
+import numpy as np
+from event_store import load_events
+from timestamps import parse_datetimes
 
 # Charger les données depuis le fichier JSON
-with open("M&D_sensors.json", "r") as f:
-    events = json.load(f)
-
-def parse_datetime(date_str, time_str):
-    try:
-        return datetime.strptime(f"{date_str} {time_str}", "%Y-%m-%d %H:%M:%S.%f")
-    except ValueError:
-        return datetime.strptime(f"{date_str} {time_str}", "%Y-%m-%d %H:%M:%S")
+events = load_events("M&D_sensors.json").records()
 
 def categorize_time(timestamp):
     hour = timestamp.hour
@@ -32,16 +30,18 @@ def analyze_activity_patterns(events):
     # Stockage temporaire des activités commencées
     ongoing_activities = {}
 
-    # Trier les événements par ordre chronologique
-    sorted_events = sorted(events, key=lambda x: parse_datetime(x['date'], x['time']))
+    # Trier les événements par ordre chronologique (dates analysées en une seule passe)
+    timestamps = parse_datetimes([e['date'] for e in events], [e['time'] for e in events])
+    sorted_indices = np.argsort(timestamps, kind='stable')
 
-    for event in sorted_events:
+    for i in sorted_indices:
+        event = events[i]
         if not event['activity']:
             continue  # Ignorer les événements sans activité
 
         # Extraire le nom de l'activité et l'action (begin/end)
         activity_name, action = event['activity'].split(',')
-        timestamp = parse_datetime(event['date'], event['time'])
+        timestamp = timestamps[i].item()
         period = categorize_time(timestamp)
 
         if action == 'begin':
@@ -0,0 +1,430 @@
+"""
+event_store.py
+
+Columnar, memory-mappable storage for the CASAS sensor event log. The JSON files produced by the
+cleaning and labeling steps (a list of {"date", "time", "sensor", "state", "activity"} dicts) are
+converted once into a store directory holding one flat binary file per column:
+
+1. timestamp.bin: int64 microseconds since the Unix epoch (naive local time, as in the log;
+   unparsable timestamps are stored as NaT, i.e. the int64 minimum).
+2. sensor.bin: uint8 code into the sensor vocabulary (255 = missing).
+3. state.bin: uint8 code into the state vocabulary (255 = missing).
+4. marker.bin: int16 code into the activity marker vocabulary ("Sleeping,begin", "Other", ...; -1 = none).
+5. meta.json: event count, the three vocabularies, the name of the marker field ("activity" or
+   "description") and a fingerprint of the source file used to detect stale stores.
+
+load_events() is the entry point for every script: given a JSON path it reuses (or builds) the store
+next to it and returns an EventStore whose columns are read-only memory maps. Scripts that still work
+on dicts can iterate EventStore.records(), which materializes one event dict at a time.
+"""
+
+import json
+import os
+from collections.abc import Sequence
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from timestamps import parse_datetimes
+
+STORE_VERSION = 1
+STORE_SUFFIX = ".events"
+
+MISSING_CODE = 255      # sensor/state code used for missing values
+NO_MARKER = -1          # marker code for events without an activity marker
+NAT = np.iinfo(np.int64).min   # timestamp value of unparsable dates (numpy's NaT)
+
+COLUMN_DTYPES = {
+    "timestamp": np.int64,
+    "sensor": np.uint8,
+    "state": np.uint8,
+    "marker": np.int16,
+}
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def parse_timestamps(dates, times, errors="coerce", verbose=True):
+    """
+    Convert date/time string columns into int64 epoch microseconds (see timestamps.parse_datetimes).
+    """
+    return parse_datetimes(dates, times, errors=errors, verbose=verbose).astype(np.int64)
+
+
+def format_timestamp(value):
+    """
+    Turn an epoch-microsecond value back into the ("YYYY-MM-DD", "HH:MM:SS[.ffffff]") strings of the log.
+    NaT values give (None, None).
+    """
+    if value == NAT:
+        return None, None
+    dt = _EPOCH + timedelta(microseconds=int(value))
+    return dt.date().isoformat(), dt.time().isoformat()
+
+
+def _encode(values, codes, names, missing, limit):
+    """
+    Map a column of strings onto integer codes, extending the vocabulary (codes/names) in place.
+    Empty and None values are mapped to the missing code.
+    """
+    values = np.array(["" if v is None else str(v) for v in values], dtype=str)
+    if len(values) == 0:
+        return np.empty(0, dtype=np.int64)
+    uniques, inverse = np.unique(values, return_inverse=True)
+    lookup = np.empty(len(uniques), dtype=np.int64)
+    for k, value in enumerate(uniques):
+        if value == "":
+            lookup[k] = missing
+            continue
+        if value not in codes:
+            if len(names) >= limit:
+                raise ValueError(f"Vocabulary overflow: more than {limit} distinct values (at '{value}')")
+            codes[value] = len(names)
+            names.append(value)
+        lookup[k] = codes[value]
+    return lookup[inverse.reshape(-1)]
+
+
+def source_fingerprint(path):
+    """Size and modification time of a source file, used to detect stale stores."""
+    stat = os.stat(path)
+    return {"path": os.path.abspath(path), "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def default_store_path(json_path):
+    """Store directory used for a given JSON file, e.g. data.json -> data.events"""
+    return os.path.splitext(json_path)[0] + STORE_SUFFIX
+
+
+class EventStoreWriter:
+    """
+    Append events chunk by chunk into a store directory. Vocabularies grow as new values are seen
+    and meta.json is written on close(), so a partially written store is never picked up by load_events().
+    """
+
+    def __init__(self, store_path, marker_field="activity", source=None):
+        self.store_path = store_path
+        self.marker_field = marker_field
+        self.source = source
+        self.count = 0
+        self.sensor_names, self.state_names, self.marker_names = [], [], []
+        self._sensor_codes, self._state_codes, self._marker_codes = {}, {}, {}
+
+        os.makedirs(store_path, exist_ok=True)
+        meta_path = os.path.join(store_path, "meta.json")
+        if os.path.exists(meta_path):
+            os.remove(meta_path)
+        self._files = {
+            column: open(os.path.join(store_path, f"{column}.bin"), "wb") for column in COLUMN_DTYPES
+        }
+
+    def append(self, dates, times, sensors, states, markers):
+        """
+        Append a chunk of events given as parallel string columns. Rows whose date/time cannot be
+        parsed are not written.
+
+        Returns:
+            numpy array with the chunk indices of the rejected rows
+        """
+        timestamps = parse_timestamps(dates, times, verbose=False)
+        rejected = np.flatnonzero(timestamps == NAT)
+        keep = timestamps != NAT
+        if len(rejected):
+            sensors, states, markers = (np.asarray(c, dtype=object)[keep] for c in (sensors, states, markers))
+        self.append_columns(
+            timestamps[keep],
+            _encode(sensors, self._sensor_codes, self.sensor_names, MISSING_CODE, MISSING_CODE),
+            _encode(states, self._state_codes, self.state_names, MISSING_CODE, MISSING_CODE),
+            _encode(markers, self._marker_codes, self.marker_names, NO_MARKER, np.iinfo(np.int16).max),
+        )
+        return rejected
+
+    def append_columns(self, timestamps, sensor_codes, state_codes, marker_codes):
+        """
+        Append a chunk of already encoded columns (codes must refer to this writer's vocabularies).
+        """
+        n = len(timestamps)
+        if not (len(sensor_codes) == len(state_codes) == len(marker_codes) == n):
+            raise ValueError("All columns of a chunk must have the same length")
+        chunk = {
+            "timestamp": timestamps,
+            "sensor": sensor_codes,
+            "state": state_codes,
+            "marker": marker_codes,
+        }
+        for column, values in chunk.items():
+            np.asarray(values).astype(COLUMN_DTYPES[column]).tofile(self._files[column])
+        self.count += n
+
+    def close(self):
+        for f in self._files.values():
+            f.close()
+        meta = {
+            "version": STORE_VERSION,
+            "count": self.count,
+            "marker_field": self.marker_field,
+            "sensors": self.sensor_names,
+            "states": self.state_names,
+            "markers": self.marker_names,
+            "source": self.source,
+        }
+        with open(os.path.join(self.store_path, "meta.json"), "w") as f:
+            json.dump(meta, f, indent=2)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            for f in self._files.values():
+                f.close()
+        return False
+
+
+class EventStore:
+    """
+    In-memory (or memory-mapped) columnar view of the event log.
+
+    Attributes:
+        timestamps: int64 epoch microseconds (NAT for unparsable dates)
+        sensors, states: uint8 codes into sensor_names / state_names (MISSING_CODE if absent)
+        markers: int16 codes into marker_names (NO_MARKER if the event carries no activity marker)
+        marker_field: name of the JSON key holding the marker ("activity" or "description")
+    """
+
+    def __init__(self, timestamps, sensors, states, markers,
+                 sensor_names, state_names, marker_names, marker_field="activity"):
+        self.timestamps = timestamps
+        self.sensors = sensors
+        self.states = states
+        self.markers = markers
+        self.sensor_names = list(sensor_names)
+        self.state_names = list(state_names)
+        self.marker_names = list(marker_names)
+        self.marker_field = marker_field
+        self._sensor_index = {name: code for code, name in enumerate(self.sensor_names)}
+        self._state_index = {name: code for code, name in enumerate(self.state_names)}
+        self._marker_index = {name: code for code, name in enumerate(self.marker_names)}
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def datetimes(self):
+        """Timestamps as a numpy datetime64[us] array (no copy)."""
+        return self.timestamps.view("datetime64[us]")
+
+    def sensor_code(self, name):
+        return self._sensor_index.get(name, -1)
+
+    def state_code(self, name):
+        return self._state_index.get(name, -1)
+
+    def marker_code(self, name):
+        return self._marker_index.get(name, NO_MARKER)
+
+    def sensor_mask(self, names):
+        """Boolean mask of events whose sensor is one of names."""
+        codes = [self._sensor_index[n] for n in names if n in self._sensor_index]
+        return np.isin(self.sensors, codes)
+
+    def state_mask(self, names):
+        """Boolean mask of events whose state is one of names."""
+        codes = [self._state_index[n] for n in names if n in self._state_index]
+        return np.isin(self.states, codes)
+
+    def take(self, indices):
+        """New in-memory EventStore holding the events at the given indices (or boolean mask)."""
+        return EventStore(
+            np.asarray(self.timestamps)[indices], np.asarray(self.sensors)[indices],
+            np.asarray(self.states)[indices], np.asarray(self.markers)[indices],
+            self.sensor_names, self.state_names, self.marker_names, self.marker_field,
+        )
+
+    def record(self, i):
+        """Materialize event i as the dict used by the JSON-based scripts."""
+        date, time = format_timestamp(self.timestamps[i])
+        sensor, state, marker = int(self.sensors[i]), int(self.states[i]), int(self.markers[i])
+        return {
+            "date": date,
+            "time": time,
+            "sensor": self.sensor_names[sensor] if sensor != MISSING_CODE else None,
+            "state": self.state_names[state] if state != MISSING_CODE else None,
+            self.marker_field: self.marker_names[marker] if marker != NO_MARKER else None,
+        }
+
+    def records(self):
+        """Read-only sequence of event dicts, built lazily on access."""
+        return EventRecords(self)
+
+    def save(self, store_path, source=None):
+        """Write this store to a directory in the on-disk format."""
+        with EventStoreWriter(store_path, self.marker_field, source) as writer:
+            writer.sensor_names = list(self.sensor_names)
+            writer.state_names = list(self.state_names)
+            writer.marker_names = list(self.marker_names)
+            writer.append_columns(self.timestamps, self.sensors, self.states, self.markers)
+
+
+class EventRecords(Sequence):
+    """
+    List-like adapter over an EventStore: indexing returns a fresh dict per event, slicing returns a
+    list of dicts. Changes made to the returned dicts are not written back to the store.
+    """
+
+    def __init__(self, store):
+        self.store = store
+
+    def __len__(self):
+        return len(self.store)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.store.record(i) for i in range(*index.indices(len(self.store)))]
+        if index < 0:
+            index += len(self.store)
+        if not 0 <= index < len(self.store):
+            raise IndexError("event index out of range")
+        return self.store.record(index)
+
+    def __iter__(self):
+        for i in range(len(self.store)):
+            yield self.store.record(i)
+
+
+def events_from_records(records, marker_field=None):
+    """
+    Build an in-memory EventStore from a list of event dicts (e.g. the output of json.load).
+    The marker field defaults to "activity" if the first event has that key, else "description".
+    """
+    if marker_field is None:
+        first = records[0] if len(records) else {}
+        marker_field = "activity" if "activity" in first else "description"
+    sensor_codes, sensor_names = {}, []
+    state_codes, state_names = {}, []
+    marker_codes, marker_names = {}, []
+    store = EventStore(
+        parse_timestamps([r["date"] for r in records], [r["time"] for r in records]),
+        _encode([r.get("sensor") for r in records], sensor_codes, sensor_names,
+                MISSING_CODE, MISSING_CODE).astype(np.uint8),
+        _encode([r.get("state") for r in records], state_codes, state_names,
+                MISSING_CODE, MISSING_CODE).astype(np.uint8),
+        _encode([r.get(marker_field) for r in records], marker_codes, marker_names,
+                NO_MARKER, np.iinfo(np.int16).max).astype(np.int16),
+        sensor_names, state_names, marker_names, marker_field,
+    )
+    return store
+
+
+def build_event_store(json_path, store_path=None):
+    """
+    Convert a JSON event file into a store directory (json.load is paid once, here).
+
+    Returns:
+        The path of the store directory.
+    """
+    store_path = store_path or default_store_path(json_path)
+    print(f"Building event store {store_path} from {json_path}...")
+    with open(json_path, "r") as f:
+        records = json.load(f)
+    store = events_from_records(records)
+    del records
+    store.save(store_path, source=source_fingerprint(json_path))
+    print(f"Event store built with {len(store)} events")
+    return store_path
+
+
+def open_event_store(store_path, mmap=True):
+    """
+    Open an existing store directory. With mmap=True the columns are read-only memory maps.
+    """
+    with open(os.path.join(store_path, "meta.json"), "r") as f:
+        meta = json.load(f)
+    if meta.get("version") != STORE_VERSION:
+        raise ValueError(f"Unsupported event store version {meta.get('version')} in {store_path}")
+    count = meta["count"]
+    columns = {}
+    for column, dtype in COLUMN_DTYPES.items():
+        column_path = os.path.join(store_path, f"{column}.bin")
+        if count == 0:
+            columns[column] = np.empty(0, dtype=dtype)
+        elif mmap:
+            columns[column] = np.memmap(column_path, dtype=dtype, mode="r", shape=(count,))
+        else:
+            columns[column] = np.fromfile(column_path, dtype=dtype, count=count)
+    return EventStore(
+        columns["timestamp"], columns["sensor"], columns["state"], columns["marker"],
+        meta["sensors"], meta["states"], meta["markers"], meta.get("marker_field", "activity"),
+    )
+
+
+def _is_stale(store_path, json_path):
+    """
+    Whether the store must be (re)built from json_path:
+    - no store yet: rebuilt,
+    - store built from json_path: rebuilt if the JSON changed since (size or modification time),
+    - store written from another source (csv_to_json streaming data.csv, cleaning.py without --json...):
+      the newer of the two is used, with a warning, so a fresh store is never replaced by an older JSON.
+    """
+    meta_path = os.path.join(store_path, "meta.json")
+    if not os.path.exists(meta_path):
+        return True
+    if not os.path.exists(json_path):
+        return False
+    with open(meta_path, "r") as f:
+        source = json.load(f).get("source") or {}
+    current = source_fingerprint(json_path)
+    if source.get("path") == current["path"]:
+        return source.get("size") != current["size"] or source.get("mtime_ns") != current["mtime_ns"]
+
+    origin = source.get("path") or "no source file"
+    if current["mtime_ns"] > os.stat(meta_path).st_mtime_ns:
+        print(f"WARNING: {store_path} was written from {origin}, {json_path} is newer: rebuilding from {json_path}")
+        return True
+    print(f"WARNING: {store_path} was written from {origin}, not from {json_path}: using the store (newer)")
+    return False
+
+
+def ensure_event_store(path, rebuild=False):
+    """
+    Store directory that load_events(path) opens, (re)built from the JSON file first if it is missing
+    or stale (see _is_stale).
+    """
+    if os.path.isdir(path):
+        return path
+    store_path = default_store_path(path)
+    if rebuild or _is_stale(store_path, path):
+        build_event_store(path, store_path)
+    return store_path
+
+
+def load_events(path, mmap=True, rebuild=False):
+    """
+    Load the event log as an EventStore. This replaces json.load() of the event JSON files.
+
+    Args:
+        path: either a store directory or a JSON event file. For a JSON file, the store next to it
+              (data.json -> data.events) is reused when up to date and (re)built otherwise
+              (see _is_stale for stores written from another source).
+        mmap: memory-map the columns instead of reading them into RAM
+        rebuild: force the conversion from JSON even if an up-to-date store exists
+
+    Returns:
+        EventStore
+    """
+    return open_event_store(ensure_event_store(path, rebuild), mmap=mmap)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Convert JSON event logs into columnar event stores")
+    parser.add_argument("json_files", nargs="+", help="JSON event files to convert")
+    parser.add_argument("--force", action="store_true", help="rebuild even if the store is up to date")
+    args = parser.parse_args()
+
+    for json_file in args.json_files:
+        events = load_events(json_file, rebuild=args.force)
+        print(f"{json_file}: {len(events)} events, {len(events.sensor_names)} sensors, "
+              f"{len(events.state_names)} states, {len(events.marker_names)} activity markers")
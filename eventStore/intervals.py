@@ -0,0 +1,181 @@
+"""
+intervals.py
+
+Activity intervals over an EventStore:
+
+1. activity_markers(): the events carrying an activity marker, with the marker split into
+   activity name and action ("begin"/"end"). Markers are parsed once per vocabulary entry.
+
+2. pair_intervals(): matches every "end" marker with an open "begin" of the same activity
+   ("first" = earliest open begin, "last" = most recent open begin).
+
+3. TimeIndex: the event timestamps in sorted order, so that the events falling inside
+   [begin, end] are found with two binary searches (np.searchsorted) instead of a scan of the log.
+
+4. IntervalStats: event counts, ON/OPEN counts and durations of many intervals at once, using
+   prefix sums over the sorted events so each interval count is O(1) once located.
+"""
+
+from collections import OrderedDict, deque
+
+import numpy as np
+
+from event_store import NO_MARKER
+
+
+def split_marker(marker):
+    """
+    "Sleeping,begin" -> ("Sleeping", "begin"); "Relax,end,modified" -> ("Relax", "end").
+    Returns (None, None) for markers without an action (e.g. "Other").
+    """
+    parts = [p.strip() for p in marker.split(",")]
+    if len(parts) < 2 or parts[1] not in ("begin", "end"):
+        return None, None
+    return parts[0], parts[1]
+
+
+def activity_markers(store):
+    """
+    Events carrying a begin/end activity marker, in log order.
+
+    Returns:
+        list of (event index, activity name, action)
+    """
+    parsed = [split_marker(name) for name in store.marker_names]
+    markers = np.asarray(store.markers)
+    indices = np.flatnonzero(markers != NO_MARKER)
+    result = []
+    for i, code in zip(indices.tolist(), markers[indices].tolist()):
+        activity, action = parsed[code]
+        if activity is not None:
+            result.append((i, activity, action))
+    return result
+
+
+def pair_intervals(store, match="first"):
+    """
+    Pair begin and end markers per activity.
+
+    Args:
+        store: EventStore
+        match: "first" closes the earliest open begin of the activity, "last" the most recent one.
+               An end marker without an open begin is ignored.
+
+    Returns:
+        OrderedDict {activity: [[begin index, end index or None], ...]} with activities in order of
+        their first begin marker and intervals in order of their begin marker
+    """
+    if match not in ("first", "last"):
+        raise ValueError(f"match must be 'first' or 'last', got {match!r}")
+    intervals = OrderedDict()
+    open_intervals = {}
+    for i, activity, action in activity_markers(store):
+        if action == "begin":
+            interval = [i, None]
+            intervals.setdefault(activity, []).append(interval)
+            open_intervals.setdefault(activity, deque()).append(interval)
+        elif open_intervals.get(activity):
+            pending = open_intervals[activity]
+            interval = pending.popleft() if match == "first" else pending.pop()
+            interval[1] = i
+    return intervals
+
+
+class TimeIndex:
+    """
+    Sorted view of the event timestamps for interval lookups.
+
+    Attributes:
+        order: event indices sorted by timestamp (stable), or None if the log is already sorted
+        sorted_timestamps: int64 timestamps in ascending order
+    """
+
+    def __init__(self, store):
+        timestamps = np.asarray(store.timestamps)
+        if len(timestamps) < 2 or np.all(timestamps[1:] >= timestamps[:-1]):
+            self.order = None
+            self.sorted_timestamps = timestamps
+        else:
+            self.order = np.argsort(timestamps, kind="stable")
+            self.sorted_timestamps = timestamps[self.order]
+
+    def bounds(self, begin, end):
+        """
+        Positions [lo, hi) in sorted order of the events with begin <= timestamp <= end.
+        begin and end may be scalars or arrays (one lookup per interval).
+        """
+        lo = np.searchsorted(self.sorted_timestamps, begin, side="left")
+        hi = np.searchsorted(self.sorted_timestamps, end, side="right")
+        return lo, hi
+
+    def events_between(self, begin, end):
+        """Indices (in log order) of the events with begin <= timestamp <= end."""
+        lo, hi = self.bounds(begin, end)
+        if self.order is None:
+            return np.arange(lo, hi)
+        return np.sort(self.order[lo:hi])
+
+
+class IntervalStats:
+    """
+    Interval statistics engine: event counts, active (ON/OPEN) event counts and durations for any
+    number of [begin, end] time intervals.
+
+    The timestamps are sorted once and the active flags are turned into a prefix-sum array, so after
+    the two binary searches locating an interval, both of its counts are O(1) differences.
+    stats() resolves all intervals of a table in a single vectorized sweep.
+    """
+
+    def __init__(self, store, active_states=("ON", "OPEN")):
+        self.store = store
+        self.time_index = TimeIndex(store)
+        active = store.state_mask(active_states)
+        if self.time_index.order is not None:
+            active = active[self.time_index.order]
+        self.active_prefix = np.concatenate(([0], np.cumsum(active, dtype=np.int64)))
+
+    def count_between_positions(self, lo, hi):
+        """
+        (event count, active event count) between sorted positions [lo, hi). An inverted interval
+        (hi < lo: end before begin, in an out-of-order log) holds no event, both counts are 0.
+        """
+        return np.maximum(hi - lo, 0), np.maximum(self.active_prefix[hi] - self.active_prefix[lo], 0)
+
+    def counts(self, begin, end):
+        """
+        (event count, active event count) of the events with begin <= timestamp <= end (0 if end < begin).
+        """
+        return self.count_between_positions(*self.time_index.bounds(begin, end))
+
+    def stats(self, begin_indices, end_indices):
+        """
+        Statistics of the intervals going from event begin_indices[k] to event end_indices[k].
+
+        Returns:
+            dict of arrays: "begin", "end" (int64 timestamps), "event_count", "active_count",
+            "duration" (seconds)
+        """
+        timestamps = np.asarray(self.store.timestamps)
+        begin = timestamps[np.asarray(begin_indices, dtype=np.int64)]
+        end = timestamps[np.asarray(end_indices, dtype=np.int64)]
+        event_count, active_count = self.counts(begin, end)
+        return {
+            "begin": begin,
+            "end": end,
+            "event_count": event_count,
+            "active_count": active_count,
+            "duration": (end - begin) / 1e6,
+        }
+
+    def activity_stats(self, intervals):
+        """
+        stats() for the output of pair_intervals(): {activity: dict of arrays} covering the
+        completed intervals of each activity, in begin order.
+        """
+        result = OrderedDict()
+        for activity, pairs in intervals.items():
+            completed = [(b, e) for b, e in pairs if e is not None]
+            begins = [b for b, _ in completed]
+            ends = [e for _, e in completed]
+            result[activity] = self.stats(begins, ends)
+        return result
@@ -0,0 +1,112 @@
+"""
+timestamps.py
+
+Bulk parsing of the "date"/"time" columns of the event log. Replaces the per-event
+datetime.strptime helpers (try "%Y-%m-%d %H:%M:%S.%f", fall back to "%Y-%m-%d %H:%M:%S")
+that were duplicated across the scripts:
+
+1. parse_datetimes(): date/time string columns -> numpy datetime64[us] array in one vectorized pass.
+   Rows with and without microseconds are both accepted; unparsable rows become NaT and are reported.
+
+2. event_datetimes(): same thing for a list of event dicts, returned as python datetime objects
+   (None for unparsable events) for code that still works event by event.
+
+3. unparsable_rows(): indices of the NaT entries of a parsed array.
+
+4. parse_datetime(): a single date/time pair, for code that receives the events one at a time.
+"""
+
+from datetime import datetime
+
+import numpy as np
+
+DATETIME_DTYPE = "datetime64[us]"
+CHUNK_SIZE = 65536
+_FALLBACK_FORMATS = ("%Y-%m-%d %H:%M:%S.%f", "%Y-%m-%d %H:%M:%S")
+
+
+def _parse_one(date_str, time_str):
+    """
+    Slow path for a single row: numpy's ISO parser first, then the strptime formats the scripts used
+    (they also accept non zero-padded fields). Returns NaT if nothing matches.
+    """
+    if not date_str or not time_str:
+        return np.datetime64("NaT", "us")
+    try:
+        return np.datetime64(f"{date_str}T{time_str}", "us")
+    except ValueError:
+        pass
+    for fmt in _FALLBACK_FORMATS:
+        try:
+            return np.datetime64(datetime.strptime(f"{date_str} {time_str}", fmt), "us")
+        except ValueError:
+            continue
+    return np.datetime64("NaT", "us")
+
+
+def parse_datetime(date_str, time_str):
+    """One timestamp as datetime64[us] (NaT if missing or unparsable)."""
+    return _parse_one(date_str, time_str)
+
+
+def unparsable_rows(datetimes):
+    """Indices of rows that could not be parsed (NaT)."""
+    return np.flatnonzero(np.isnat(datetimes))
+
+
+def parse_datetimes(dates, times, errors="raise", verbose=True):
+    """
+    Parse date and time string columns into a datetime64[us] array.
+
+    The columns are joined and converted with numpy's C parser chunk by chunk; only a chunk that
+    contains a malformed row is re-parsed row by row to locate it.
+
+    Args:
+        dates: sequence of "YYYY-MM-DD" strings (None allowed)
+        times: sequence of "HH:MM:SS" or "HH:MM:SS.ffffff" strings (None allowed)
+        errors: "raise" to raise a ValueError listing the unparsable rows,
+                "coerce" to leave them as NaT (and print a warning if verbose)
+        verbose: set to False when the caller reports unparsable rows itself
+
+    Returns:
+        numpy datetime64[us] array of the same length as the inputs
+    """
+    if errors not in ("raise", "coerce"):
+        raise ValueError(f"errors must be 'raise' or 'coerce', got {errors!r}")
+    dates = np.array(["" if d is None else d for d in dates], dtype=str)
+    times = np.array(["" if t is None else t for t in times], dtype=str)
+    if len(dates) != len(times):
+        raise ValueError("dates and times must have the same length")
+
+    stamps = np.char.add(np.char.add(dates, "T"), times)
+    result = np.empty(len(stamps), dtype=DATETIME_DTYPE)
+    for start in range(0, len(stamps), CHUNK_SIZE):
+        stop = start + CHUNK_SIZE
+        try:
+            result[start:stop] = stamps[start:stop].astype(DATETIME_DTYPE)
+        except ValueError:
+            for i in range(start, min(stop, len(stamps))):
+                result[i] = _parse_one(dates[i], times[i])
+
+    bad_rows = unparsable_rows(result)
+    if len(bad_rows):
+        examples = ", ".join(f"{i}: '{dates[i]} {times[i]}'" for i in bad_rows[:5])
+        message = f"{len(bad_rows)} unparsable timestamps (row: value) {examples}"
+        if errors == "raise":
+            raise ValueError(message)
+        if verbose:
+            print(f"WARNING: {message}")
+    return result
+
+
+def event_datetimes(events, errors="coerce"):
+    """
+    Parse the timestamps of a list of event dicts in one pass.
+
+    Returns:
+        list of datetime objects, None for events with a missing or unparsable date/time
+    """
+    parsed = parse_datetimes(
+        [e.get("date") for e in events], [e.get("time") for e in events], errors=errors
+    )
+    return parsed.astype(object).tolist()
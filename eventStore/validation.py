@@ -0,0 +1,161 @@
+"""
+validation.py
+
+Rule-driven validation and repair of sensor events, evaluated in a single vectorized pass over the
+coded columns of an EventStore.
+
+Rules are checked once per vocabulary entry (a few dozen sensor and state names) rather than once per
+event: each rule turns into lookup tables indexed by sensor/state code, and the tables are applied to
+the whole log with numpy indexing. A rule is a dict with:
+
+- name: label used in the summary and the rejected-rows file
+- sensors: sensor names the rule applies to
+- allowed: valid states (optional)
+- repairs: ordered (substring, replacement) pairs applied in turn to an invalid state; as in the
+  original cleaning script, each pattern is tested against the state as updated by the previous
+  repairs ("OFON" -> "OFF" with [("OF", "OFF"), ("ON", "ON")]) (optional)
+- numeric: True if the state must parse as a float (optional)
+
+Events whose sensor is not covered by any rule are rejected (removed); invalid states that cannot be
+repaired are flagged and kept, matching the previous behaviour of cleaning.py.
+"""
+
+import json
+
+import numpy as np
+
+from event_store import EventStore, MISSING_CODE
+
+UNKNOWN_SENSOR_RULE = "unknown_sensor"
+
+
+def _repair_state(state, rule):
+    """Return the repaired state for an invalid one, or None if no repair applies."""
+    repaired = None
+    for pattern, replacement in rule.get("repairs", []):
+        # Later patterns see the state already replaced by the earlier ones
+        if pattern in state:
+            state = repaired = replacement
+    return repaired
+
+
+def _is_float(value):
+    try:
+        float(value)
+        return True
+    except (ValueError, TypeError):
+        return False
+
+
+def validate_events(store, rules):
+    """
+    Validate and repair every event of a store in one pass.
+
+    Args:
+        store: EventStore to validate (left untouched)
+        rules: list of rule dicts (see module docstring)
+
+    Returns:
+        cleaned: new in-memory EventStore with repaired states and without rejected events
+        summary: {rule name: {"checked", "invalid", "repaired", "rejected", "flagged"}}
+        problems: {rule name: indices (in the input store) of the events that broke the rule}
+    """
+    if not rules:
+        raise ValueError("At least one validation rule is required")
+    state_names = list(store.state_names)
+    state_index = {name: code for code, name in enumerate(state_names)}
+
+    def state_code(name):
+        if name not in state_index:
+            if len(state_names) >= MISSING_CODE:
+                raise ValueError("State vocabulary overflow while repairing states")
+            state_index[name] = len(state_names)
+            state_names.append(name)
+        return state_index[name]
+
+    n_sensor_codes = MISSING_CODE + 1
+    n_state_codes = MISSING_CODE + 1
+    # Which rule (if any) covers each sensor code; -1 = unknown sensor
+    sensor_rule = np.full(n_sensor_codes, -1, dtype=np.int16)
+    # Per rule: is each state code valid, and what does it become after repair
+    state_valid = np.zeros((len(rules), n_state_codes), dtype=bool)
+    state_repair = np.tile(np.arange(n_state_codes, dtype=np.int64), (len(rules), 1))
+
+    for r, rule in enumerate(rules):
+        for sensor in rule["sensors"]:
+            code = store.sensor_code(sensor)
+            if code >= 0:
+                sensor_rule[code] = r
+        for code, state in enumerate(store.state_names):
+            if rule.get("numeric"):
+                valid = _is_float(state)
+            else:
+                valid = state in rule.get("allowed", [state])
+            state_valid[r, code] = valid
+            if not valid:
+                repaired = _repair_state(state, rule)
+                if repaired is not None:
+                    state_repair[r, code] = state_code(repaired)
+
+    # Single pass over the events: every lookup below is a vectorized gather
+    rule_of_event = sensor_rule[store.sensors]
+    unknown = rule_of_event < 0
+    covered_rule = np.where(unknown, 0, rule_of_event)
+    states = np.asarray(store.states, dtype=np.int64)
+    invalid = ~unknown & ~state_valid[covered_rule, states]
+    new_states = np.where(invalid, state_repair[covered_rule, states], states)
+    repaired = invalid & (new_states != states)
+    flagged = invalid & ~repaired
+
+    summary = {UNKNOWN_SENSOR_RULE: {
+        "checked": int(len(store)), "invalid": int(unknown.sum()), "repaired": 0,
+        "rejected": int(unknown.sum()), "flagged": 0,
+    }}
+    problems = {UNKNOWN_SENSOR_RULE: np.flatnonzero(unknown)}
+    for r, rule in enumerate(rules):
+        in_rule = rule_of_event == r
+        summary[rule["name"]] = {
+            "checked": int(in_rule.sum()),
+            "invalid": int((invalid & in_rule).sum()),
+            "repaired": int((repaired & in_rule).sum()),
+            "rejected": 0,
+            "flagged": int((flagged & in_rule).sum()),
+        }
+        problems[rule["name"]] = np.flatnonzero(invalid & in_rule)
+
+    keep = ~unknown
+    cleaned = EventStore(
+        np.asarray(store.timestamps)[keep],
+        np.asarray(store.sensors)[keep],
+        new_states[keep].astype(np.uint8),
+        np.asarray(store.markers)[keep],
+        store.sensor_names, state_names, store.marker_names, store.marker_field,
+    )
+    return cleaned, summary, problems
+
+
+def print_summary(summary):
+    """Compact per-rule report (one line per rule)."""
+    print(f"{'rule':<16}{'checked':>10}{'invalid':>10}{'repaired':>10}{'rejected':>10}{'flagged':>10}")
+    for name, counts in summary.items():
+        print(f"{name:<16}{counts['checked']:>10}{counts['invalid']:>10}{counts['repaired']:>10}"
+              f"{counts['rejected']:>10}{counts['flagged']:>10}")
+
+
+def write_problem_rows(store, problems, filename):
+    """
+    Write the events that broke a rule as NDJSON, one object per event with its index and rule name.
+
+    Returns:
+        number of rows written
+    """
+    written = 0
+    with open(filename, "w") as f:
+        for name, indices in problems.items():
+            for i in indices:
+                row = store.record(int(i))
+                row["index"] = int(i)
+                row["rule"] = name
+                f.write(json.dumps(row) + "\n")
+                written += 1
+    return written
@@ -0,0 +1,287 @@
+"""
+gap_labeling.py
+
+Labeling of the unannotated gaps between an activity "end" marker and the next "begin" marker,
+working directly on the columns of an EventStore.
+
+Each gap is walked once: the sensor bitmask of the current sub-interval is updated event by event
+(ActivityIndex bits), and a sub-interval is closed when the location of the current event differs
+from the location of the previous one. The resulting labels are written into a separate int16 code
+array (NO_LABEL where the original marker is kept), so the event list itself is never copied.
+
+GapLabeler remembers how many events it has already labeled: calling update() again after new
+events were appended to the store only walks the gaps closed by the new events. Its state can be
+saved next to the output (save/load) to resume labeling on the next run.
+
+The gaps are independent of each other, so update(events, workers=N) can shard them across a
+process pool: the sensor column is placed once in shared memory, each worker records the
+(position, label) pairs its shards set, and the results are merged in gap order so the output does
+not depend on the number of workers or on which worker finishes first.
+"""
+
+import os
+from multiprocessing import Pool, shared_memory, util
+
+import numpy as np
+
+from event_store import MISSING_CODE, NO_MARKER
+
+NO_LABEL = -1
+
+
+def marker_flags(marker_names):
+    """
+    Per marker code: (is marker, is begin, is end), using the same substring tests as the JSON
+    based labeling ('begin' in marker / 'end' in marker).
+    """
+    is_begin = np.array(['begin' in name for name in marker_names], dtype=bool)
+    is_end = np.array(['end' in name for name in marker_names], dtype=bool)
+    return is_begin | is_end, is_begin, is_end
+
+
+def find_unlabeled_gaps(markers, marker_names, first_end=0):
+    """
+    Gaps between an end marker and the following begin marker.
+
+    Args:
+        markers: int16 marker codes of the events (NO_MARKER for events without marker)
+        marker_names: marker vocabulary
+        first_end: only return the gaps whose closing begin marker is at index >= first_end
+
+    Returns:
+        list of (gap start, gap end) event indices, both inclusive
+    """
+    markers = np.asarray(markers)
+    if not len(marker_names):
+        return []
+    is_marker, is_begin, is_end = marker_flags(marker_names)
+    codes = np.where(markers == NO_MARKER, 0, markers)
+    positions = np.flatnonzero((markers != NO_MARKER) & is_marker[codes])
+    if len(positions) < 2:
+        return []
+    position_codes = markers[positions]
+    closes = is_end[position_codes[:-1]] & is_begin[position_codes[1:]]
+    closes &= positions[1:] - positions[:-1] >= 2
+    closes &= positions[1:] >= first_end
+    return [(int(p) + 1, int(q) - 1) for p, q in zip(positions[:-1][closes], positions[1:][closes])]
+
+
+class GapLabeler:
+    def __init__(self, activity_index):
+        """
+        Args:
+            activity_index: ActivityIndex built from sonsorsLocalisation.json and
+                            AllSensorsForEachActivities.json
+        """
+        self.index = activity_index
+        self.label_names = []
+        self.label_codes = {}
+        self.labels = np.full(0, NO_LABEL, dtype=np.int16)
+        self.processed = 0
+        self.last_timestamp = None
+        # (position, label code) of the labels set, instead of writing them into labels (worker shards)
+        self.recorded = None
+
+    def _label_code(self, label):
+        if label not in self.label_codes:
+            self.label_codes[label] = len(self.label_names)
+            self.label_names.append(label)
+        return self.label_codes[label]
+
+    def _sensor_masks(self, sensor_names):
+        """
+        Per sensor code: (sensor bitmask, location bitmask) of an event, (0, 0) for missing or
+        empty sensors.
+        """
+        masks = [(0, 0)] * (MISSING_CODE + 1)
+        for code, name in enumerate(sensor_names):
+            if name:
+                bit = self.index.sensor_bit(name)
+                masks[code] = (1 << bit, self.index.sensor_location_masks[bit])
+        return masks
+
+    def _set_label(self, position, code):
+        if self.recorded is not None:
+            self.recorded.append((position, code))
+        else:
+            self.labels[position] = code
+
+    def _set_interval(self, start, end, sensor_mask):
+        activity = self.index.label(sensor_mask)
+        if activity == "Other":
+            self._set_label(start, self._label_code("Other"))
+            self._set_label(end, self._label_code("Other"))
+        else:
+            self._set_label(start, self._label_code(f"{activity},begin,modified"))
+            self._set_label(end, self._label_code(f"{activity},end,modified"))
+
+    def label_gap(self, sensors, sensor_masks, gap_start, gap_end):
+        """
+        Split one gap into sub-intervals at every location change and label each of them.
+
+        Args:
+            sensors: sensor codes of the events
+            sensor_masks: output of _sensor_masks() for the store vocabulary
+            gap_start, gap_end: first and last event of the gap
+        """
+        event_masks = [sensor_masks[code] for code in sensors[gap_start:gap_end + 1].tolist()]
+
+        current_start = gap_start
+        sub_mask, prev_location = event_masks[0]
+        for offset in range(1, len(event_masks)):
+            mask, location = event_masks[offset]
+            # Close the running sub-interval when an active sensor changes the location
+            if mask and location != prev_location:
+                i = gap_start + offset
+                if sub_mask:
+                    self._set_interval(current_start, i - 1, sub_mask)
+                current_start = i
+                sub_mask = 0
+            sub_mask |= mask
+            prev_location = location
+
+        if sub_mask:
+            self._set_interval(current_start, gap_end, sub_mask)
+
+    def update(self, events, workers=1):
+        """
+        Label the gaps closed by the events appended since the last update.
+
+        Args:
+            events: EventStore holding at least the events seen so far
+            workers: number of worker processes (1 labels the gaps in this process)
+
+        Returns:
+            list of the (gap start, gap end) labeled by this call
+        """
+        timestamps = np.asarray(events.timestamps)
+        if (len(events) < self.processed or (self.processed and
+                int(timestamps[self.processed - 1]) != self.last_timestamp)):
+            raise ValueError("The event log does not extend the one labeled so far; "
+                             "start from a new GapLabeler")
+
+        labels = np.full(len(events), NO_LABEL, dtype=np.int16)
+        labels[:self.processed] = self.labels[:self.processed]
+        self.labels = labels
+
+        gaps = find_unlabeled_gaps(events.markers, events.marker_names, first_end=self.processed)
+        if workers > 1 and len(gaps) > 1:
+            self._label_gaps_parallel(events, gaps, workers)
+        else:
+            sensors = np.asarray(events.sensors)
+            sensor_masks = self._sensor_masks(events.sensor_names)
+            for gap_start, gap_end in gaps:
+                self.label_gap(sensors, sensor_masks, gap_start, gap_end)
+
+        self.processed = len(events)
+        self.last_timestamp = int(timestamps[-1]) if len(events) else None
+        return gaps
+
+    def _label_gaps_parallel(self, events, gaps, workers):
+        """Label the gaps in a process pool and merge the shard results in gap order."""
+        sensors = np.asarray(events.sensors)
+        shm = shared_memory.SharedMemory(create=True, size=max(len(sensors), 1))
+        try:
+            np.ndarray(len(sensors), dtype=sensors.dtype, buffer=shm.buf)[:] = sensors
+            # A few shards per worker so that long gaps do not leave the other workers idle
+            shards = [shard.tolist() for shard in
+                      np.array_split(np.array(gaps), min(len(gaps), workers * 4)) if len(shard)]
+            pool = Pool(workers, initializer=_init_worker,
+                        initargs=(shm.name, len(sensors), sensors.dtype.str, self.index,
+                                  list(events.sensor_names)))
+            try:
+                results = pool.map(_label_shard, shards)
+                # Let the workers exit normally (not terminate) so that they close their shared memory handle
+                pool.close()
+            except BaseException:
+                pool.terminate()
+                raise
+            finally:
+                pool.join()
+        finally:
+            shm.close()
+            shm.unlink()
+
+        # pool.map keeps the shard order; shards cover disjoint events
+        for positions, codes, names in results:
+            if not len(positions):
+                continue
+            mapping = np.array([self._label_code(name) for name in names], dtype=np.int16)
+            self.labels[positions] = mapping[codes]
+
+    def label(self, i):
+        """New label of event i, or None if its original marker is kept."""
+        code = int(self.labels[i])
+        return self.label_names[code] if code != NO_LABEL else None
+
+    def labeled_records(self, events):
+        """Event dicts of the store with the gap labels written into their "activity" field."""
+        records = events.records()
+        for i in range(len(records)):
+            record = records[i]
+            code = int(self.labels[i]) if i < len(self.labels) else NO_LABEL
+            if code != NO_LABEL:
+                record['activity'] = self.label_names[code]
+            yield record
+
+    def save(self, path):
+        """Save the labels and the resume position (path should end with .npz)."""
+        np.savez(path, labels=self.labels, label_names=np.array(self.label_names, dtype=str),
+                 processed=self.processed,
+                 last_timestamp=-1 if self.last_timestamp is None else self.last_timestamp)
+
+    @classmethod
+    def load(cls, path, activity_index):
+        """GapLabeler resuming from a state written by save(), or a new one if path does not exist."""
+        labeler = cls(activity_index)
+        if not os.path.exists(path):
+            return labeler
+        with np.load(path) as state:
+            labeler.labels = state["labels"].astype(np.int16)
+            for name in state["label_names"].tolist():
+                labeler._label_code(name)
+            labeler.processed = int(state["processed"])
+            last_timestamp = int(state["last_timestamp"])
+            labeler.last_timestamp = None if labeler.processed == 0 else last_timestamp
+        return labeler
+
+
+# Worker side of GapLabeler._label_gaps_parallel: the state set by the pool initializer
+_worker = {}
+
+
+def _init_worker(shm_name, n_events, dtype, activity_index, sensor_names):
+    shm = shared_memory.SharedMemory(name=shm_name)
+    labeler = GapLabeler(activity_index)
+    _worker.update(
+        shm=shm,
+        sensors=np.ndarray(n_events, dtype=dtype, buffer=shm.buf),
+        labeler=labeler,
+        sensor_masks=labeler._sensor_masks(sensor_names),
+    )
+    util.Finalize(None, _close_worker, exitpriority=10)
+
+
+def _close_worker():
+    shm = _worker.get("shm")
+    # The sensors array must be released before the buffer it views can be closed
+    _worker.clear()
+    if shm is not None:
+        shm.close()
+
+
+def _label_shard(gaps):
+    """
+    Label a list of gaps with the worker's labeler.
+
+    Returns:
+        (event positions, label codes, label names) of the labels written by this shard
+    """
+    labeler = _worker["labeler"]
+    labeler.recorded = []
+    for gap_start, gap_end in gaps:
+        labeler.label_gap(_worker["sensors"], _worker["sensor_masks"], gap_start, gap_end)
+    recorded = np.array(labeler.recorded, dtype=np.int64).reshape(-1, 2)
+    labeler.recorded = None
+    # Positions in the order they were set: when merged, a later label wins as it did in labels
+    return recorded[:, 0], recorded[:, 1].astype(np.int16), list(labeler.label_names)
@@ -0,0 +1,124 @@
+"""
+labeling_index.py
+
+Precomputed index used to label the gaps between annotated activities (activities-labeling.py).
+
+Every sensor and every location gets a bit position. Each activity is then described by:
+- a sensor bitmask (the sensors listed for it in AllSensorsForEachActivities.json),
+- a location bitmask (the "localization" of those sensors),
+- an integer occurrence per sensor bit.
+
+A set of active sensors is encoded once as a sensor bitmask plus the bitmask of its locations, so
+scoring a candidate activity is a few AND + popcount operations and a short sum over the matching
+sensor bits, instead of rebuilding sets and converting "occurrence" strings for every sub-interval.
+"""
+
+
+def popcount(mask):
+    return bin(mask).count("1")
+
+
+def iter_bits(mask):
+    """Positions of the set bits of mask."""
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+class ActivityIndex:
+    def __init__(self, sensors_location, sensor_data):
+        """
+        Args:
+            sensors_location: content of sonsorsLocalisation.json ([{location: {"sensors": [...]}}])
+            sensor_data: content of AllSensorsForEachActivities.json
+                         ({activity: {sensor: {"occurrence": str, "localization": str}}})
+        """
+        self.activities = list(sensor_data)
+        self.sensor_bits = {}
+        self.location_bits = {}
+        self.sensor_location_masks = []  # per sensor bit: bitmask of its location (0 if unknown)
+
+        sensor_to_location = {}
+        for location, info in sensors_location[0].items():
+            for sensor in info['sensors']:
+                sensor_to_location[sensor] = location
+        for location in sensor_to_location.values():
+            self._location_bit(location)
+        for sensor, location in sensor_to_location.items():
+            self.sensor_location_masks[self.sensor_bit(sensor)] = 1 << self.location_bits[location]
+
+        self.activity_sensor_masks = []
+        self.activity_location_masks = []
+        self.activity_occurrences = []   # per activity: {sensor bit: occurrence}
+        self.pertinent_mask = 0
+        for activity in self.activities:
+            sensor_mask, location_mask, occurrences = 0, 0, {}
+            for sensor, info in sensor_data[activity].items():
+                bit = self.sensor_bit(sensor)
+                sensor_mask |= 1 << bit
+                location_mask |= 1 << self._location_bit(info["localization"])
+                occurrences[bit] = int(info["occurrence"])
+            self.activity_sensor_masks.append(sensor_mask)
+            self.activity_location_masks.append(location_mask)
+            self.activity_occurrences.append(occurrences)
+            self.pertinent_mask |= sensor_mask
+
+    def _location_bit(self, location):
+        if location not in self.location_bits:
+            self.location_bits[location] = len(self.location_bits)
+        return self.location_bits[location]
+
+    def sensor_bit(self, sensor):
+        """Bit position of a sensor; sensors outside the JSON files get a new bit on first use."""
+        if sensor not in self.sensor_bits:
+            self.sensor_bits[sensor] = len(self.sensor_bits)
+            self.sensor_location_masks.append(0)
+        return self.sensor_bits[sensor]
+
+    def sensor_mask(self, sensors):
+        mask = 0
+        for sensor in sensors:
+            mask |= 1 << self.sensor_bit(sensor)
+        return mask
+
+    def location_mask(self, sensor_mask):
+        """Bitmask of the locations of the sensors in sensor_mask."""
+        mask = 0
+        for bit in iter_bits(sensor_mask):
+            mask |= self.sensor_location_masks[bit]
+        return mask
+
+    def best_activity(self, sensor_mask, location_mask):
+        """
+        Activity whose locations and sensors best match the active ones.
+
+        Candidates are the activities sharing at least one location (all activities if none do).
+        score = 0.7 * shared locations / active locations + 0.3 * matching sensors / active sensors,
+        ties broken by the summed occurrence of the matching sensors, then by activity order.
+        """
+        n_sensors = popcount(sensor_mask)
+        n_locations = max(popcount(location_mask), 1)
+        candidates = [a for a, locs in enumerate(self.activity_location_masks) if locs & location_mask]
+        if not candidates:
+            candidates = range(len(self.activities))
+
+        best, best_score, best_occurrence = None, None, None
+        for a in candidates:
+            matching = self.activity_sensor_masks[a] & sensor_mask
+            occurrences = self.activity_occurrences[a]
+            occurrence = sum(occurrences[bit] for bit in iter_bits(matching))
+            loc_ratio = popcount(self.activity_location_masks[a] & location_mask) / n_locations
+            score = (loc_ratio * 0.7) + (popcount(matching) / n_sensors * 0.3 if n_sensors else 0)
+            if best is None or score > best_score or (score == best_score and occurrence > best_occurrence):
+                best, best_score, best_occurrence = a, score, occurrence
+        return self.activities[best] if best is not None else "Unknown_Activity"
+
+    def label(self, sensor_mask):
+        """
+        Label of a sub-interval given the bitmask of its active sensors:
+        "Other" if none of them is pertinent to any activity, else the best matching activity.
+        """
+        if not sensor_mask & self.pertinent_mask:
+            return "Other"
+        return self.best_activity(sensor_mask, self.location_mask(sensor_mask))
@@ -0,0 +1,36 @@
+import os
+import sys
+import numpy as np
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "eventStore"))
+from event_store import events_from_records
+from intervals import IntervalStats, pair_intervals
+
+
+def _event(time, sensor="M001", state="ON", activity=None):
+    return {"date": "2010-11-04", "time": time, "sensor": sensor, "state": state, "activity": activity}
+
+
+def test_inverted_interval_counts_no_event():
+    # Out-of-order log: the "end" marker carries an earlier time than its "begin"
+    events = events_from_records([
+        _event("10:00:00", activity="Work,begin"),
+        _event("10:00:05"),
+        _event("09:00:10"),
+        _event("09:00:00", activity="Work,end"),
+        _event("11:00:00", activity="Work,begin"),
+        _event("11:00:01"),
+        _event("11:00:02", state="OFF", activity="Work,end"),
+    ])
+    stats = IntervalStats(events).activity_stats(pair_intervals(events, match="last"))["Work"]
+    assert stats["event_count"].tolist() == [0, 3]
+    assert stats["active_count"].tolist() == [0, 2]
+
+
+def test_counts_of_inverted_bounds_are_zero():
+    events = events_from_records([_event(f"10:00:0{i}") for i in range(5)])
+    interval_stats = IntervalStats(events)
+    begin = np.asarray(events.timestamps)[[3, 0]]
+    end = np.asarray(events.timestamps)[[1, 4]]
+    event_count, active_count = interval_stats.counts(begin, end)
+    assert event_count.tolist() == [0, 5]
+    assert active_count.tolist() == [0, 5]
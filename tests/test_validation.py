@@ -0,0 +1,38 @@
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "eventStore"))
+from event_store import events_from_records
+from validation import validate_events
+
+RULES = [
+    {"name": "M_state", "sensors": ["M001"], "allowed": ["OFF", "ON"],
+     "repairs": [("OF", "OFF"), ("ON", "ON")]},
+    {"name": "D_state", "sensors": ["D001"], "allowed": ["OPEN", "CLOSE"],
+     "repairs": [("OP", "OPEN"), ("CL", "CLOSE")]},
+]
+
+
+def _states(store):
+    return [record["state"] for record in store.records()]
+
+
+def _validate(sensor_states):
+    events = events_from_records([
+        {"date": "2010-11-04", "time": f"00:00:{i:02d}", "sensor": sensor, "state": state, "activity": None}
+        for i, (sensor, state) in enumerate(sensor_states)
+    ])
+    return validate_events(events, RULES)
+
+
+def test_repairs_apply_to_the_updated_state():
+    # "OFON" matches both patterns: "OF" makes it "OFF", which "ON" no longer matches
+    cleaned, summary, _ = _validate([("M001", "OFON"), ("M001", "ONN"), ("M001", "OF5")])
+    assert _states(cleaned) == ["OFF", "ON", "OFF"]
+    assert summary["M_state"]["repaired"] == 3
+
+
+def test_door_repairs_apply_in_turn():
+    # "OPCL" -> "OPEN" by the first pattern, which "CL" does not match: stays OPEN
+    cleaned, summary, _ = _validate([("D001", "OPCL"), ("D001", "CLO"), ("D001", "XX")])
+    assert _states(cleaned) == ["OPEN", "CLOSE", "XX"]
+    assert summary["D_state"]["flagged"] == 1
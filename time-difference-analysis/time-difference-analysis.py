@@ -1,33 +1,21 @@
 import json
 from datetime import datetime
 import numpy as np
+import os
 import sys
-
-# Function to parse datetime with flexible format
-def parse_datetime(date_str, time_str):
-    # Try with microseconds format first
-    full_str = f"{date_str} {time_str}"
-    try:
-        return datetime.strptime(full_str, '%Y-%m-%d %H:%M:%S.%f')
-    except ValueError:
-        # If that fails, try without microseconds
-        try:
-            return datetime.strptime(full_str, '%Y-%m-%d %H:%M:%S')
-        except ValueError:
-            # Print the problematic value for debugging
-            print(f"ERROR: Could not parse datetime: '{full_str}'")
-            raise
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "eventStore"))
+from event_store import load_events
+from timestamps import unparsable_rows
 
 # Function to analyze time differences with progress reporting
 def analyze_time_differences(file_path):
     print(f"Starting analysis of file: {file_path}")
     
-    # Load JSON data
+    # Load event data
     try:
-        print("Loading JSON data...")
-        with open(file_path, 'r') as f:
-            data = json.load(f)
-        print(f"Successfully loaded {len(data)} records")
+        print("Loading event data...")
+        events = load_events(file_path)
+        print(f"Successfully loaded {len(events)} records")
     except FileNotFoundError:
         print(f"ERROR: File {file_path} not found")
         return {"error": f"File {file_path} not found"}
@@ -37,27 +25,16 @@ def analyze_time_differences(file_path):
     
     # Calculate time differences
     print("\nCalculating time differences...")
-    time_diffs = []
-    total_records = len(data)
-    
-    for i in range(1, total_records):
-        if i % 100 == 0 or i == total_records - 1:  # Print progress every 100 records or at the end
-            progress = (i / (total_records - 1)) * 100
-            print(f"Processing record {i}/{total_records-1} ({progress:.1f}% complete)")
-        
-        try:
-            prev_datetime = parse_datetime(data[i-1]['date'], data[i-1]['time'])
-            curr_datetime = parse_datetime(data[i]['date'], data[i]['time'])
-            diff_seconds = (curr_datetime - prev_datetime).total_seconds()
-            time_diffs.append(diff_seconds)
-        except Exception as e:
-            print(f"WARNING: Error processing records {i-1} and {i}: {str(e)}")
-            print(f"  Record {i-1}: {data[i-1]['date']} {data[i-1]['time']}")
-            print(f"  Record {i}: {data[i]['date']} {data[i]['time']}")
-            # Continue processing other records
-            continue
+    times = events.datetimes()
+    bad_rows = unparsable_rows(times)
+    if len(bad_rows):
+        print(f"WARNING: {len(bad_rows)} records have an unparsable date/time and are skipped, e.g. rows {bad_rows[:5].tolist()}")
+
+    # Consecutive differences in one pass; pairs involving an unparsable record are dropped
+    valid_pairs = ~(np.isnat(times[1:]) | np.isnat(times[:-1]))
+    time_diffs = (np.diff(times)[valid_pairs] / np.timedelta64(1, 's')).astype(np.float64)
     
-    if not time_diffs:
+    if len(time_diffs) == 0:
         print("ERROR: No valid time differences could be calculated")
         return {"error": "No valid time differences could be calculated"}
     
@@ -91,12 +68,7 @@ def analyze_time_differences(file_path):
     
     print("\nGrouping time differences into intervals...")
     # Group differences into intervals
-    interval_counts = [0] * len(interval_names)
-    for diff in time_diffs:
-        for i in range(len(interval_bounds) - 1):
-            if interval_bounds[i] <= diff < interval_bounds[i+1]:
-                interval_counts[i] += 1
-                break
+    interval_counts = [int(count) for count in np.histogram(time_diffs, bins=interval_bounds)[0]]
     
     # Calculate percentages
     total_diffs = len(time_diffs)
@@ -105,11 +77,11 @@ def analyze_time_differences(file_path):
     # Create results dictionary
     print("\nCreating final results...")
     results = {
-        "total_entries": len(data),
+        "total_entries": len(events),
         "total_time_differences": total_diffs,
         "basic_statistics": {
-            "min_diff": min(time_diffs),
-            "max_diff": max(time_diffs),
+            "min_diff": float(time_diffs.min()),
+            "max_diff": float(time_diffs.max()),
             "mean_diff": np.mean(time_diffs),
             "median_diff": np.median(time_diffs)
         },